@@ -1,15 +1,22 @@
 import inspect
-import json
+import math
 import os
 import sys
+import time
 from functools import partial
 
 from jumpscale.clients.base import Client
 from jumpscale.core.base import fields
 from jumpscale.loader import j
-from jumpscale.servers.gedis.server import GedisErrorTypes, deserialize, serialize
+from jumpscale.servers.gedis.codecs import CODECS, DEFAULT_CODEC, MsgpackCodec, get_codec
+from jumpscale.servers.gedis.server import GedisErrorTypes
 from jumpscale.tools.codeloader import load_python_module
 
+from .pool import GedisPooledConnection
+
+# max seconds a single `core.wait_task` request waits on the server
+TASK_WAIT_INTERVAL = 30
+
 
 class ActorResult:
     def __init__(self, **kwargs):
@@ -19,6 +26,7 @@ class ActorResult:
         self.error_type = kwargs.get("error_type", None)
         self.is_async = kwargs.get("is_async", False)
         self.task_id = kwargs.get("task_id", None)
+        self.stream_id = kwargs.get("stream_id", None)
 
     def __dir__(self):
         return list(self.__dict__.keys())
@@ -28,17 +36,19 @@ class ActorResult:
 
 
 class ActorProxy:
-    def __init__(self, actor_name, actor_info, client):
+    def __init__(self, actor_name, actor_info, client, generation=None):
         """ActorProxy to remote actor on the server side
 
         Arguments:
             actor_name {str} -- [description]
             actor_info {dict} -- actor information dict e.g { method_name: { args: [], 'doc':...} }
             gedis_client {GedisClient} -- gedis client reference
+            generation {int} -- server registry generation the actor was registered at
         """
         self.actor_name = actor_name
         self.actor_info = actor_info
         self.client = client
+        self.generation = generation
 
     def __dir__(self):
         """Delegate the available functions on the ActorProxy to `actor_info` keys
@@ -67,15 +77,18 @@ class ActorProxy:
 
 
 class ActorsCollection:
-    def __init__(self, actors):
-        self._actors = actors
+    """Actors of the server, actors proxies are created lazily on first access"""
+
+    def __init__(self, client):
+        self._client = client
 
     def __dir__(self):
-        return list(self._actors.keys())
+        return list(self._client._get_registry().keys())
 
     def __getattr__(self, actor_name):
-        if actor_name in self._actors:
-            return self._actors[actor_name]
+        if actor_name.startswith("_"):
+            raise AttributeError(actor_name)
+        return self._client._get_actor(actor_name)
 
 
 class GedisClient(Client):
@@ -84,14 +97,28 @@ class GedisClient(Client):
     port = fields.Integer(default=16000)
     raise_on_error = fields.Boolean(default=False)
     disable_deserialization = fields.Boolean(default=False)
+    stream_chunk_size = fields.Integer(default=100)
+    prefer_binary = fields.Boolean(default=True)
+    pooled = fields.Boolean(default=False)
+    pool_size = fields.Integer(default=20)
+    pool_timeout = fields.Integer(default=10)
+    pool_max_idle_time = fields.Integer(default=300)
+    pool_health_check_interval = fields.Integer(default=30)
+    blocking_pool_size = fields.Integer(default=50)
+    blocking_methods = fields.List(fields.String())
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._redisclient = None
+        self._pooled_connection = None
+        self._codec = None
         self._loaded_actors = {}
         self._loaded_modules = []
-        self.actors = None
-        self._load_actors()
+        # actor name -> generation, fetched lazily and refreshed once the server registry generation changes
+        self._registry = None
+        self._registry_generation = None
+        self._registry_stale = True
+        self.actors = ActorsCollection(self)
 
     @property
     def redis_client(self):
@@ -99,19 +126,95 @@ class GedisClient(Client):
             self._redisclient = j.clients.redis.get(name=f"gedis_{self.name}", hostname=self.hostname, port=self.port)
         return self._redisclient
 
+    @property
+    def pooled_connection(self):
+        if self._pooled_connection is None:
+            self._pooled_connection = GedisPooledConnection(
+                hostname=self.hostname,
+                port=self.port,
+                pool_size=self.pool_size,
+                blocking_pool_size=self.blocking_pool_size,
+                timeout=self.pool_timeout,
+                max_idle_time=self.pool_max_idle_time,
+                health_check_interval=self.pool_health_check_interval,
+                blocking_methods=self.blocking_methods,
+            )
+        return self._pooled_connection
+
+    def _get_redis_client(self, actor_name, actor_method):
+        if self.pooled:
+            return self.pooled_connection.get_client(actor_name, actor_method)
+        return self.redis_client
+
+    def pool_stats(self) -> dict:
+        """Get connection pools metrics (only available in pooled mode)
+
+        Returns:
+            dict -- metrics of `default` and `blocking` lanes, e.g. connections in use, checkouts and wait times
+        """
+        if not self.pooled:
+            return {}
+        return self.pooled_connection.stats()
+
+    @property
+    def codec(self):
+        """Wire codec used for requests, negotiated with the server on first use
+
+        msgpack is used if `prefer_binary` is set and both the client and the server support it,
+        otherwise json is used.
+        """
+        if self._codec is None:
+            codec = get_codec(DEFAULT_CODEC)
+            if self.prefer_binary and MsgpackCodec.name in CODECS:
+                try:
+                    response = self._send(codec, "core", "list_codecs")
+                except RemoteException:
+                    # older servers don't support codecs negotiation
+                    response = None
+
+                if response and response.success and MsgpackCodec.name in response.result:
+                    codec = get_codec(MsgpackCodec.name)
+            self._codec = codec
+        return self._codec
+
     def _load_module(self, path, force_reload=False):
         load_python_module(path, force_reload=force_reload)
         if path not in self._loaded_modules:
             self._loaded_modules.append(path)
 
-    def _load_actors(self, force_reload=False):
-        self._loaded_actors = {}
-        for actor_name in self.list_actors():
+    def _get_registry(self):
+        if self._registry is None or self._registry_stale:
+            try:
+                registry = self.execute("core", "registry", die=True).result
+            except RemoteException:
+                # older servers don't have a versioned registry, consider all actors unchanged
+                registry = {"generation": None, "actors": {name: None for name in self.list_actors()}}
+
+            self._registry_generation = registry["generation"]
+            self._registry = registry["actors"]
+            self._registry_stale = False
+
+            # drop proxies of removed and re-registered actors, they're created again on next access
+            for actor_name, actor in list(self._loaded_actors.items()):
+                if self._registry.get(actor_name, -1) != actor.generation:
+                    self._loaded_actors.pop(actor_name)
+
+        return self._registry
+
+    def _get_actor(self, actor_name):
+        registry = self._get_registry()
+        if actor_name not in registry:
+            return None
+
+        actor = self._loaded_actors.get(actor_name)
+        if actor is None:
             actor_info = self._get_actor_info(actor_name)
-            self._load_module(actor_info["path"], force_reload=force_reload)
-            self._loaded_actors[actor_name] = ActorProxy(actor_name, actor_info, self)
+            # reload modules of actors that were loaded before, the actor may have changed on the server
+            self._load_module(actor_info["path"], force_reload=actor_info["path"] in self._loaded_modules)
+            actor = ActorProxy(actor_name, actor_info, self, generation=registry[actor_name])
+            self._loaded_actors[actor_name] = actor
 
-        self.actors = ActorsCollection(self._loaded_actors)
+        return actor
 
     def _get_actor_info(self, actor_name):
         return self.execute(actor_name, "info", die=True).result
@@ -125,8 +228,9 @@ class GedisClient(Client):
         return self.execute("core", "list_actors", die=True).result
 
     def reload(self):
-        """Reload actors"""
-        self._load_actors(force_reload=True)
+        """Reload actors registry, only actors changed on the server are loaded again (on next access)"""
+        self._registry_stale = True
+        self._get_registry()
 
     def execute(self, actor_name: str, actor_method: str, *args, die: bool = False, **kwargs) -> ActorResult:
         """Execute actor's method
@@ -144,11 +248,101 @@ class GedisClient(Client):
         Returns:
             ActorResult -- request result
         """
-        payload = json.dumps((args, kwargs), default=serialize)
-        response = self.redis_client.execute_command(actor_name, actor_method, payload)
+        return self._send(self.codec, actor_name, actor_method, *args, die=die, **kwargs)
+
+    def execute_batch(self, calls: list, die: bool = False) -> list:
+        """Execute many actor methods in a single round trip
 
-        deserializer = deserialize if not self.disable_deserialization else None
-        response = json.loads(response, object_hook=deserializer)
+        Requests are sent back to back using a redis pipeline (without a transaction),
+        servers started with `pipelined` enabled will execute them concurrently.
+
+        Arguments:
+            calls {list} -- list of (actor_name, actor_method, args, kwargs) tuples
+
+        Keyword Arguments:
+            die {bool} --  flag to raise an error when any request fails (default: {False})
+
+        Raises:
+            RemoteException: Raises if any request failed and raise_on_error flag is set
+
+        Returns:
+            list -- list of ActorResult in the same order of the calls
+        """
+        codec = self.codec
+        pipeline = self._get_redis_client(None, None).pipeline(transaction=False)
+        for actor_name, actor_method, args, kwargs in calls:
+            pipeline.execute_command(actor_name, actor_method, codec.dumps((args, kwargs)), codec.name)
+
+        return [self._parse_response(codec, response, die=die) for response in pipeline.execute()]
+
+    def get_task(self, task_id: str, die: bool = False) -> ActorResult:
+        """Get the result of a background task (returned by async methods), without waiting
+
+        Arguments:
+            task_id {str} -- task id
+
+        Keyword Arguments:
+            die {bool} --  flag to raise an error when the task failed (default: {False})
+
+        Returns:
+            ActorResult -- task result, `is_async` is True while the task is not done yet
+        """
+        task = self.execute("core", "get_task", task_id, die=True).result
+        return self._task_result(task, die=die)
+
+    def wait_task(self, task_id: str, timeout: int = None, die: bool = False) -> ActorResult:
+        """Wait for a background task (returned by async methods) to finish
+
+        Arguments:
+            task_id {str} -- task id
+
+        Keyword Arguments:
+            timeout {int} -- max seconds to wait, waits until the task is done if None (default: {None})
+            die {bool} --  flag to raise an error when the task failed (default: {False})
+
+        Returns:
+            ActorResult -- task result, `is_async` is True if the timeout is reached before the task is done
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait_timeout = TASK_WAIT_INTERVAL
+            if deadline is not None:
+                wait_timeout = max(min(wait_timeout, deadline - time.monotonic()), 0)
+
+            task = self.execute("core", "wait_task", task_id, math.ceil(wait_timeout), die=True).result
+            if task["done"] or (deadline is not None and time.monotonic() >= deadline):
+                return self._task_result(task, die=die)
+
+    def _task_result(self, task, die=False):
+        if not task["done"]:
+            return ActorResult(is_async=True, task_id=task["task_id"])
+
+        success = task["error"] is None
+        if not success and (die or self.raise_on_error):
+            raise RemoteException(task["error"])
+
+        error_type = GedisErrorTypes(task["error_type"]) if not success else None
+        return ActorResult(
+            success=success, result=task["result"], error=task["error"], error_type=error_type, task_id=task["task_id"]
+        )
+
+    def _send(self, codec, actor_name, actor_method, *args, die=False, **kwargs):
+        payload = codec.dumps((args, kwargs))
+        redis_client = self._get_redis_client(actor_name, actor_method)
+        if codec.name == DEFAULT_CODEC:
+            # keep json requests compatible with servers that don't support codecs
+            response = redis_client.execute_command(actor_name, actor_method, payload)
+        else:
+            response = redis_client.execute_command(actor_name, actor_method, payload, codec.name)
+        return self._parse_response(codec, response, die=die)
+
+    def _parse_response(self, codec, response, die=False):
+        response = codec.loads(response, deserialize_objects=not self.disable_deserialization)
+
+        generation = response.pop("generation", None)
+        if generation is not None and generation != self._registry_generation:
+            # actors were registered or unregistered on the server, refresh the registry on next actor access
+            self._registry_stale = True
 
         if not response["success"]:
             if die or self.raise_on_error:
@@ -156,8 +350,30 @@ class GedisClient(Client):
 
             response["error_type"] = GedisErrorTypes(response["error_type"])
 
+        if response.get("stream_id"):
+            response["result"] = self._iter_stream(response["stream_id"])
+
         return ActorResult(**response)
 
+    def _iter_stream(self, stream_id):
+        """Iterate over a stream method result, items are fetched lazily in chunks of `stream_chunk_size`
+
+        Arguments:
+            stream_id {str} -- stream id
+
+        Yields:
+            any -- stream items
+        """
+        done = False
+        try:
+            while not done:
+                chunk = self.execute("core", "stream_next", stream_id, self.stream_chunk_size, die=True).result
+                done = chunk["done"]
+                yield from chunk["items"]
+        finally:
+            if not done:
+                self.execute("core", "stream_close", stream_id)
+
 
 class RemoteException(Exception):
     pass
@@ -0,0 +1,135 @@
+import time
+
+from redis import Redis
+from redis.connection import BlockingConnectionPool
+
+
+class GedisConnectionPool(BlockingConnectionPool):
+    """A bounded blocking connection pool to a gedis server
+
+    - callers wait up to `timeout` seconds for a free connection when all connections are checked out
+    - connections idle for more than `max_idle_time` seconds are disconnected (and reconnected on next checkout)
+    - connections idle for more than `health_check_interval` seconds are pinged before being used
+    - checkouts count and wait times are kept as metrics (see `stats`)
+    """
+
+    def __init__(self, max_connections=20, timeout=10, max_idle_time=300, **connection_kwargs):
+        super().__init__(max_connections=max_connections, timeout=timeout, **connection_kwargs)
+        self.max_idle_time = max_idle_time
+        self.reset_stats()
+
+    def reset_stats(self):
+        self._in_use = 0
+        self._checkouts = 0
+        self._evictions = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    def get_connection(self, command_name, *keys, **options):
+        start = time.monotonic()
+        connection = super().get_connection(command_name, *keys, **options)
+        wait_time = time.monotonic() - start
+
+        self._in_use += 1
+        self._checkouts += 1
+        self._total_wait_time += wait_time
+        self._max_wait_time = max(self._max_wait_time, wait_time)
+        return connection
+
+    def release(self, connection):
+        connection._gedis_last_used = time.monotonic()
+        self._in_use = max(self._in_use - 1, 0)
+        super().release(connection)
+        self._evict_idle_connections()
+
+    def _evict_idle_connections(self):
+        if not self.max_idle_time:
+            return
+
+        now = time.monotonic()
+        for connection in list(self.pool.queue):
+            if connection is None or not connection._sock:
+                continue
+
+            if now - getattr(connection, "_gedis_last_used", now) > self.max_idle_time:
+                connection.disconnect()
+                self._evictions += 1
+
+    def stats(self):
+        """Get pool metrics
+
+        Returns:
+            dict -- pool size, connections in use, checkouts, evictions and wait times (in seconds)
+        """
+        connected = len([connection for connection in self._connections if connection._sock])
+        return {
+            "max_connections": self.max_connections,
+            "connected": connected,
+            "in_use": self._in_use,
+            "checkouts": self._checkouts,
+            "evictions": self._evictions,
+            "total_wait_time": self._total_wait_time,
+            "max_wait_time": self._max_wait_time,
+            "average_wait_time": self._total_wait_time / self._checkouts if self._checkouts else 0.0,
+        }
+
+
+class GedisPooledConnection:
+    """Redis client over two connection pools (lanes)
+
+    Short calls are served from the `default` lane, while methods known to block for a long time
+    (e.g. long polling) are served from a separate `blocking` lane, so they never hold a connection that short calls need.
+    """
+
+    def __init__(
+        self,
+        hostname,
+        port,
+        pool_size=20,
+        blocking_pool_size=50,
+        timeout=10,
+        max_idle_time=300,
+        health_check_interval=30,
+        blocking_methods=None,
+    ):
+        self.blocking_methods = set(blocking_methods or [])
+        self.pools = {
+            "default": GedisConnectionPool(
+                host=hostname,
+                port=port,
+                max_connections=pool_size,
+                timeout=timeout,
+                max_idle_time=max_idle_time,
+                health_check_interval=health_check_interval,
+            ),
+            "blocking": GedisConnectionPool(
+                host=hostname,
+                port=port,
+                max_connections=blocking_pool_size,
+                timeout=timeout,
+                max_idle_time=max_idle_time,
+                health_check_interval=health_check_interval,
+            ),
+        }
+        self.clients = {lane: Redis(connection_pool=pool) for lane, pool in self.pools.items()}
+
+    def get_client(self, actor_name, actor_method):
+        """Get the redis client of the lane that should serve this method
+
+        Arguments:
+            actor_name {str} -- actor name
+            actor_method {str} -- actor method
+
+        Returns:
+            Redis -- redis client backed by the lane pool
+        """
+        if f"{actor_name}.{actor_method}" in self.blocking_methods:
+            return self.clients["blocking"]
+        return self.clients["default"]
+
+    def stats(self):
+        return {lane: pool.stats() for lane, pool in self.pools.items()}
+
+    def disconnect(self):
+        for pool in self.pools.values():
+            pool.disconnect()
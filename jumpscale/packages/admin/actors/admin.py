@@ -1,4 +1,5 @@
 from jumpscale.loader import j
+from jumpscale.packages.auth.bottle.auth import auth_cache
 from jumpscale.servers.gedis.baseactor import BaseActor, actor_method
 from requests import HTTPError
 import json
@@ -16,6 +17,7 @@ class Admin(BaseActor):
             raise j.exceptions.Value(f"Admin {name} already exists")
         j.core.identity.me.admins.append(name)
         j.core.identity.me.save()
+        auth_cache.invalidate()
 
     @actor_method
     def delete_admin(self, name: str):
@@ -23,6 +25,7 @@ class Admin(BaseActor):
             raise j.exceptions.Value(f"Admin {name} does not exist")
         j.core.identity.me.admins.remove(name)
         j.core.identity.me.save()
+        auth_cache.invalidate()
 
     @actor_method
     def list_identities(self) -> str:
@@ -79,6 +82,8 @@ class Admin(BaseActor):
         identity_names = j.core.identity.list_all()
         if identity_instance_name in identity_names:
             j.core.identity.set_default(identity_instance_name)
+            # admins are of the default identity
+            auth_cache.invalidate()
 
             return j.data.serializers.json.dumps({"data": {"instance_name": identity_instance_name}})
         else:
@@ -153,7 +158,7 @@ class Admin(BaseActor):
         config_obj = j.core.config.get_config()
         return j.data.serializers.json.dumps({"data": config_obj})
 
-    @actor_method
+    @actor_method(cache_ttl=300)
     def get_sdk_version(self) -> str:
         import importlib_metadata as metadata
 
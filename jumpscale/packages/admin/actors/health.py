@@ -1,11 +1,33 @@
+import psutil
+
 from jumpscale.loader import j
 from jumpscale.servers.gedis.baseactor import BaseActor, actor_method
 
 from jumpscale.clients.stellar import HORIZON_NETWORKS, THREEFOLDFOUNDATION_TFTSTELLAR_SERVICES
 
 
+def _get_process_info(process):
+    """Get the info of a process shown by the processes dashboard, same as `j.sals.process.get_processes_info` items
+
+    Returns:
+        dict: process info, None if the process exited or can't be accessed
+    """
+    try:
+        with process.oneshot():
+            info = process.as_dict(attrs=["pid", "ppid", "name", "status", "username"])
+            info["rss"] = round(process.memory_info().rss / 1024**2, 2)
+            try:
+                connections = process.connections(kind="inet")
+            except psutil.AccessDenied:
+                connections = []
+            info["ports"] = [{"port": conn.laddr.port, "status": conn.status} for conn in connections if conn.laddr]
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+    return info
+
+
 class Health(BaseActor):
-    @actor_method
+    @actor_method(cache_ttl=30)
     def get_disk_space(self) -> str:
         res = {}
         disk_obj = j.sals.fs.shutil.disk_usage("/")
@@ -19,7 +41,7 @@ class Health(BaseActor):
     def health(self) -> str:
         return "All is good"
 
-    @actor_method
+    @actor_method(cache_ttl=60)
     def network_info(self) -> str:
         return j.data.serializers.json.dumps({"data": j.sals.nettools.get_default_ip_config()})
 
@@ -36,6 +58,14 @@ class Health(BaseActor):
     def get_running_processes(self) -> str:
         return j.data.serializers.json.dumps({"data": j.sals.process.get_processes_info()})
 
+    @actor_method(stream=True)
+    def stream_running_processes(self) -> dict:
+        # processes are read one by one while streaming, instead of building the info of all processes first
+        for process in psutil.process_iter():
+            info = _get_process_info(process)
+            if info:
+                yield info
+
     @actor_method
     def get_health_checks(self, network="STD") -> str:
         services = {
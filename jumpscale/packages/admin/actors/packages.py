@@ -17,15 +17,15 @@ class Packages(BaseActor):
     def get_package_status(self, names: list) -> str:
         return "hello from packages_get_status actor"
 
-    @actor_method
+    @actor_method(cache_ttl=10)
     def list_packages(self) -> str:
         return j.data.serializers.json.dumps({"data": self.threebot.packages.get_packages()})
 
-    @actor_method
+    @actor_method(cache_ttl=10)
     def packages_names(self) -> str:
         return j.data.serializers.json.dumps({"data": list(self.threebot.packages.list_all())})
 
-    @actor_method
+    @actor_method(is_async=True, invalidates=["list_packages", "packages_names", "list_chat_urls"])
     def add_package(self, path: str = "", giturl: str = "", extras=None) -> str:
         extras = extras or {}
         if path:
@@ -59,11 +59,11 @@ class Packages(BaseActor):
         path = package_module.__path__[0]
         return self.add_package(path=path, extras=extras)
 
-    @actor_method
+    @actor_method(invalidates=["list_packages", "packages_names", "list_chat_urls"])
     def delete_package(self, name: str) -> str:
         return j.data.serializers.json.dumps({"data": self.threebot.packages.delete(name)})
 
-    @actor_method
+    @actor_method(cache_ttl=10)
     def list_chat_urls(self, name: str) -> str:
         package_chats = []
         if name in self.threebot.packages.packages:
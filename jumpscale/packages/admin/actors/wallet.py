@@ -4,7 +4,7 @@ from jumpscale.clients.stellar.stellar import _NETWORK_KNOWN_TRUSTS
 
 
 class Wallet(BaseActor):
-    @actor_method
+    @actor_method(invalidates=["get_wallets"])
     def create_wallet(self, name: str) -> str:
         if j.clients.stellar.find(name):
             raise j.exceptions.Value(f"Wallet {name} already exists")
@@ -27,7 +27,7 @@ class Wallet(BaseActor):
         wallet.save()
         return j.data.serializers.json.dumps({"data": wallet.address})
 
-    @actor_method
+    @actor_method(executor="thread")
     def get_wallet_info(self, name: str) -> str:
         if not j.clients.stellar.find(name):
             raise j.exceptions.Value("Wallet does not exist")
@@ -60,7 +60,7 @@ class Wallet(BaseActor):
 
         return j.data.serializers.json.dumps({"data": ret, "error": error})
 
-    @actor_method
+    @actor_method(cache_ttl=30)
     def get_wallets(self) -> str:
         wallets = j.clients.stellar.list_all()
         ret = []
@@ -70,7 +70,7 @@ class Wallet(BaseActor):
 
         return j.data.serializers.json.dumps({"data": ret})
 
-    @actor_method
+    @actor_method(is_async=True)
     def update_trustlines(self, name: str) -> str:
         if not j.clients.stellar.find(name):
             raise j.exceptions.Value("Wallet does not exist")
@@ -86,7 +86,7 @@ class Wallet(BaseActor):
         wallet.save()
         return j.data.serializers.json.dumps({"data": trustlines})
 
-    @actor_method
+    @actor_method(invalidates=["get_wallets"])
     def import_wallet(self, name: str, secret: str) -> str:
         if name in j.clients.stellar.list_all():
             return j.data.serializers.json.dumps({"error": "Wallet name already exists"})
@@ -105,7 +105,7 @@ class Wallet(BaseActor):
         wallet.save()
         return j.data.serializers.json.dumps({"data": wallet.address})
 
-    @actor_method
+    @actor_method(invalidates=["get_wallets"])
     def delete_wallet(self, name: str) -> str:
         j.clients.stellar.delete(name=name)
         return j.data.serializers.json.dumps({"data": True})
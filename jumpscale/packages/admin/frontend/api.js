@@ -1,7 +1,45 @@
 // const axios = require('axios')
 const baseURL = "/admin/actors"
 
+// stream actor methods respond with newline delimited JSON, parse it into a list of items
+const parseNDJSON = [(data) => data.split("\n").filter((line) => line).map((line) => JSON.parse(line))]
+
+// browsers don't revalidate POST responses, keep their entity tags and send them back with If-None-Match,
+// the last response data is reused when the server answers with 304 Not Modified
+const conditionalResponses = new Map()
+
+const conditionalRequest = (config) => {
+    const key = `${config.url}:${JSON.stringify(config.data || {})}`
+    const cached = conditionalResponses.get(key)
+    const headers = Object.assign({}, config.headers)
+    if (cached) {
+        headers['If-None-Match'] = cached.etag
+    }
+
+    return axios(Object.assign({}, config, {
+        headers: headers,
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304
+    })).then((response) => {
+        if (response.status === 304 && cached) {
+            response.data = cached.data
+        } else if (response.headers.etag) {
+            conditionalResponses.set(key, { etag: response.headers.etag, data: response.data })
+        }
+        return response
+    })
+}
+
 const apiClient = {
+    // execute many calls in a single request, calls are {actor, method, kwargs} objects
+    // responds with a list of {status, result} or {status, error} in the same order
+    batch: (calls) => {
+        return axios({
+            url: `${baseURL}/batch`,
+            method: "post",
+            headers: { 'Content-Type': 'application/json' },
+            data: calls
+        })
+    },
     content: {
         get: (url) => {
             return axios({
@@ -11,13 +49,15 @@ const apiClient = {
     },
     logs: {
         listApps: () => {
-            return axios({
+            return conditionalRequest({
                 url: `${baseURL}/logs/list_apps`,
                 method: "post"
             })
         },
+        // logs and alerts are refreshed often and rarely change, they're listed using the non-stream methods,
+        // so unchanged lists are answered with 304 Not Modified (stream responses don't have entity tags)
         listLogs: (appName) => {
-            return axios({
+            return conditionalRequest({
                 url: `${baseURL}/logs/list_logs`,
                 method: "post",
                 headers: { 'Content-Type': 'application/json' },
@@ -34,7 +74,7 @@ const apiClient = {
     },
     alerts: {
         listAlerts: () => {
-            return axios({
+            return conditionalRequest({
                 url: `${baseURL}/alerts/list_alerts`,
                 method: "post",
                 headers: { 'Content-Type': 'application/json' }
@@ -49,7 +89,7 @@ const apiClient = {
     },
     wallets: {
         list: () => {
-            return axios({
+            return conditionalRequest({
                 url: `${baseURL}/wallet/get_wallets`,
                 method: "post",
                 headers: { 'Content-Type': 'application/json' }
@@ -361,7 +401,8 @@ const apiClient = {
         },
         getRunningProcesses() {
             return axios({
-                url: `${baseURL}/health/get_running_processes`
+                url: `${baseURL}/health/stream_running_processes`,
+                transformResponse: parseNDJSON
             })
         },
         getHealthChecks() {
@@ -1,10 +1,11 @@
 from functools import wraps
 from json import JSONDecodeError
+from time import monotonic
 from urllib.parse import urlencode, quote, unquote
 
 import nacl
 import requests
-from bottle import Bottle, request, abort, redirect, response
+from bottle import Bottle, HTTPError, request, abort, redirect, response
 from nacl.public import Box
 from nacl.signing import VerifyKey
 
@@ -13,10 +14,126 @@ from jumpscale.loader import j
 REDIRECT_URL = "https://login.threefold.me"
 CALLBACK_URL = "/auth/3bot_callback"
 LOGIN_URL = "/auth/login"
+SESSION_COOKIE = "beaker.session.id"
+# seconds auth decisions are cached for
+AUTH_CACHE_TTL = 10
+AUTH_CACHE_MAX_SIZE = 10000
+# redis key incremented when all auth decisions are invalidated
+AUTH_CACHE_GENERATION_KEY = "auth:cache:generation"
 
 app = Bottle()
 
 
+class AuthCache:
+    """Cache of auth decisions by session id and policy, used by nginx `auth_request` endpoints
+    to avoid loading sessions and packages admins for every request of protected locations
+
+    Only granted and forbidden (403) decisions are cached, unauthenticated requests are always checked,
+    so users are let in as soon as they login
+
+    This module is loaded again by the threebot server to serve its app, so the served cache is not the one imported
+    by other modules (e.g. admin actors). Invalidating all decisions increments a generation counter in redis,
+    and every cache drops its decisions when it sees a new generation
+    """
+
+    def __init__(self, ttl=AUTH_CACHE_TTL, max_size=AUTH_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._decisions = {}
+        self._generation = None
+
+    def _check_generation(self):
+        generation = j.core.db.get(AUTH_CACHE_GENERATION_KEY)
+        if generation != self._generation:
+            self._decisions.clear()
+            self._generation = generation
+
+    def get(self, session_id, policy):
+        """Get a cached decision
+
+        Args:
+            session_id (str): session id
+            policy (str): policy name, e.g. `authenticated`
+
+        Returns:
+            tuple: (status, body) or None if not cached
+        """
+        self._check_generation()
+        decision = self._decisions.get((session_id, policy))
+        if decision is None:
+            return None
+
+        expiration, status, body = decision
+        if expiration < monotonic():
+            self._decisions.pop((session_id, policy), None)
+            return None
+        return status, body
+
+    def set(self, session_id, policy, status, body=None):
+        if len(self._decisions) >= self.max_size:
+            now = monotonic()
+            for key in [key for key, decision in self._decisions.items() if decision[0] < now]:
+                self._decisions.pop(key, None)
+            if len(self._decisions) >= self.max_size:
+                self._decisions.clear()
+        self._decisions[(session_id, policy)] = (monotonic() + self.ttl, status, body)
+
+    def invalidate(self, session_id=None):
+        """Remove cached decisions of a session, or all decisions of all caches (e.g. when admins change)
+
+        Args:
+            session_id (str, optional): session id. Defaults to None.
+        """
+        if session_id is None:
+            self._decisions.clear()
+            j.core.db.incr(AUTH_CACHE_GENERATION_KEY)
+            return
+
+        for key in [key for key in self._decisions if key[0] == session_id]:
+            self._decisions.pop(key, None)
+
+
+auth_cache = AuthCache()
+
+
+def cache_decision(policy):
+    """decorator for auth endpoints, to cache their decisions using `auth_cache`
+
+    Args:
+        policy (str): policy name, formatted with the route arguments, e.g. `package_authorized:{package_name}`
+    """
+
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            session_id = request.get_cookie(SESSION_COOKIE)
+            if not session_id:
+                return handler(*args, **kwargs)
+
+            name = policy.format(**kwargs)
+            decision = auth_cache.get(session_id, name)
+            if decision:
+                status, body = decision
+                if status == 403:
+                    return abort(403)
+                response.content_type = "application/json"
+                return body
+
+            try:
+                body = handler(*args, **kwargs)
+            except HTTPError as e:
+                if e.status_code == 403:
+                    auth_cache.set(session_id, name, 403)
+                raise
+
+            auth_cache.set(session_id, name, 200, body)
+            return body
+
+        return wrapper
+
+    return decorator
+
+
 @app.hook("before_request")
 def setup_request():
     request.session = request.environ.get("beaker.session", {})
@@ -156,6 +273,9 @@ def logout():
         Redirect to the login page
     """
     session = request.environ.get("beaker.session", {})
+    session_id = request.get_cookie(SESSION_COOKIE)
+    if session_id:
+        auth_cache.invalidate(session_id)
     try:
         session.invalidate()
     except AttributeError:
@@ -289,6 +409,7 @@ def admin_only(handler):
 
 
 @app.route("/authenticated")
+@cache_decision("authenticated")
 @authenticated
 def is_authenticated():
     """get user information if it is authenticated
@@ -300,6 +421,7 @@ def is_authenticated():
 
 
 @app.route("/authorized")
+@cache_decision("authorized")
 @authenticated
 @admin_only
 def is_authorized():
@@ -312,6 +434,7 @@ def is_authorized():
 
 
 @app.route("/package_authorized/<package_name>")
+@cache_decision("package_authorized:{package_name}")
 @authenticated
 def is_package_authorized(package_name):
     """
@@ -370,10 +493,12 @@ def add_package_user(package_name, username):
         raise j.exceptions.Validation(f"can't add admin to non installed package {package_name}")
     package.admins.append(username)
     j.servers.threebot.default.packages.save()
+    auth_cache.invalidate()
 
 
 def get_package_admins(package_name):
-    package = j.servers.threebot.default.packages.get(package_name)
-    if not package:
+    # read admins from the packages info directly, without loading the package
+    package_info = j.servers.threebot.default.packages.packages.get(package_name)
+    if not package_info:
         raise j.exceptions.Validation(f"package {package_name} is not installed")
-    return package.admins
+    return package_info.get("admins", [])
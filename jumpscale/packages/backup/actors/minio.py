@@ -31,7 +31,7 @@ class MinioBackup(BaseActor):
             raise j.exceptions.Value("Please configure backup first")
         return j.tools.restic.get(INSTANCE_NAME)
 
-    @actor_method
+    @actor_method(is_async=True, executor="thread")
     def backup(self, tags=None) -> str:
         if tags:
             tags = tags.split(",")
@@ -51,7 +51,7 @@ class MinioBackup(BaseActor):
         result = list(reversed(instance.list_snapshots(tags=tags)))
         return j.data.serializers.json.dumps({"data": result})
 
-    @actor_method
+    @actor_method(is_async=True, executor="thread")
     def restore(self) -> str:
         instance = self._get_instance()
         instance.restore("/")
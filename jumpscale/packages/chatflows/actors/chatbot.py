@@ -1,17 +1,138 @@
 from jumpscale.servers.gedis.baseactor import BaseActor, actor_method
 from jumpscale.loader import j
+from jumpscale.sals.chatflows.metrics import steps_metrics
+from jumpscale.sals.chatflows.sessions import MAX_SESSIONS, SESSION_IDLE_TIMEOUT, SessionStore, get_session_size
+from collections import OrderedDict
+from time import monotonic, perf_counter
 import base64
 import sys
 import uuid
 import importlib
 import os
+import gevent
+
+# seconds between idle sessions checks
+REAPER_INTERVAL = 60
+# seconds between heartbeats of sessions events streams
+EVENTS_HEARTBEAT = 15
 
 
 class ChatFlows(BaseActor):
     def __init__(self):
         super().__init__()
+        # chat modules paths by package and chat name, modules are imported on first use
         self.chats = {}
-        self.sessions = {}
+        # imported chat modules by path: (mtime, module, import time)
+        self._modules = {}
+        self._sys_paths = (None, [])
+        # live sessions, least recently used first
+        self.sessions = OrderedDict()
+        self.store = SessionStore()
+        self._sessions_created = {}
+        self._sessions_accessed = {}
+        self._reaped_count = 0
+        self._evicted_count = 0
+        self._reaper = None
+
+    @property
+    def idle_timeout(self):
+        return j.core.config.get("CHATFLOWS_SESSION_IDLE_TIMEOUT", SESSION_IDLE_TIMEOUT)
+
+    @property
+    def max_sessions(self):
+        return j.core.config.get("CHATFLOWS_MAX_SESSIONS", MAX_SESSIONS)
+
+    def _add_session(self, chatflow):
+        session_id = chatflow.session_id
+        self.sessions[session_id] = chatflow
+        self._sessions_created[session_id] = monotonic()
+        self._touch_session(session_id)
+
+        # evict least recently used sessions, their checkpoints are kept so they can be rehydrated later
+        while len(self.sessions) > self.max_sessions:
+            oldest_session_id = next(iter(self.sessions))
+            j.logger.info(f"evicting chatflow session {oldest_session_id}, max sessions reached")
+            self._remove_session(oldest_session_id)
+            self._evicted_count += 1
+
+        self._start_reaper()
+
+    def _touch_session(self, session_id):
+        self.sessions.move_to_end(session_id)
+        self._sessions_accessed[session_id] = monotonic()
+
+    def _remove_session(self, session_id, delete_checkpoint=False):
+        chatflow = self.sessions.pop(session_id, None)
+        self._sessions_created.pop(session_id, None)
+        self._sessions_accessed.pop(session_id, None)
+        if delete_checkpoint:
+            self.store.delete(session_id)
+
+        if chatflow:
+            # kill greenlets blocked on the session queues, so the session and the objects it holds can be freed
+            for greenlet in (chatflow._greenlet, chatflow._fetch_greenlet):
+                if greenlet and not greenlet.dead and greenlet is not gevent.getcurrent():
+                    greenlet.kill(block=False)
+
+    def _is_idle(self, session_id, now):
+        chatflow = self.sessions[session_id]
+        if chatflow._fetch_greenlet and not chatflow._fetch_greenlet.ready():
+            # a client is waiting for the session output
+            return False
+        return now - self._sessions_accessed.get(session_id, now) > self.idle_timeout
+
+    def _reap_idle_sessions(self):
+        now = monotonic()
+        for session_id in [session_id for session_id in self.sessions if self._is_idle(session_id, now)]:
+            j.logger.info(f"removing idle chatflow session {session_id}")
+            self._remove_session(session_id)
+            self._reaped_count += 1
+
+    def _reap(self):
+        while True:
+            gevent.sleep(REAPER_INTERVAL)
+            try:
+                self._reap_idle_sessions()
+            except Exception as e:
+                j.logger.exception("error while removing idle chatflow sessions", exception=e)
+
+    def _start_reaper(self):
+        if self._reaper is None or self._reaper.dead:
+            self._reaper = gevent.spawn(self._reap)
+
+    def _get_session(self, session_id):
+        """Get a live session, or rehydrate it from its checkpoint if it's not in memory
+
+        Arguments:
+            session_id {str} -- session id
+
+        Returns:
+            GedisChatBot -- chatflow session or None if not found
+        """
+        chatflow = self.sessions.get(session_id)
+        if chatflow:
+            self._touch_session(session_id)
+            return chatflow
+
+        checkpoint = self.store.get(session_id)
+        if not checkpoint or not checkpoint.get("name"):
+            return None
+
+        package, chat = checkpoint["name"]
+        if chat not in self.chats.get(package, {}):
+            return None
+        chatflow_class = self._get_chat(package, chat)
+
+        # the session may be rehydrated by another request while waiting for the checkpoint
+        if session_id in self.sessions:
+            return self.sessions[session_id]
+
+        j.logger.info(f"restoring chatflow session {session_id} of {package}.{chat} at step {checkpoint['step']}")
+        chatflow = chatflow_class.new_session(
+            checkpoint["kwargs"], store=self.store, name=[package, chat], checkpoint=checkpoint
+        )
+        self._add_session(chatflow)
+        return chatflow
 
     @actor_method
     def new(self, package: str, chat: str, client_ip: str, query_params: dict = None) -> dict:
@@ -19,43 +140,124 @@ class ChatFlows(BaseActor):
         if not package_object:
             raise j.exceptions.Value(f"Package {package} not found")
 
-        chatflow = package_object.get(chat)
-        if not chatflow:
+        if chat not in package_object:
             raise j.exceptions.Value(f"Chat {chat} not found")
 
+        chatflow = self._get_chat(package, chat)
         if query_params is None:
             query_params = {}
-        obj = chatflow(**query_params)
-        self.sessions[obj.session_id] = obj
+        obj = chatflow.new_session(query_params, store=self.store, name=[package, chat])
+        self._add_session(obj)
         return {"sessionId": obj.session_id, "title": obj.title}
 
     @actor_method
     def fetch(self, session_id: str, restore: bool = False) -> dict:
-        chatflow = self.sessions.get(session_id)
+        chatflow = self._get_session(session_id)
         if not chatflow:
             return {"payload": {"category": "end"}}
 
         result = chatflow.get_work(restore)
 
-        if result.get("category") == "end":
-            self.sessions.pop(session_id)
+        if result and result.get("payload", {}).get("category") == "end":
+            self._remove_session(session_id, delete_checkpoint=True)
+        elif session_id in self.sessions:
+            self._touch_session(session_id)
 
         return result
 
+    @actor_method(stream=True)
+    def events(self, session_id: str, restore: bool = False) -> dict:
+        """Stream the session outputs as soon as they are sent, instead of fetching them one by one
+
+        An empty dict is sent every `EVENTS_HEARTBEAT` seconds without outputs, the stream ends with the `end` output
+        or when a `fetch` call takes over the session. Concurrent `events` calls of the same session share its outputs,
+        so a reconnecting or second browser tab does not end the other streams
+
+        Arguments:
+            session_id {str} -- session id
+
+        Keyword Arguments:
+            restore {bool} -- start with the last sent output (default: {False})
+
+        Yields:
+            dict -- session outputs
+        """
+        chatflow = self._get_session(session_id)
+        if not chatflow:
+            yield {"payload": {"category": "end"}}
+            return
+
+        for result in chatflow.stream_work(restore, heartbeat=EVENTS_HEARTBEAT):
+            if result.get("payload", {}).get("category") == "end":
+                self._remove_session(session_id, delete_checkpoint=True)
+            elif session_id in self.sessions:
+                self._touch_session(session_id)
+            yield result
+
     @actor_method
     def validate(self, session_id: str) -> dict:
-        return {"valid": session_id in self.sessions}
+        return {"valid": self._get_session(session_id) is not None}
 
     @actor_method
     def report(self, session_id: str, result: str = None):
-        chatflow = self.sessions.get(session_id)
+        chatflow = self._get_session(session_id)
+        if not chatflow:
+            raise j.exceptions.NotFound(f"session {session_id} not found")
         chatflow.set_work(result)
 
     @actor_method
     def back(self, session_id: str):
-        chatflow = self.sessions.get(session_id)
+        chatflow = self._get_session(session_id)
+        if not chatflow:
+            raise j.exceptions.NotFound(f"session {session_id} not found")
         chatflow.go_back()
 
+    @actor_method
+    def sessions_stats(self) -> dict:
+        """Get live sessions stats
+
+        Returns:
+            dict -- live sessions with their age, idle time (in seconds) and approximate memory (in bytes),
+                    and the number of sessions removed for being idle or evicted for reaching max sessions
+        """
+        now = monotonic()
+        sessions = []
+        for session_id, chatflow in self.sessions.items():
+            sessions.append(
+                {
+                    "session_id": session_id,
+                    "chat": ".".join(chatflow._name or []),
+                    "title": chatflow.title,
+                    "step": chatflow._current_step + 1,
+                    "age": now - self._sessions_created.get(session_id, now),
+                    "idle": now - self._sessions_accessed.get(session_id, now),
+                    "memory": get_session_size(chatflow),
+                }
+            )
+
+        return {
+            "count": len(sessions),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "reaped": self._reaped_count,
+            "evicted": self._evicted_count,
+            "memory": sum(session["memory"] for session in sessions),
+            "sessions": sessions,
+        }
+
+    @actor_method
+    def steps_metrics(self, chat: str = None, days: int = None) -> dict:
+        """Get chatflows steps metrics, see `jumpscale.sals.chatflows.metrics`
+
+        Keyword Arguments:
+            chat {str} -- chatflow name as `<package>.<chat>`, all chatflows if not set (default: {None})
+            days {int} -- number of days to sum metrics over, up to 7 days (default: {None})
+
+        Returns:
+            dict -- steps metrics by chatflow, with completion rates and average server and user think times
+        """
+        return steps_metrics.get(chat, days)
+
     @actor_method
     def chatflows_list(self) -> list:
         return list(self.chats.keys())
@@ -67,40 +269,84 @@ class ChatFlows(BaseActor):
                 name = j.sals.fs.stem(path)
                 yield path, package, name
 
-    def _import_path(self, filepath):
-        absolute_path = os.path.abspath(filepath)
-        paths = sys.path[:]
-        paths.sort(key=lambda p: len(p), reverse=True)
-        for syspath in paths:
-            absolute_sys_path = os.path.abspath(syspath)
-            if absolute_path.startswith(absolute_sys_path):
+    def _get_module_name(self, absolute_path):
+        # sys.path is only sorted again when it changes
+        key = tuple(sys.path)
+        if self._sys_paths[0] != key:
+            paths = sorted({os.path.abspath(p) for p in sys.path}, key=len, reverse=True)
+            self._sys_paths = (key, paths)
+
+        for absolute_sys_path in self._sys_paths[1]:
+            if absolute_path.startswith(absolute_sys_path + os.path.sep):
                 parts = absolute_path[len(absolute_sys_path) + 1 : -3].split(os.path.sep)
                 if "__init__" in parts:
                     parts.remove("__init__")
-                module_name = ".".join(parts)
-                break
-        else:
-            module_name = absolute_path
+                return ".".join(parts)
+        return absolute_path
 
+    def _import_path(self, filepath):
+        absolute_path = os.path.abspath(filepath)
+        module_name = self._get_module_name(absolute_path)
         spec = importlib.util.spec_from_file_location(module_name, absolute_path)
         module = importlib.util.module_from_spec(spec)
         sys.modules[module_name] = module
         spec.loader.exec_module(module)
         return module
 
+    def _get_chat(self, package, chat):
+        """Get a chatflow class, its module is imported on first use and imported again only if the file is modified
+
+        Arguments:
+            package {str} -- package name
+            chat {str} -- chat name
+
+        Returns:
+            type -- chatflow class
+        """
+        path = self.chats[package][chat]
+        mtime = os.stat(path).st_mtime
+        cached = self._modules.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1].chat
+
+        started = perf_counter()
+        module = self._import_path(path)
+        import_time = perf_counter() - started
+        j.logger.debug(f"imported chat {package}.{chat} in {import_time:.3f}s")
+        self._modules[path] = (mtime, module, import_time)
+        return module.chat
+
+    @actor_method
+    def modules_stats(self) -> dict:
+        """Get chat modules import stats
+
+        Returns:
+            dict -- chats by package, with whether their modules are imported and how long the last import took
+                    (in seconds)
+        """
+        stats = {}
+        for package, chats in self.chats.items():
+            stats[package] = {}
+            for chat, path in chats.items():
+                cached = self._modules.get(path)
+                stats[package][chat] = {
+                    "path": path,
+                    "loaded": cached is not None,
+                    "import_time": cached[2] if cached else None,
+                }
+        return stats
+
     @actor_method
     def load(self, path: str):
+        # chats are only registered here, their modules are imported by `new` (or when a session is rehydrated)
         for path, package, chat in self._scan_chats(path):
-            module = self._import_path(path)
-            if package not in self.chats:
-                self.chats[package] = {}
-
-            self.chats[package][chat] = module.chat
+            self.chats.setdefault(package, {})[chat] = path
 
     @actor_method
     def unload(self, path: str):
-        for _, package, chat in self._scan_chats(path):
-            self.chats[package].pop(chat)
+        for path, package, chat in self._scan_chats(path):
+            self.chats.get(package, {}).pop(chat, None)
+            self._modules.pop(path, None)
 
 
 Actor = ChatFlows
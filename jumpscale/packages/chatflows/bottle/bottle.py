@@ -1,4 +1,6 @@
-from bottle import Bottle, abort, request
+import json
+
+from bottle import Bottle, abort, request, response
 
 from jumpscale.loader import j
 from jumpscale.packages.auth.bottle.auth import login_required
@@ -27,3 +29,30 @@ def chat(package_name, chat_name):
     return env.get_template("index.html").render(
         package=package_name, chat=chat_name, username=session.get("username", ""), email=session.get("email", "")
     )
+
+
+@app.route("/sessions/<session_id>/events")
+@login_required
+def session_events(session_id):
+    """Push chatflow session outputs to the browser as server-sent events
+
+    Outputs are sent as `data` events, and heartbeats as comments to keep the connection open through proxies
+    """
+    threebot = j.servers.threebot.get()
+    result = threebot.gedis.execute("chatflows_chatbot", "events", session_id, restore=request.query.restore == "true")
+    if not result["success"]:
+        abort(500, result["error"])
+
+    response.content_type = "text/event-stream"
+    response.set_header("Cache-Control", "no-cache")
+    # disable nginx proxy buffering, so events are sent as soon as they are produced
+    response.set_header("X-Accel-Buffering", "no")
+
+    def stream():
+        for output in result["result"]:
+            if not output:
+                yield ": heartbeat\n\n"
+            else:
+                yield f"data: {json.dumps(output)}\n\n"
+
+    return stream()
@@ -3,7 +3,7 @@ from bottle import Bottle
 from jumpscale.loader import j
 from jumpscale.packages.auth.bottle.auth import admin_only, login_required
 from jumpscale.packages.polls.chats.threefold import VOTES
-from jumpscale.sals.chatflows.polls import all_users
+from jumpscale.sals.chatflows.polls import all_users, poll_tally
 
 app = Bottle()
 
@@ -42,3 +42,11 @@ def names():
         data["names"].append(voter.extra_data.get("full_name", tname))
     data["-Number of voters"] = all_users.count
     return data
+
+
+@app.route("/api/tally/<poll_name>/rebuild", method="POST")
+@login_required
+@admin_only
+def rebuild_tally(poll_name):
+    tally = poll_tally.rebuild(poll_name)
+    return {"voters": tally["voters"]}
@@ -45,9 +45,8 @@ class Example2(Poll):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.QUESTIONS = {}
-        self.extra_data = {}
-        self.custom_answers = {}
+        # all questions are known up front, so results can be shown by sessions restored at the result step
+        self.QUESTIONS = {vote["title"]: vote["options"] for vote in VOTES.values()}
 
     def welcome(self):
 
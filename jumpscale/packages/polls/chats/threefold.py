@@ -62,8 +62,6 @@ class TFPoll(Poll):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.extra_data = {}
-        self.custom_answers = {}
         self.metadata = {"new_title_keys": NEW_TITLE_KEYS}
         self.QUESTIONS = {vote["title"]: vote["options"] for vote in VOTES.values()}
 
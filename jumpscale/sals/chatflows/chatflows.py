@@ -7,7 +7,9 @@ import json
 import gevent
 import gevent.queue
 import html
+from time import monotonic
 from jumpscale.loader import j
+from jumpscale.sals.chatflows.metrics import COMPLETED, FAILED, INTERRUPTED, STOPPED, steps_metrics
 import stellar_sdk
 
 
@@ -35,7 +37,7 @@ class Form:
         self._session.send_data(
             {"category": "form", "msg": msg, "fields": self.fields, "kwargs": kwargs}, is_slide=True
         )
-        results = j.data.serializers.json.loads(self._session._queue_in.get())
+        results = j.data.serializers.json.loads(self._session._get_input())
         for result, resobject in zip(results, self.results):
             resobject.value = result
 
@@ -83,13 +85,20 @@ class GedisChatBot:
     title = "Zero Chat Bot"
     alert_view_url = None
 
+    # set by `new_session`, before `__init__` is called
+    _store = None
+    _name = None
+    _restore_from = None
+
     def __init__(self, **kwargs):
         """
         Keyword Args
             any extra kwargs that is passed while creating the session
             (i.e. can be used for passing any query parameters)
         """
-        self.session_id = str(uuid.uuid4())
+        checkpoint = self._restore_from
+        self._restore_from = None
+        self.session_id = checkpoint["session_id"] if checkpoint else str(uuid.uuid4())
         self.kwargs = kwargs
         self.spawn = kwargs.get("spawn", True)
         self._state = {}
@@ -98,10 +107,68 @@ class GedisChatBot:
         self._last_output = None
         self._fetch_greenlet = None
         self._greenlet = None
+        # queues of `stream_work` consumers, outputs are sent to all of them by `_streams_greenlet`
+        self._streams_queues = []
+        self._streams_greenlet = None
         self._queue_out = gevent.queue.Queue()
         self._queue_in = gevent.queue.Queue()
+        # seconds spent waiting for the user input, used by steps metrics
+        self._think_time = 0.0
+        if checkpoint:
+            self._restore_checkpoint(checkpoint)
         self._start()
 
+    @classmethod
+    def new_session(cls, kwargs=None, store=None, name=None, checkpoint=None):
+        """Create a chatflow session that saves checkpoints to a session store
+
+        Arguments:
+            kwargs {dict} -- session kwargs, e.g. query parameters (default: {None})
+            store {SessionStore} -- checkpoints store (default: {None})
+            name {list} -- [package, chat] names, used to find the chatflow when rehydrating the session (default: {None})
+            checkpoint {dict} -- checkpoint to restore the session from (default: {None})
+
+        Returns:
+            GedisChatBot -- chatflow session
+        """
+        session = cls.__new__(cls)
+        session._store = store
+        session._name = name
+        session._restore_from = checkpoint
+        session.__init__(**(kwargs or {}))
+        return session
+
+    def _save_checkpoint(self):
+        if not self._store:
+            return
+
+        state = {}
+        for key, value in self._state.items():
+            try:
+                json.dumps(value)
+            except (TypeError, ValueError):
+                continue
+            state[key] = value
+
+        self._store.save(
+            self.session_id,
+            {
+                "session_id": self.session_id,
+                "name": self._name,
+                "kwargs": self.kwargs,
+                "step": self._current_step,
+                "state": state,
+                "steps_info": self._steps_info,
+                "last_output": self._last_output,
+            },
+        )
+
+    def _restore_checkpoint(self, checkpoint):
+        self._current_step = checkpoint["step"]
+        self._state.update(checkpoint["state"])
+        self._steps_info = {int(step): info for step, info in checkpoint["steps_info"].items()}
+        # the last output is not restored, the checkpointed step is executed again and sends its first slide
+
     @property
     def step_info(self):
         return self._steps_info.setdefault(self._current_step, {"slide": 0})
@@ -143,9 +210,25 @@ class GedisChatBot:
 
         def wrapper(step_name):
             internal_error = False
+            step_index = self._current_step
+            started = monotonic()
+            think_time = self._think_time
+
+            def step_finished(result):
+                step_think_time = self._think_time - think_time
+                server_time = monotonic() - started - step_think_time
+                steps_metrics.step_finished(
+                    self._chat_name, step_index, step_name, result, server_time, step_think_time
+                )
+
+            steps_metrics.step_started(self._chat_name, step_index, step_name)
             try:
                 getattr(self, step_name)()
+            except gevent.GreenletExit:
+                step_finished(INTERRUPTED)
+                raise
             except StopChatFlow as e:
+                step_finished(STOPPED)
                 internal_error = True
                 j.logger.exception(f"chatflow stopped in step {step_name}. exception: {str(e)}", exception=e)
                 traceback_info = j.tools.errorhandler.get_traceback()
@@ -164,6 +247,7 @@ class GedisChatBot:
                 self.send_data({"category": "end"})
 
             except Exception as e:
+                step_finished(FAILED)
                 message = "Something wrong happened"
                 if isinstance(e, stellar_sdk.exceptions.BadRequestError) and "op_underfunded" in e.extras.get(
                     "result_codes", {}
@@ -202,6 +286,7 @@ class GedisChatBot:
                 self.send_data({"category": "end"})
 
             if not internal_error:
+                step_finished(COMPLETED)
                 if self.is_last_step:
                     self.send_data({"category": "end"})
                 else:
@@ -210,6 +295,7 @@ class GedisChatBot:
 
         step_name = self.steps[self._current_step]
         self.step_info["slide"] = 0
+        self._save_checkpoint()
 
         if spawn:
             self._greenlet = gevent.spawn(wrapper, step_name)
@@ -233,6 +319,19 @@ class GedisChatBot:
         self._greenlet.kill()
         return self._execute_current_step()
 
+    @property
+    def _chat_name(self):
+        if self._name:
+            return ".".join(self._name)
+        return self.__class__.__name__
+
+    def _get_input(self):
+        started = monotonic()
+        try:
+            return self._queue_in.get()
+        finally:
+            self._think_time += monotonic() - started
+
     def get_work(self, restore=False):
         if self._fetch_greenlet:
             if not self._fetch_greenlet.ready():
@@ -247,6 +346,66 @@ class GedisChatBot:
         if not isinstance(result, gevent.GreenletExit):
             return result
 
+    def _send_to_streams(self):
+        try:
+            while True:
+                output = self._queue_out.get()
+                for queue in list(self._streams_queues):
+                    queue.put(output)
+        finally:
+            # end the streams when a `get_work` call takes over or the session is removed
+            if self._streams_greenlet is gevent.getcurrent():
+                for queue in list(self._streams_queues):
+                    queue.put(None)
+
+    def stream_work(self, restore=False, heartbeat=None):
+        """Yield outputs as soon as they are sent, until the chatflow ends or a `get_work` call takes over
+
+        Concurrent consumers (e.g. the same session opened in two tabs) share the stream, every output is sent to all
+        of them
+
+        Keyword Arguments:
+            restore {bool} -- start with the last sent output (default: {False})
+            heartbeat {float} -- yield an empty dict if no output is sent within this number of seconds,
+                                 lets the consumer detect closed connections (default: {None})
+
+        Yields:
+            dict -- outputs
+        """
+        if restore and self._last_output:
+            yield self._last_output
+
+        queue = gevent.queue.Queue()
+        self._streams_queues.append(queue)
+        try:
+            if (
+                not self._streams_greenlet
+                or self._streams_greenlet.dead
+                or self._fetch_greenlet is not self._streams_greenlet
+            ):
+                # the first consumer takes over from `get_work` calls
+                if self._fetch_greenlet and not self._fetch_greenlet.ready():
+                    self._fetch_greenlet.kill()
+                self._streams_greenlet = self._fetch_greenlet = gevent.spawn(self._send_to_streams)
+
+            while True:
+                try:
+                    result = queue.get(timeout=heartbeat)
+                except gevent.queue.Empty:
+                    result = {}
+
+                if result is None:
+                    return
+
+                yield result
+                if result.get("payload", {}).get("category") == "end":
+                    return
+        finally:
+            self._streams_queues.remove(queue)
+            if not self._streams_queues and self._streams_greenlet:
+                streams_greenlet, self._streams_greenlet = self._streams_greenlet, None
+                streams_greenlet.kill(block=False)
+
     def set_work(self, data):
         return self._queue_in.put(data)
 
@@ -263,15 +422,15 @@ class GedisChatBot:
 
     def send_error(self, message, **kwargs):
         self.send_data({"category": "error", "msg": message, "kwargs": kwargs})
-        self._queue_in.get()
+        self._get_input()
 
     def ask(self, data):
         self.send_data(data, is_slide=True)
-        return self._queue_in.get()
+        return self._get_input()
 
     def user_info(self, **kwargs):
         self.send_data({"category": "user_info", "kwargs": kwargs})
-        result = j.data.serializers.json.loads(self._queue_in.get())
+        result = j.data.serializers.json.loads(self._get_input())
         return result
 
     def string_msg(self, msg, **kwargs):
@@ -567,7 +726,7 @@ class GedisChatBot:
         """
         qrcode = j.tools.qrcode.base64_get(data, scale=scale)
         self.send_data({"category": "qrcode_show", "msg": msg, "qrcode": qrcode, "kwargs": kwargs}, is_slide=True)
-        self._queue_in.get()
+        self._get_input()
 
     def md_msg(self, msg, **kwargs):
         return {"category": "md_show", "msg": msg, "kwargs": kwargs}
@@ -579,7 +738,7 @@ class GedisChatBot:
             msg (str): markdown string
         """
         self.send_data(self.md_msg(msg, **kwargs), is_slide=True)
-        self._queue_in.get()
+        self._get_input()
 
     def md_show_confirm(self, data, **kwargs):
         """Show a table contains the keys and values of the data dict
@@ -593,7 +752,7 @@ class GedisChatBot:
             msg = "Please make sure of the entered values before starting deployment"
 
         self.send_data({"category": "confirm", "data": data, "kwargs": kwargs, "msg": msg}, is_slide=True)
-        self._queue_in.get()
+        self._get_input()
 
     def loading_show(self, msg, wait, **kwargs):
         """Show a progress bar
@@ -606,11 +765,9 @@ class GedisChatBot:
             md (bool): render message as markdown
             html (bool): render message as html
         """
-        data = {"category": "loading", "msg": msg, "kwargs": kwargs}
-        for i in range(wait):
-            data["value"] = (i / wait) * 100
-            self.send_data(data)
-            gevent.sleep(1)
+        # the progress is animated by the client, instead of sending an output every second
+        self.send_data({"category": "loading", "msg": msg, "value": 0, "wait": wait, "kwargs": kwargs})
+        gevent.sleep(wait)
 
     def md_show_update(self, msg, **kwargs):
         self.send_data({"category": "infinite_loading", "msg": msg, "kwargs": kwargs}, is_slide=False)
@@ -0,0 +1,140 @@
+"""Chatflows steps metrics
+
+For every step of every chatflow, daily counters are kept in redis for `METRICS_DAYS` days:
+
+- `started`: number of step executions
+- `completed`: number of executions finished successfully
+- `failed`: number of executions failed with unexpected errors
+- `stopped`: number of executions stopped using `StopChatFlow` (e.g. failed payments)
+- `interrupted`: number of executions killed, because the user went back or the session was removed for being idle
+- `server_time`: seconds spent executing the step, excluding the time waiting for the user
+- `think_time`: seconds spent waiting for the user input
+
+Executions not finished by any of the above are still running or were left by their users.
+"""
+import time
+
+from jumpscale.loader import j
+
+METRICS_KEY = "chatflows:metrics:{}:{}"
+METRICS_DAYS = 7
+
+COMPLETED = "completed"
+FAILED = "failed"
+STOPPED = "stopped"
+INTERRUPTED = "interrupted"
+
+RESULTS = (COMPLETED, FAILED, STOPPED, INTERRUPTED)
+
+
+def _get_day(days_ago=0):
+    return time.strftime("%Y%m%d", time.gmtime(time.time() - days_ago * 24 * 60 * 60))
+
+
+class StepsMetrics:
+    def __init__(self, days=METRICS_DAYS):
+        self.days = days
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = j.core.db
+        return self._db
+
+    def _key(self, chat, day):
+        return METRICS_KEY.format(chat, day)
+
+    def _update(self, chat, increments):
+        key = self._key(chat, _get_day())
+        try:
+            pipeline = self.db.pipeline()
+            for field, value in increments.items():
+                if isinstance(value, int):
+                    pipeline.hincrby(key, field, value)
+                else:
+                    pipeline.hincrbyfloat(key, field, value)
+            pipeline.expire(key, self.days * 24 * 60 * 60)
+            pipeline.execute()
+        except Exception as e:
+            j.logger.warning(f"couldn't save metrics of chatflow {chat}: {e}")
+
+    def step_started(self, chat, index, step):
+        """Count a step execution, metrics are best-effort, errors are logged only
+
+        Arguments:
+            chat {str} -- chatflow name, e.g. `<package>.<chat>`
+            index {int} -- step index
+            step {str} -- step name
+        """
+        self._update(chat, {f"{index}:{step}:started": 1})
+
+    def step_finished(self, chat, index, step, result, server_time, think_time):
+        """Count a finished step execution and its durations
+
+        Arguments:
+            chat {str} -- chatflow name, e.g. `<package>.<chat>`
+            index {int} -- step index
+            step {str} -- step name
+            result {str} -- one of `RESULTS`
+            server_time {float} -- seconds spent executing the step, excluding `think_time`
+            think_time {float} -- seconds spent waiting for the user input
+        """
+        self._update(
+            chat,
+            {
+                f"{index}:{step}:{result}": 1,
+                f"{index}:{step}:server_time": float(server_time),
+                f"{index}:{step}:think_time": float(think_time),
+            },
+        )
+
+    def _get_chats(self, days):
+        chats = set()
+        for days_ago in range(days):
+            pattern = self._key("*", _get_day(days_ago))
+            prefix, suffix = pattern.split("*")
+            for key in self.db.scan_iter(match=pattern):
+                chats.add(key.decode()[len(prefix) : -len(suffix)])
+        return chats
+
+    def get(self, chat=None, days=None):
+        """Get steps metrics summed over the last days
+
+        Keyword Arguments:
+            chat {str} -- chatflow name, all chatflows if None (default: {None})
+            days {int} -- number of days, up to the kept days (default: {None})
+
+        Returns:
+            dict -- steps metrics by chatflow, steps are ordered by their index
+        """
+        days = min(days or self.days, self.days)
+        chats = [chat] if chat else sorted(self._get_chats(days))
+
+        metrics = {}
+        for chat_name in chats:
+            steps = {}
+            for days_ago in range(days):
+                for field, value in self.db.hgetall(self._key(chat_name, _get_day(days_ago))).items():
+                    index, step, name = field.decode().split(":")
+                    step_metrics = steps.get((int(index), step))
+                    if step_metrics is None:
+                        step_metrics = steps[(int(index), step)] = dict.fromkeys(("started",) + RESULTS, 0)
+                        step_metrics.update(server_time=0.0, think_time=0.0)
+                    step_metrics[name] += float(value) if name.endswith("_time") else int(value)
+
+            metrics[chat_name] = [self._summarize(index, step, steps[(index, step)]) for index, step in sorted(steps)]
+        return metrics
+
+    def _summarize(self, index, step, step_metrics):
+        finished = sum(step_metrics[result] for result in RESULTS)
+        summary = dict(step_metrics, index=index, step=step)
+        summary["completion_rate"] = (
+            step_metrics[COMPLETED] / step_metrics["started"] if step_metrics["started"] else None
+        )
+        summary["avg_server_time"] = step_metrics["server_time"] / finished if finished else None
+        summary["avg_think_time"] = step_metrics["think_time"] / finished if finished else None
+        return summary
+
+
+steps_metrics = StepsMetrics()
@@ -1,5 +1,8 @@
 from textwrap import dedent
 
+import gevent
+from gevent.event import Event
+
 from jumpscale.core.base import StoredFactory
 from jumpscale.loader import j
 from jumpscale.sals.chatflows.chatflows import GedisChatBot, chatflow_step
@@ -7,11 +10,218 @@ from jumpscale.sals.chatflows.models.voter_model import User
 
 WALLET_NAME = "polls_receive"
 MANIFESTO_VERSION = "2.0.1"
+TALLY_KEY = "polls:tally:{}"
+# seconds between checks of new transactions of the polls wallet, while voters are waiting for their payments
+PAYMENTS_CHECK_INTERVAL = 5
+# seconds between updates of the payment message shown to voters
+PAYMENT_MESSAGE_INTERVAL = 10
 
 all_users = StoredFactory(User)
 all_users.always_reload = True
 
 
+class PollTally:
+    """Votes tally of polls, kept in a redis hash per poll and updated on every vote,
+    so results are read without loading the stored users
+
+    Hash fields are `voters` and `votes:<question>:<index>` / `weighted:<question>:<index>` for every answer option
+    """
+
+    def __init__(self):
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = j.core.db
+        return self._db
+
+    def _key(self, poll_name):
+        return TALLY_KEY.format(poll_name)
+
+    def _add(self, pipeline, key, vote_data, vote_data_weighted, sign=1):
+        for kind, data in (("votes", vote_data), ("weighted", vote_data_weighted)):
+            for question, answers in data.items():
+                for index, value in enumerate(answers):
+                    if value:
+                        pipeline.hincrbyfloat(key, f"{kind}:{question}:{index}", sign * value)
+
+    def update(self, user, previous_vote_data=None, previous_vote_data_weighted=None):
+        """Add a user vote to its poll tally, replacing the user previous vote if any
+
+        Arguments:
+            user {User} -- voter, already saved with the new vote
+
+        Keyword Arguments:
+            previous_vote_data {dict} -- user previous votes, None if it's a new voter (default: {None})
+            previous_vote_data_weighted {dict} -- user previous weighted votes (default: {None})
+        """
+        key = self._key(user.poll_name)
+        if not self.db.exists(key):
+            self.rebuild(user.poll_name)
+            return
+
+        pipeline = self.db.pipeline()
+        if previous_vote_data is None:
+            pipeline.hincrby(key, "voters", 1)
+        else:
+            self._add(pipeline, key, previous_vote_data, previous_vote_data_weighted or {}, sign=-1)
+        self._add(pipeline, key, user.vote_data, user.vote_data_weighted)
+        pipeline.execute()
+
+    def get(self, poll_name):
+        """Get a poll tally, it's rebuilt from the stored users if not found
+
+        Arguments:
+            poll_name {str} -- poll name
+
+        Returns:
+            dict -- `voters` count, `votes` and `weighted` sums of every answer option by question
+        """
+        fields = self.db.hgetall(self._key(poll_name))
+        if not fields:
+            return self.rebuild(poll_name)
+
+        tally = {"voters": 0, "votes": {}, "weighted": {}}
+        for field, value in fields.items():
+            field = field.decode()
+            if field == "voters":
+                tally["voters"] = int(value)
+                continue
+
+            kind, rest = field.split(":", 1)
+            question, index = rest.rsplit(":", 1)
+            tally[kind].setdefault(question, {})[int(index)] = float(value)
+
+        for kind in ("votes", "weighted"):
+            for question, values in tally[kind].items():
+                answers = [0.0] * (max(values) + 1)
+                for index, value in values.items():
+                    answers[index] = value
+                tally[kind][question] = answers
+        return tally
+
+    def rebuild(self, poll_name):
+        """Recompute a poll tally from the stored users, every user is loaded once
+
+        Arguments:
+            poll_name {str} -- poll name
+
+        Returns:
+            dict -- rebuilt tally, same as `get`
+        """
+        tally = {"voters": 0, "votes": {}, "weighted": {}}
+        for username in all_users.list_all():
+            user = all_users.get(username)
+            if user.poll_name != poll_name or not user.has_voted:
+                continue
+
+            tally["voters"] += 1
+            for kind, data in (("votes", user.vote_data), ("weighted", user.vote_data_weighted)):
+                for question, answers in data.items():
+                    total = tally[kind].get(question)
+                    if total is None:
+                        tally[kind][question] = list(answers)
+                    else:
+                        tally[kind][question] = [a + b for a, b in zip(total, answers)]
+
+        key = self._key(poll_name)
+        mapping = {"voters": tally["voters"]}
+        for kind in ("votes", "weighted"):
+            for question, answers in tally[kind].items():
+                for index, value in enumerate(answers):
+                    mapping[f"{kind}:{question}:{index}"] = value
+
+        pipeline = self.db.pipeline()
+        pipeline.delete(key)
+        pipeline.hset(key, mapping=mapping)
+        pipeline.execute()
+        return tally
+
+
+poll_tally = PollTally()
+
+
+class TransactionsWatcher:
+    """Watch a wallet for new transactions on behalf of all waiting sessions
+
+    Only one greenlet checks the wallet, and only while some session is waiting. It fetches the transactions
+    after the last seen cursor (the full history is fetched once), keeps their hashes by memo text
+    and wakes up the sessions waiting for these memo texts
+    """
+
+    def __init__(self, wallet_name, interval=PAYMENTS_CHECK_INTERVAL):
+        self.wallet_name = wallet_name
+        self.interval = interval
+        self._cursor = ""
+        self._transactions = {}
+        self._waiters = {}
+        self._greenlet = None
+
+    @property
+    def wallet(self):
+        return j.clients.stellar.get(self.wallet_name)
+
+    def _check(self):
+        result = self.wallet.list_transactions(cursor=self._cursor)
+        self._cursor = result["cursor"]
+        for transaction in result["transactions"]:
+            if not transaction.memo_text:
+                continue
+
+            self._transactions.setdefault(transaction.memo_text, []).append(transaction.hash)
+            for event in self._waiters.get(transaction.memo_text, ()):
+                event.set()
+
+    def _watch(self):
+        while self._waiters:
+            try:
+                self._check()
+            except Exception as e:
+                j.logger.warning(f"couldn't check transactions of wallet {self.wallet_name}: {e}")
+            gevent.sleep(self.interval)
+        self._greenlet = None
+
+    def get_transactions(self, memo_text):
+        """Get hashes of the seen transactions with a memo text
+
+        Arguments:
+            memo_text {str} -- transaction memo text
+
+        Returns:
+            list -- transactions hashes
+        """
+        return list(self._transactions.get(memo_text, []))
+
+    def wait(self, memo_text, timeout=None):
+        """Wait for a new transaction with a memo text
+
+        Arguments:
+            memo_text {str} -- transaction memo text
+
+        Keyword Arguments:
+            timeout {float} -- max seconds to wait (default: {None})
+
+        Returns:
+            bool -- True if a new transaction was seen
+        """
+        event = Event()
+        waiters = self._waiters.setdefault(memo_text, set())
+        waiters.add(event)
+        if self._greenlet is None:
+            self._greenlet = gevent.spawn(self._watch)
+
+        try:
+            return event.wait(timeout)
+        finally:
+            waiters.discard(event)
+            if not waiters:
+                self._waiters.pop(memo_text, None)
+
+
+payments_watcher = TransactionsWatcher(WALLET_NAME)
+
+
 class Poll(GedisChatBot):
     """Polls chatflow base
     just inherit from this class and override poll_name and QUESTIONS in your chatflow
@@ -28,18 +238,50 @@ class Poll(GedisChatBot):
 
     steps = ["initialize", "welcome", "payment", "custom_votes", "result"]
 
+    _user = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.QUESTIONS = {}
-        self.extra_data = {}
         self.metadata = {}
-        self.custom_answers = {}
 
         if not j.clients.stellar.find(WALLET_NAME):
             raise j.core.exceptions.Runtime(f"Wallet {WALLET_NAME} is not configured, please create it.")
 
         self.wallet = j.clients.stellar.get(WALLET_NAME)
 
+    # the user name and answers are kept in `_state`, so they're saved with the session checkpoints
+    # and sessions restored at any step (e.g. after being idle or after a restart) can continue
+
+    @property
+    def user(self):
+        """Poll user of the session, set by `initialize`
+
+        Returns:
+            User: user object or None before `initialize`
+        """
+        user_name = self._state.get("user_name")
+        if user_name and (self._user is None or self._user.instance_name != user_name):
+            self._user = all_users.get(name=user_name)
+            self._user.poll_name = self.poll_name
+        return self._user
+
+    @property
+    def extra_data(self):
+        return self._state.setdefault("extra_data", {})
+
+    @extra_data.setter
+    def extra_data(self, value):
+        self._state["extra_data"] = value
+
+    @property
+    def custom_answers(self):
+        return self._state.setdefault("custom_answers", {})
+
+    @custom_answers.setter
+    def custom_answers(self, value):
+        self._state["custom_answers"] = value
+
     def _get_wallets_as_md(self, wallets):
         result = "\n"
         for item in wallets:
@@ -52,8 +294,7 @@ class Poll(GedisChatBot):
 
         username = user_info["username"].split(".")[0]
         welcome_message = f"# Welcome `{username}` to {self.poll_name.capitalize()} Poll\n<br/>The detailed poll results are only visible to the tfgrid council members"
-        self.user = all_users.get(name=f"{self.poll_name}_{username}")
-        self.user.poll_name = self.poll_name
+        self._state["user_name"] = f"{self.poll_name}_{username}"
         if self.user.has_voted:
             welcome_message += "\n<br/><br/>`Note: You have already voted.`"
 
@@ -124,6 +365,8 @@ class Poll(GedisChatBot):
 
         if not self.user.user_code:
             self.user.user_code = j.data.idgenerator.chars(10)
+            # keep the same code if the session is restored while waiting for the payment
+            self.user.save()
         # Payment
         if self.user.has_voted and len(self.user.wallets_addresses) > 0:
             self.md_show(
@@ -146,29 +389,32 @@ class Poll(GedisChatBot):
 
     def _check_payment(self, timeout):
         """Returns True if user has paid already, False if not"""
-        now = j.data.time.get().timestamp
-        remaning_time = j.data.time.get(now + timeout).timestamp
-        while remaning_time > now:
-            remaning_time_msg = j.data.time.get(remaning_time).humanize(granularity=["minute", "second"])
+        deadline = j.data.time.get().timestamp + timeout
+        while True:
+            now = j.data.time.get().timestamp
+            if now >= deadline:
+                return False
+
+            remaning_time_msg = j.data.time.get(deadline).humanize(granularity=["minute", "second"])
             payment_message = (
                 "# Payment being processed...\n"
                 f"Process will be cancelled if payment is not successful {remaning_time_msg}"
             )
             self.md_show_update(payment_message, md=True)
             user_wallets_count = len(self.user.wallets_addresses)
-            transactions = self.wallet.list_transactions()
-            for transaction in transactions:
-                if transaction.memo_text == self.user.user_code:
-                    if transaction.hash not in self.user.transaction_hashes:
-                        self.user.transaction_hashes.append(transaction.hash)
-                    user_wallet = self.wallet.get_sender_wallet_address(transaction.hash)
-                    if not user_wallet in self.user.wallets_addresses:
-                        self.user.wallets_addresses.append(user_wallet)
-                        self.user.tokens += float(self._get_voter_balance(user_wallet))
-                    self.user.save()
+            for transaction_hash in payments_watcher.get_transactions(self.user.user_code):
+                if transaction_hash in self.user.transaction_hashes:
+                    continue
+                self.user.transaction_hashes.append(transaction_hash)
+                user_wallet = self.wallet.get_sender_wallet_address(transaction_hash)
+                if not user_wallet in self.user.wallets_addresses:
+                    self.user.wallets_addresses.append(user_wallet)
+                    self.user.tokens += float(self._get_voter_balance(user_wallet))
+                self.user.save()
             if len(self.user.wallets_addresses) > user_wallets_count:
                 return True
-        return False
+
+            payments_watcher.wait(self.user.user_code, timeout=min(deadline - now, PAYMENT_MESSAGE_INTERVAL))
 
     def get_vote_answer(self, vote_title):
         answer_array = self.user.vote_data.get(vote_title)
@@ -187,12 +433,18 @@ class Poll(GedisChatBot):
         answers.update(self.custom_answers)
         vote_data = self._map_vote_results(answers.copy())
         vote_data_weighted = self._map_vote_results(answers.copy(), weighted=True)
+        previous_vote_data = previous_vote_data_weighted = None
+        if self.user.has_voted:
+            previous_vote_data = self.user.vote_data
+            previous_vote_data_weighted = self.user.vote_data_weighted
+
         self.user.vote_data = vote_data
         self.user.vote_data_weighted = vote_data_weighted
         self.user.has_voted = True
         self.user.extra_data = self.extra_data
         self.user.manifesto_version = MANIFESTO_VERSION
         self.user.save()
+        poll_tally.update(self.user, previous_vote_data, previous_vote_data_weighted)
 
     @chatflow_step(title="Please fill in the following form", disable_previous=True)
     def custom_votes(self):
@@ -225,27 +477,15 @@ class Poll(GedisChatBot):
 
     @chatflow_step(title="Poll Results %", final_step=True)
     def result(self):
-        usersnames = all_users.list_all()
-        total_votes = 0
-        total_answers = {}
-        total_answers_weighted = {}
-        for username in usersnames:
-            user = all_users.get(username)
-            if user.poll_name == self.poll_name and user.has_voted:
-                total_votes += 1
-                user_votes = all_users.get(username).vote_data
-                user_votes_weighted = all_users.get(username).vote_data_weighted
-                for question, answer in user_votes.items():
-                    if total_answers.get(question):
-                        total_answers[question] = list(map(sum, zip(total_answers[question], answer)))
-                    else:
-                        total_answers[question] = answer
-
-                for question, answer in user_votes_weighted.items():
-                    if total_answers_weighted.get(question):
-                        total_answers_weighted[question] = list(map(sum, zip(total_answers_weighted[question], answer)))
-                    else:
-                        total_answers_weighted[question] = answer
+        tally = poll_tally.get(self.poll_name)
+        total_votes = tally["voters"]
+        # keep the questions order
+        total_answers = {
+            question: tally["votes"][question] for question in self.QUESTIONS if question in tally["votes"]
+        }
+        total_answers_weighted = {
+            question: tally["weighted"][question] for question in self.QUESTIONS if question in tally["weighted"]
+        }
 
         total_answers_with_percent = {k: self._calculate_percent(v) for k, v in total_answers.items()}
         total_answers_weighted_with_percent = {k: self._calculate_percent(v) for k, v in total_answers_weighted.items()}
@@ -286,6 +526,8 @@ class Poll(GedisChatBot):
         """
         answers_list = answers[:]
         total_votes = float(sum(answers_list))
+        if not total_votes:
+            return [0.0] * len(answers_list)
         for i in range(len(answers_list)):
             res = (answers_list[i] / total_votes) * 100
             answers_list[i] = round(res, 2)
@@ -0,0 +1,117 @@
+"""Chatflow sessions checkpoints store
+
+Live chatflow sessions (`GedisChatBot` objects) are kept in memory by the chatflows actor, at every step boundary
+a session saves a checkpoint to redis with its current step, `_state`, slides info and last output.
+
+If a session is not found in memory (e.g. after a restart, an actor reload or if it was created by another process),
+it's rehydrated from its checkpoint and the flow continues from the beginning of the checkpointed step.
+
+Only JSON serializable values of `_state` are saved, so flows that need to survive restarts should keep
+the data needed by later steps in `self._state`.
+"""
+import json
+import sys
+import types
+
+import gevent
+import gevent.queue
+
+from jumpscale.loader import j
+
+SESSION_KEY = "chatflows:sessions:{}"
+# checkpoints of sessions without any progress for this number of seconds are removed
+SESSION_TTL = 24 * 60 * 60
+# live sessions not accessed for this number of seconds are removed from memory (their checkpoints are kept)
+SESSION_IDLE_TIMEOUT = 30 * 60
+# max number of live sessions, least recently used sessions are removed from memory first
+MAX_SESSIONS = 500
+
+
+class SessionStore:
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = j.core.db
+        return self._db
+
+    def _key(self, session_id):
+        return SESSION_KEY.format(session_id)
+
+    def save(self, session_id, checkpoint):
+        """Save a session checkpoint, errors are logged only as sessions can still run without being persisted
+
+        Arguments:
+            session_id {str} -- session id
+            checkpoint {dict} -- JSON serializable checkpoint
+        """
+        try:
+            self.db.set(self._key(session_id), json.dumps(checkpoint), ex=self.ttl)
+        except Exception as e:
+            j.logger.warning(f"couldn't save checkpoint of chatflow session {session_id}: {e}")
+
+    def get(self, session_id):
+        """Get a session checkpoint
+
+        Arguments:
+            session_id {str} -- session id
+
+        Returns:
+            dict -- checkpoint or None if not found
+        """
+        try:
+            checkpoint = self.db.get(self._key(session_id))
+        except Exception as e:
+            j.logger.warning(f"couldn't get checkpoint of chatflow session {session_id}: {e}")
+            return None
+
+        if checkpoint:
+            return json.loads(checkpoint)
+
+    def delete(self, session_id):
+        try:
+            self.db.delete(self._key(session_id))
+        except Exception as e:
+            j.logger.warning(f"couldn't delete checkpoint of chatflow session {session_id}: {e}")
+
+
+SHALLOW_TYPES = (str, bytes, type, types.ModuleType, gevent.Greenlet, gevent.queue.Queue, SessionStore)
+
+
+def get_session_size(session, max_depth=4):
+    """Get the approximate memory used by a session, by following its attributes up to `max_depth` levels
+
+    Greenlets, queues, classes, modules and the sessions store are counted without their contents.
+
+    Arguments:
+        session {GedisChatBot} -- chatflow session
+
+    Keyword Arguments:
+        max_depth {int} -- max depth of nested objects to follow (default: {4})
+
+    Returns:
+        int -- size in bytes
+    """
+    seen = set()
+
+    def sizeof(obj, depth):
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+
+        size = sys.getsizeof(obj, 0)
+        if depth >= max_depth or isinstance(obj, SHALLOW_TYPES):
+            return size
+
+        if isinstance(obj, dict):
+            size += sum(sizeof(key, depth + 1) + sizeof(value, depth + 1) for key, value in obj.items())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            size += sum(sizeof(item, depth + 1) for item in obj)
+        elif hasattr(obj, "__dict__"):
+            size += sizeof(obj.__dict__, depth + 1)
+        return size
+
+    return sizeof(session, 0)
@@ -43,7 +43,14 @@ from jumpscale.core.base import Base, fields
 from jumpscale.core.exceptions import Input
 from jumpscale.loader import j
 
-from .utils import DIR_PATH, render_config_template
+from .utils import DIR_PATH, forget_config_files, render_config_template, write_config_file
+
+
+# threebot main server, serving the auth package endpoints used by `auth_request`
+AUTH_SERVER_URL = "http://127.0.0.1:31000"
+# seconds nginx caches granted auth decisions, nginx cache can't be invalidated by the auth server,
+# so revoked access (e.g. removed admins) is still granted for up to this number of seconds
+AUTH_CACHE_TTL = 5
 
 
 class PORTS:
@@ -116,11 +123,22 @@ class Location(Base):
             location=self,
             threebot_connect=j.core.config.get_config().get("threebot_connect", True),
             https_port=PORTS.HTTPS,
+            auth_server_url=AUTH_SERVER_URL,
+            auth_cache_ttl=AUTH_CACHE_TTL,
         )
 
     def configure(self):
+        """Write the location configuration file
+
+        Returns:
+            bool: True if the configuration changed
+        """
         j.sals.fs.mkdir(self.cfg_dir)
-        j.sals.fs.write_file(self.cfg_file, self.get_config())
+        return write_config_file(self.cfg_file, self.get_config())
+
+    def clean(self):
+        j.sals.fs.rmtree(self.cfg_file)
+        forget_config_files(self.cfg_file)
 
 
 class AcmeServer(Enum):
@@ -304,6 +322,17 @@ class Website(Base):
         for location in self.locations.list_all():
             yield self.locations.get(location)
 
+    def remove_location(self, name):
+        """Remove a location and its configuration file
+
+        Args:
+            name (str): location name
+        """
+        location = self.locations.find(name)
+        if location:
+            location.clean()
+            self.locations.delete(name)
+
     def get_proxy_location(self, name):
         location = self.locations.get(name)
         location.location_type = LocationType.PROXY
@@ -360,6 +389,9 @@ class Website(Base):
                 j.logger.error(f"Certificate Generated successfully {out}")
                 break
 
+    def _self_signed_certificates_missing(self):
+        return not all(j.sals.fs.exists(f"{self.parent.cfg_dir}/{name}") for name in ("key.pem", "cert.pem"))
+
     def generate_self_signed_certificates(self):
         keypempath = f"{self.parent.cfg_dir}/key.pem"
         certpempath = f"{self.parent.cfg_dir}/cert.pem"
@@ -380,21 +412,39 @@ class Website(Base):
                 raise j.exceptions.JSException(f"Failed to generate self-signed certificate (using openssl).{res}")
 
     def configure(self, generate_certificates=True):
+        """Write the website and its locations configuration files, only files with changed content are written
+
+        Certificates are only generated if the configuration changed, or if ssl is enabled and the self-signed
+        certificates are missing
+
+        Args:
+            generate_certificates (bool, optional): generate certificates if ssl is enabled. Defaults to True.
+
+        Returns:
+            bool: True if the configuration changed (nginx needs to be reloaded)
+        """
         j.sals.fs.mkdir(self.cfg_dir)
         needed_dirs = ("body", "client-body", "fastcgi", "proxy", "scgi", "uwsgi")
         for d in needed_dirs:
             j.sals.fs.mkdir(j.sals.fs.join_paths(self.cfg_dir, d))
+
+        changed = False
         for location in self.get_locations():
-            location.configure()
+            changed = location.configure() or changed
+
+        changed = write_config_file(self.cfg_file, self.get_config()) or changed
+        if not changed and not (self.ssl and self._self_signed_certificates_missing()):
+            return False
 
-        j.sals.fs.write_file(self.cfg_file, self.get_config())
         if self.ssl:
             self.generate_self_signed_certificates()
         if generate_certificates and self.ssl:
             self.generate_certificates()
+        return True
 
     def clean(self):
         j.sals.fs.rmtree(self.cfg_dir)
+        forget_config_files(self.cfg_dir)
 
 
 class NginxConfig(Base):
@@ -460,3 +510,4 @@ class NginxConfig(Base):
 
     def clean(self):
         j.sals.fs.rmtree(f"{self.cfg_dir}")
+        forget_config_files(self.cfg_dir)
@@ -1,3 +1,5 @@
+import hashlib
+
 from jumpscale.loader import j
 
 
@@ -7,3 +9,41 @@ env = j.tools.jinja2.get_env(j.sals.fs.join_paths(DIR_PATH, "templates"))
 
 def render_config_template(name, **kwargs):
     return env.get_template(f"{name}.conf").render(**kwargs)
+
+
+# content hashes of the written configuration files by path, to skip writing files with the same content
+_config_hashes = {}
+
+
+def write_config_file(path, content):
+    """Write a configuration file, only if its content changed
+
+    Args:
+        path (str): file path
+        content (str): file content
+
+    Returns:
+        bool: True if the file was written, False if it already has the same content
+    """
+    digest = hashlib.sha1(content.encode()).hexdigest()
+    if j.sals.fs.exists(path):
+        if path not in _config_hashes:
+            _config_hashes[path] = hashlib.sha1(j.sals.fs.read_file(path).encode()).hexdigest()
+        if _config_hashes[path] == digest:
+            return False
+
+    j.sals.fs.write_file(path, content)
+    _config_hashes[path] = digest
+    return True
+
+
+def forget_config_files(path):
+    """Forget the content hashes of removed configuration files, so they're written again even with the same content
+
+    Args:
+        path (str): removed file path, or directory path to forget all files in it
+    """
+    prefix = j.sals.fs.join_paths(path, "")
+    for config_path in list(_config_hashes):
+        if config_path == path or config_path.startswith(prefix):
+            _config_hashes.pop(config_path)
@@ -1,3 +1,5 @@
+import copy
+import time
 from functools import wraps
 from json import JSONDecodeError
 from urllib.parse import urlencode, quote, unquote
@@ -5,13 +7,64 @@ from urllib.parse import urlencode, quote, unquote
 import nacl
 import requests
 from beaker.middleware import SessionMiddleware
+from beaker.session import Session
 from bottle import Bottle, abort, redirect, request, response
 from nacl.public import Box
 from nacl.signing import VerifyKey
 
 from jumpscale.loader import j
 
-SESSION_OPTS = {"session.type": "file", "session.data_dir": f"{j.core.dirs.VARDIR}/data", "session.auto": True}
+# sessions not accessed for this number of seconds are expired (by beaker and by redis)
+SESSION_TIMEOUT = 7 * 24 * 60 * 60
+# the access time of unchanged sessions is saved at most once per this number of seconds
+SESSION_REFRESH_INTERVAL = 60 * 60
+
+
+class RedisSession(Session):
+    """
+    a beaker session that is only written to redis if its data changed, or to refresh its access time
+
+    new sessions are not saved until some data is set, so requests without a session (e.g. auth checks of
+    anonymous users) don't create any
+    """
+
+    _saved_data = None
+
+    def _get_data(self):
+        return {key: value for key, value in self.items() if key != "_accessed_time"}
+
+    def load(self):
+        super().load()
+        if not self.is_new:
+            self._saved_data = copy.deepcopy(self._get_data())
+
+    def save(self, accessed_only=False):
+        data = self._get_data()
+        if self.is_new:
+            if not data.keys() - {"_creation_time"}:
+                return
+        elif data == self._saved_data and not self._needs_refresh():
+            return
+
+        super().save(accessed_only=accessed_only)
+        self._saved_data = copy.deepcopy(data)
+
+    def _needs_refresh(self):
+        return not self.last_accessed or time.time() - self.last_accessed > SESSION_REFRESH_INTERVAL
+
+    def invalidate(self):
+        # remove the old session right away instead of waiting for it to expire
+        if not self.is_new and hasattr(self, "namespace"):
+            del self.namespace["session"]
+        super().invalidate()
+
+
+SESSION_OPTS = {
+    "session.type": "ext:redis",
+    "session.session_class": RedisSession,
+    "session.timeout": SESSION_TIMEOUT,
+    "session.auto": True,
+}
 
 
 class StripPathMiddleware(object):
@@ -35,4 +88,5 @@ def make_main_app():
 
 def apply_main_middlewares(app):
     app = StripPathMiddleware(app)
-    return SessionMiddleware(app, SESSION_OPTS)
+    # sessions are stored in the local redis, `url` can be a redis client too
+    return SessionMiddleware(app, dict(SESSION_OPTS, **{"session.url": j.core.db}))
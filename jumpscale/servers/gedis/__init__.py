@@ -17,6 +17,21 @@ t.start()
 ```
 t.stop()
 ```
+### Pipelined mode
+By default, requests of a single connection are executed one after another,
+with `pipelined` enabled, the server keeps reading requests while previous ones are executing (at most `pipeline_size` at a time)
+and replies in the same order the requests were received.
+```
+t = j.servers.gedis.new("test", pipelined=True, pipeline_size=32)
+```
+### Offloading CPU heavy methods
+Actor methods run in the server event loop, CPU heavy methods can be offloaded to a thread or a worker process pool,
+see `jumpscale.servers.gedis.executors`
+```
+@actor_method(executor="process")
+def checksum(self, path: str) -> str:
+    ...
+```
 
 ~>  redis-cli -p 16000 greeter hi
 actor greeter isn't loaded
@@ -1,42 +1,176 @@
 import inspect
 import sys
-from functools import wraps
+from functools import partial, wraps
 from jumpscale.loader import j
 
+from . import executors
+from .cache import results_cache
+from .executors import EXECUTORS_TYPES
 
-def actor_method(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        # verify args and kwargs types
-        signature = inspect.signature(func)
+
+class ActorMethod:
+    """Actor method compiled once: signature, parameters types and return type are prepared at decoration time,
+    so calls only bind and check the arguments against them
+
+    Stream methods are generators, their return type annotates every yielded item instead of the whole result
+
+    Async methods are executed in the background by the server when called by clients, see `tasks`
+
+    Results of methods with `cache_ttl` are cached, see `cache`
+    """
+
+    def __init__(self, func, stream=False, executor=None, is_async=False, cache_ttl=None, invalidates=None):
+        if executor and executor not in EXECUTORS_TYPES:
+            raise ValueError(f"unsupported executor ({executor})")
+
+        if executor and stream:
+            raise ValueError("stream methods can not be offloaded to an executor")
+
+        if is_async and stream:
+            raise ValueError("stream methods can not be async")
+
+        if cache_ttl and stream:
+            raise ValueError("stream methods results can not be cached")
+
+        self.func = func
+        self.stream = stream
+        self.executor = executor
+        self.is_async = is_async
+        self.cache_ttl = cache_ttl
+        self.invalidates = list(invalidates or [])
+        self.name = func.__name__
+        self.qualname = func.__qualname__
+        self.signature = inspect.signature(func)
+        self.parameters_types = {
+            name: parameter.annotation
+            for name, parameter in self.signature.parameters.items()
+            if parameter.annotation not in (None, inspect._empty)
+        }
+
+        # methods with only positional-or-keyword parameters (the common case) are bound without `signature.bind`
+        parameters = self.signature.parameters.values()
+        self.simple = all(parameter.kind == parameter.POSITIONAL_OR_KEYWORD for parameter in parameters)
+        self.parameters_names = [parameter.name for parameter in parameters]
+        self.parameters_set = set(self.parameters_names)
+        self.required_names = {parameter.name for parameter in parameters if parameter.default is inspect._empty}
+
+        return_type = self.signature.return_annotation
+        if return_type is inspect._empty or return_type is None:
+            return_type = type(None)
+        self.return_type = return_type
+
+    def __repr__(self):
+        return f"<ActorMethod {self.func.__qualname__}>"
+
+    def _bind(self, args, kwargs):
+        if self.simple and len(args) <= len(self.parameters_names):
+            arguments = dict(zip(self.parameters_names, args))
+            for name, value in kwargs.items():
+                if name in arguments or name not in self.parameters_set:
+                    break
+                arguments[name] = value
+            else:
+                if self.required_names.issubset(arguments):
+                    return arguments
+
+        # let signature.bind raise the proper error
         try:
-            bound = signature.bind(*args, **kwargs)
+            return self.signature.bind(*args, **kwargs).arguments
         except TypeError as e:
             raise j.exceptions.Value(str(e))
 
-        for name, value in bound.arguments.items():
-            annotation = signature.parameters[name].annotation
-            if annotation not in (None, inspect._empty) and not isinstance(value, annotation):
+    def validate_arguments(self, *args, **kwargs):
+        parameters_types = self.parameters_types
+        for name, value in self._bind(args, kwargs).items():
+            annotation = parameters_types.get(name)
+            if annotation is not None and not isinstance(value, annotation):
                 raise j.exceptions.Value(
                     f"parameter ({name}) supposed to be of type ({annotation.__name__}), but found ({type(value).__name__})"
                 )
 
-        # call method
-        result = func(*bound.args, **bound.kwargs)
-        # verify result type
-        return_type = signature.return_annotation
-        if return_type is inspect._empty or return_type is None:
-            return_type = type(None)
+    def validate_result(self, result):
+        if not isinstance(result, self.return_type):
+            raise j.exceptions.Value(
+                f"method is supposed to return ({self.return_type}), but it returned ({type(result)})"
+            )
+        return result
+
+    def validate_stream(self, items):
+        for item in items:
+            yield self.validate_result(item)
+
+    def __call__(self, *args, **kwargs):
+        self.validate_arguments(*args, **kwargs)
+        if self.stream:
+            return self.validate_stream(self.func(*args, **kwargs))
+
+        if self.cache_ttl:
+            key = results_cache.make_key(self, args[1:], kwargs)
+            if key:
+                hit, result = results_cache.get(key)
+                if hit:
+                    return result
 
-        if not isinstance(result, return_type):
-            raise j.exceptions.Value(f"method is supposed to return ({return_type}), but it returned ({type(result)})")
+            result = self._execute(args, kwargs)
+            if key:
+                results_cache.set(key, result, self.cache_ttl)
+            return result
 
+        result = self._execute(args, kwargs)
+        if self.invalidates:
+            args[0]._invalidate_cache(*self.invalidates)
         return result
 
+    def _execute(self, args, kwargs):
+        if self.executor:
+            return self.validate_result(executors.execute(self.executor, self, args[0], args[1:], kwargs))
+
+        return self.validate_result(self.func(*args, **kwargs))
+
+
+def actor_method(func=None, stream=False, executor=None, is_async=False, cache_ttl=None, invalidates=None):
+    """Decorate an actor method to validate its arguments and result types
+
+    Can be used as `@actor_method` or with options as `@actor_method(stream=True)`
+
+    Arguments:
+        func {callable} -- actor method
+
+    Keyword Arguments:
+        stream {bool} -- the method is a generator, its items are sent to the client in chunks (default: {False})
+        executor {str} -- offload the method to a `thread` or `process` executor, see `executors` (default: {None})
+        is_async {bool} -- clients calls return a task id immediately and the method runs in the background,
+                           see `tasks` (default: {False})
+        cache_ttl {int} -- cache the method results for `cache_ttl` seconds, see `cache` (default: {None})
+        invalidates {list} -- names of cached methods of the same actor to invalidate after every successful call
+                              (default: {None})
+    """
+    if func is None:
+        return partial(
+            actor_method,
+            stream=stream,
+            executor=executor,
+            is_async=is_async,
+            cache_ttl=cache_ttl,
+            invalidates=invalidates,
+        )
+
+    method = ActorMethod(
+        func, stream=stream, executor=executor, is_async=is_async, cache_ttl=cache_ttl, invalidates=invalidates
+    )
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return method(*args, **kwargs)
+
+    wrapper.__actor_method__ = method
     return wrapper
 
 
 class BaseActor:
+    # max number of concurrent calls of this actor offloaded to executors
+    executor_concurrency = 2
+
     def __init__(self):
         self.path = None
 
@@ -61,6 +195,38 @@ class BaseActor:
 
         return info
 
+    def _invalidate_cache(self, *method_names):
+        """Invalidate cached results of the actor methods
+
+        Arguments:
+            method_names {str} -- methods names, all cached methods of the actor are invalidated if not given
+        """
+        methods = []
+        for name, attr in inspect.getmembers(type(self), predicate=inspect.isfunction):
+            method = getattr(attr, "__actor_method__", None)
+            if method and method.cache_ttl and (not method_names or name in method_names):
+                methods.append(method)
+
+        if methods:
+            results_cache.invalidate(*methods)
+
+    def __compile_dispatch_table__(self):
+        """Compile public methods of the actor into a dispatch table
+
+        Returns:
+            dict -- method name to a callable, methods decorated with `actor_method` are bound to their compiled validators
+        """
+        table = {}
+        methods = inspect.getmembers(self, predicate=inspect.ismethod)
+        for name, attr in methods:
+            if name.startswith("_"):
+                continue
+
+            compiled = getattr(attr, "__actor_method__", None)
+            table[name] = partial(compiled, self) if compiled else attr
+
+        return table
+
     def __validate_actor__(self):
         def validate_annotation(annotation, annotated):
             if annotation is None or annotation is inspect._empty:
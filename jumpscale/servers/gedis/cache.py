@@ -0,0 +1,98 @@
+"""Results cache of read-only actor methods
+
+Results of methods decorated with `@actor_method(cache_ttl=<seconds>)` are cached by method and arguments
+for `cache_ttl` seconds, the least recently used results are evicted once the cache holds `CACHE_MAX_SIZE` results.
+
+Cached results can be invalidated:
+
+- automatically, after a successful call of a method decorated with `@actor_method(invalidates=[<method names>])`
+- from actor code, using `self._invalidate_cache(<method names>)`
+- by clients, using `core.cache_invalidate`
+
+Note that results are shared by all instances of the same actor class.
+"""
+import json
+from collections import OrderedDict
+from time import monotonic
+
+CACHE_MAX_SIZE = 1024
+
+
+class ResultsCache:
+    def __init__(self, max_size=CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._results = OrderedDict()
+        self._stats = {}
+
+    def _method_stats(self, method):
+        stats = self._stats.get(method.qualname)
+        if stats is None:
+            stats = self._stats[method.qualname] = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        return stats
+
+    def make_key(self, method, args, kwargs):
+        """Get the cache key of a call
+
+        Arguments:
+            method {ActorMethod} -- compiled actor method
+            args {tuple} -- call arguments (without the actor)
+            kwargs {dict} -- call keyword arguments
+
+        Returns:
+            tuple -- cache key, or None if the arguments can't be used as a key
+        """
+        try:
+            return method, json.dumps([args, kwargs], sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, key):
+        """Get a cached result
+
+        Arguments:
+            key {tuple} -- cache key
+
+        Returns:
+            tuple -- (True, result) on cache hit, (False, None) otherwise
+        """
+        stats = self._method_stats(key[0])
+        entry = self._results.get(key)
+        if entry is None or entry[0] < monotonic():
+            stats["misses"] += 1
+            return False, None
+
+        self._results.move_to_end(key)
+        stats["hits"] += 1
+        return True, entry[1]
+
+    def set(self, key, result, ttl):
+        self._results[key] = (monotonic() + ttl, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_size:
+            evicted_key, _ = self._results.popitem(last=False)
+            self._method_stats(evicted_key[0])["evictions"] += 1
+
+    def invalidate(self, *methods):
+        """Remove cached results of methods, all results are removed if no method is given
+
+        Arguments:
+            methods {ActorMethod} -- compiled actor methods
+        """
+        methods = set(methods)
+        for key in list(self._results.keys()):
+            if not methods or key[0] in methods:
+                self._results.pop(key, None)
+                self._method_stats(key[0])["invalidations"] += 1
+
+    def stats(self):
+        sizes = {}
+        for method, _ in self._results.keys():
+            sizes[method.qualname] = sizes.get(method.qualname, 0) + 1
+
+        methods = {}
+        for name, stats in self._stats.items():
+            methods[name] = dict(stats, size=sizes.get(name, 0))
+        return {"max_size": self.max_size, "size": len(self._results), "methods": methods}
+
+
+results_cache = ResultsCache()
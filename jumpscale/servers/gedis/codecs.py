@@ -0,0 +1,100 @@
+"""Wire formats used to encode gedis requests and responses
+
+The codec is chosen by the client per request (sent as an extra argument after the payload),
+the server replies using the same codec, `json` is used if the client didn't specify one.
+
+- `json`: the default text format, objects with `to_dict`/`from_dict` are sent as `__serialized__` dicts
+- `msgpack`: compact binary format, objects with `to_dict`/`from_dict` are sent as a msgpack extension type
+  and `bytes` are sent as they are without any extra encoding, only available if the `msgpack` package is installed
+"""
+import inspect
+import json
+import sys
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from jumpscale.loader import j
+
+SERIALIZED_OBJECT_EXT_TYPE = 1
+
+
+def serialize(obj):
+    if not isinstance(obj, (str, int, float, list, tuple, dict, bool)):
+        module = inspect.getmodule(obj).__file__[:-3]
+        return dict(__serialized__=True, module=module, type=obj.__class__.__name__, data=obj.to_dict())
+    return obj
+
+
+def deserialize(obj):
+    if isinstance(obj, dict) and obj.get("__serialized__"):
+        module = sys.modules[obj["module"]]
+        object_instance = getattr(module, obj["type"])()
+        object_instance.from_dict(obj["data"])
+        return object_instance
+    return obj
+
+
+class JSONCodec:
+    name = "json"
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=serialize)
+
+    def loads(self, data, deserialize_objects=True):
+        object_hook = deserialize if deserialize_objects else None
+        return json.loads(data, object_hook=object_hook)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+
+    def _default(self, obj):
+        serialized = serialize(obj)
+        if serialized is obj:
+            raise TypeError(f"can not serialize object of type ({type(obj).__name__})")
+        return msgpack.ExtType(SERIALIZED_OBJECT_EXT_TYPE, self.dumps(serialized))
+
+    def _ext_hook(self, code, data):
+        if code == SERIALIZED_OBJECT_EXT_TYPE:
+            return deserialize(self.loads(data))
+        return msgpack.ExtType(code, data)
+
+    def _raw_ext_hook(self, code, data):
+        if code == SERIALIZED_OBJECT_EXT_TYPE:
+            return self.loads(data, deserialize_objects=False)
+        return msgpack.ExtType(code, data)
+
+    def dumps(self, obj):
+        return msgpack.packb(obj, use_bin_type=True, default=self._default)
+
+    def loads(self, data, deserialize_objects=True):
+        ext_hook = self._ext_hook if deserialize_objects else self._raw_ext_hook
+        return msgpack.unpackb(data, raw=False, ext_hook=ext_hook)
+
+
+DEFAULT_CODEC = JSONCodec.name
+CODECS = {codec.name: codec for codec in (JSONCodec(), MsgpackCodec() if msgpack else None) if codec}
+
+
+def get_codec(name=DEFAULT_CODEC):
+    """Get a codec by its name
+
+    Arguments:
+        name {str} -- codec name (default: {"json"})
+
+    Raises:
+        j.exceptions.Value: if the codec is not supported
+
+    Returns:
+        JSONCodec or MsgpackCodec -- codec object
+    """
+    if isinstance(name, bytes):
+        name = name.decode()
+
+    codec = CODECS.get(name)
+    if not codec:
+        raise j.exceptions.Value(f"unsupported codec ({name})")
+    return codec
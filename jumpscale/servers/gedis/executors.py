@@ -0,0 +1,273 @@
+"""Executors used to offload CPU heavy actor methods out of the gevent hub
+
+Actor methods run inside the gevent hub by default, so a CPU bound method blocks every other connection.
+Such methods can be offloaded using `@actor_method(executor=...)`:
+
+- `thread`: runs the method in a native thread of a gevent threadpool, it shares the actor state,
+  the hub keeps switching between greenlets while the method runs
+- `process`: runs the method in a worker process, arguments and results must be picklable, the method
+  runs on a fresh instance of the actor class (loaded from the same path) so it must not depend on in-memory actor state
+
+Offloaded calls of the same actor are limited by the actor `executor_concurrency`, extra calls wait in a queue.
+"""
+import inspect
+import multiprocessing
+from time import monotonic
+
+import gevent
+from gevent.lock import BoundedSemaphore
+from gevent.queue import Empty, Queue
+from gevent.socket import wait_read
+from gevent.threadpool import ThreadPool
+
+from jumpscale.loader import j
+
+THREAD = "thread"
+PROCESS = "process"
+EXECUTORS_POOL_SIZE = 4
+
+
+def _process_worker(connection):
+    """Worker process main loop, executes actor methods sent over the connection until it's closed"""
+    actors = {}
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+
+        if request is None:
+            return
+
+        module_path, class_name, method_name, args, kwargs = request
+        try:
+            actor = actors.get((module_path, class_name))
+            if actor is None:
+                module = j.tools.codeloader.load_python_module(module_path)
+                actor = actors[(module_path, class_name)] = getattr(module, class_name)()
+
+            # the actor method is already validated by the caller, call the original function
+            method = getattr(type(actor), method_name).__actor_method__
+            response = (True, method.func(actor, *args, **kwargs))
+        except Exception as e:
+            response = (False, e)
+
+        try:
+            connection.send(response)
+        except Exception as e:
+            # the result or the exception couldn't be pickled
+            connection.send((False, j.exceptions.Runtime(str(e))))
+
+
+class ProcessWorker:
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_process_worker, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def execute(self, request):
+        self.connection.send(request)
+        # wait cooperatively, so other greenlets keep running while the worker is busy
+        wait_read(self.connection.fileno())
+        return self.connection.recv()
+
+    def stop(self, timeout=1):
+        try:
+            self.connection.send(None)
+            self.connection.close()
+        except OSError:
+            pass
+
+        # poll instead of `join`, which would block the hub until the worker exits
+        deadline = monotonic() + timeout
+        while self.process.is_alive() and monotonic() < deadline:
+            gevent.sleep(0.05)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ProcessExecutor:
+    """A pool of worker processes, workers are started on demand up to `size`"""
+
+    def __init__(self, size=EXECUTORS_POOL_SIZE):
+        self.size = size
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = BoundedSemaphore(size)
+        self._idle = Queue()
+        self._workers = 0
+        self._waiting = 0
+        self._busy = 0
+
+    def _checkout(self):
+        self._waiting += 1
+        try:
+            self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+
+        try:
+            worker = ProcessWorker(self._context)
+        except Exception:
+            self._slots.release()
+            raise
+        self._workers += 1
+        return worker
+
+    def _release(self, worker, broken=False):
+        if broken:
+            # the worker state is unknown (e.g. the caller was killed while waiting), don't reuse it,
+            # it's stopped in the background so the caller is not kept waiting for the worker to exit
+            gevent.spawn(worker.stop)
+            self._workers -= 1
+        else:
+            self._idle.put(worker)
+        self._slots.release()
+
+    def apply(self, method, actor, args, kwargs):
+        request = (inspect.getfile(type(actor)), type(actor).__name__, method.name, args, kwargs)
+        worker = self._checkout()
+        self._busy += 1
+        broken = True
+        try:
+            success, value = worker.execute(request)
+            broken = False
+        finally:
+            self._busy -= 1
+            self._release(worker, broken=broken)
+
+        if not success:
+            raise value
+        return value
+
+    def stats(self):
+        return {"size": self.size, "workers": self._workers, "busy": self._busy, "waiting": self._waiting}
+
+
+class ThreadExecutor:
+    """A pool of native threads"""
+
+    def __init__(self, size=EXECUTORS_POOL_SIZE):
+        self.size = size
+        self._pool = ThreadPool(size)
+        self._busy = 0
+
+    def apply(self, method, actor, args, kwargs):
+        self._busy += 1
+        try:
+            return self._pool.apply(method.func, (actor,) + tuple(args), kwargs)
+        finally:
+            self._busy -= 1
+
+    def stats(self):
+        running = min(self._busy, self.size)
+        return {"size": self.size, "workers": self._pool.size, "busy": running, "waiting": self._busy - running}
+
+
+class ActorLimiter:
+    """Limits concurrent offloaded calls of a single actor and keeps their metrics"""
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self._semaphore = BoundedSemaphore(concurrency)
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.failed = 0
+
+    def run(self, func, *args):
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        try:
+            result = func(*args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+        self.completed += 1
+        return result
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+EXECUTORS_TYPES = {THREAD: ThreadExecutor, PROCESS: ProcessExecutor}
+_executors = {}
+
+
+def get_executor(name):
+    """Get (or create) the shared executor of a type
+
+    Arguments:
+        name {str} -- executor type, `thread` or `process`
+
+    Returns:
+        ThreadExecutor or ProcessExecutor -- executor object
+    """
+    if name not in _executors:
+        _executors[name] = EXECUTORS_TYPES[name]()
+    return _executors[name]
+
+
+def get_actor_limiter(actor):
+    limiter = actor.__dict__.get("_executor_limiter")
+    if limiter is None:
+        limiter = actor._executor_limiter = ActorLimiter(actor.executor_concurrency)
+    return limiter
+
+
+def execute(executor, method, actor, args, kwargs):
+    """Execute an actor method using an executor, limited by the actor concurrency
+
+    Arguments:
+        executor {str} -- executor type, `thread` or `process`
+        method {ActorMethod} -- compiled actor method
+        actor {BaseActor} -- actor object
+        args {tuple} -- method arguments (without the actor)
+        kwargs {dict} -- method keyword arguments
+
+    Returns:
+        any -- method result
+    """
+    return get_actor_limiter(actor).run(get_executor(executor).apply, method, actor, args, kwargs)
+
+
+def executors_stats():
+    return {name: executor.stats() for name, executor in _executors.items()}
+
+
+def shutdown():
+    """Stop all workers of the shared executors"""
+    executor = _executors.pop(PROCESS, None)
+    if executor:
+        while True:
+            try:
+                executor._idle.get_nowait().stop()
+            except Empty:
+                break
+
+    executor = _executors.pop(THREAD, None)
+    if executor:
+        executor._pool.kill()
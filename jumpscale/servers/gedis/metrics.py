@@ -0,0 +1,154 @@
+"""Requests metrics of gedis actors methods
+
+For every `actor.method` the server keeps:
+
+- `count`: number of executed calls
+- `errors`: number of failed calls by error type (names of `GedisErrorTypes`)
+- `in_flight`: number of calls currently executing
+- `latency`: histogram of calls durations in seconds (cumulative buckets, like prometheus histograms)
+
+Calls of async methods are counted once their tasks are finished, their latency is the task run time
+(without the time spent waiting in the tasks queue), calls rejected before a task is submitted are counted right away.
+
+Metrics can be fetched using `core.metrics` and are exposed in prometheus text format by the gedis http bridge at `/metrics`.
+"""
+from bisect import bisect_left
+from time import monotonic
+
+# upper bounds (in seconds) of latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class MethodMetrics:
+    __slots__ = ("count", "errors", "in_flight", "buckets", "latency_sum")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = {}
+        self.in_flight = 0
+        # last bucket counts calls slower than the largest bound (+Inf)
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+
+    def observe(self, duration, error_type=None):
+        self.count += 1
+        self.latency_sum += duration
+        self.buckets[bisect_left(LATENCY_BUCKETS, duration)] += 1
+        if error_type:
+            self.errors[error_type] = self.errors.get(error_type, 0) + 1
+
+    def to_dict(self):
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), self.buckets):
+            cumulative += count
+            buckets.append([bound, cumulative])
+
+        return {
+            "count": self.count,
+            "errors": dict(self.errors),
+            "in_flight": self.in_flight,
+            "latency": {"buckets": buckets, "sum": self.latency_sum, "count": self.count},
+        }
+
+
+class GedisMetrics:
+    def __init__(self):
+        self._methods = {}
+
+    def _get(self, actor_name, method_name):
+        key = (actor_name, method_name)
+        metrics = self._methods.get(key)
+        if metrics is None:
+            metrics = self._methods[key] = MethodMetrics()
+        return metrics
+
+    def start(self, actor_name, method_name):
+        """Mark the start of a call
+
+        Arguments:
+            actor_name {str} -- actor name
+            method_name {str} -- method name
+
+        Returns:
+            tuple -- call token, to be passed to `finish`
+        """
+        metrics = self._get(actor_name, method_name)
+        metrics.in_flight += 1
+        return metrics, monotonic()
+
+    def finish(self, token, error_type=None, duration=None):
+        """Mark the end of a call started using `start`
+
+        Arguments:
+            token {tuple} -- call token returned by `start`
+            error_type {str} -- error type name if the call failed (default: {None})
+            duration {float} -- call duration in seconds, the time since `start` if None (default: {None})
+        """
+        metrics, started = token
+        metrics.in_flight -= 1
+        if duration is None:
+            duration = monotonic() - started
+        metrics.observe(duration, error_type)
+
+    def remove_actor(self, actor_name):
+        for key in [key for key in self._methods if key[0] == actor_name]:
+            self._methods.pop(key, None)
+
+    def reset(self):
+        self._methods.clear()
+
+    def to_dict(self):
+        return {f"{actor}.{method}": metrics.to_dict() for (actor, method), metrics in self._methods.items()}
+
+
+def _labels(**labels):
+    labels = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    return "{%s}" % labels
+
+
+def to_prometheus(metrics, prefix="gedis"):
+    """Format metrics returned by `GedisMetrics.to_dict` (or `core.metrics`) in prometheus text format
+
+    Arguments:
+        metrics {dict} -- metrics by `actor.method`
+
+    Keyword Arguments:
+        prefix {str} -- metrics names prefix (default: {"gedis"})
+
+    Returns:
+        str -- prometheus text exposition
+    """
+    requests = [
+        f"# HELP {prefix}_requests_total Number of executed actor method calls",
+        f"# TYPE {prefix}_requests_total counter",
+    ]
+    errors = [
+        f"# HELP {prefix}_errors_total Number of failed actor method calls by error type",
+        f"# TYPE {prefix}_errors_total counter",
+    ]
+    in_flight = [
+        f"# HELP {prefix}_in_flight_requests Number of actor method calls currently executing",
+        f"# TYPE {prefix}_in_flight_requests gauge",
+    ]
+    latency = [
+        f"# HELP {prefix}_request_duration_seconds Actor method calls latency",
+        f"# TYPE {prefix}_request_duration_seconds histogram",
+    ]
+
+    for name, method_metrics in sorted(metrics.items()):
+        actor_name, method_name = name.split(".", 1)
+        labels = dict(actor=actor_name, method=method_name)
+
+        requests.append(f"{prefix}_requests_total{_labels(**labels)} {method_metrics['count']}")
+        for error_type, count in sorted(method_metrics["errors"].items()):
+            errors.append(f"{prefix}_errors_total{_labels(error_type=error_type, **labels)} {count}")
+        in_flight.append(f"{prefix}_in_flight_requests{_labels(**labels)} {method_metrics['in_flight']}")
+
+        histogram = method_metrics["latency"]
+        for bound, count in histogram["buckets"]:
+            latency.append(f"{prefix}_request_duration_seconds_bucket{_labels(le=bound, **labels)} {count}")
+        latency.append(f"{prefix}_request_duration_seconds_sum{_labels(**labels)} {histogram['sum']}")
+        latency.append(f"{prefix}_request_duration_seconds_count{_labels(**labels)} {histogram['count']}")
+
+    return "\n".join(requests + errors + in_flight + latency) + "\n"
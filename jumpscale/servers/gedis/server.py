@@ -1,14 +1,15 @@
 import inspect
-import json
-import sys
 import os
+import uuid
 from redis import Redis
 from enum import Enum
 from functools import partial
 from io import BytesIO
 from signal import SIGKILL, SIGTERM
-import json
+from time import monotonic
 import gevent
+import gevent.queue
+from gevent.event import AsyncResult
 from gevent.pool import Pool
 from gevent import time
 from gevent.server import StreamServer
@@ -16,26 +17,14 @@ from jumpscale.core.base import Base, fields
 from jumpscale.loader import j
 from redis.connection import DefaultParser, Encoder
 from redis.exceptions import ConnectionError, TimeoutError
+from . import executors
 from .baseactor import BaseActor
+from .codecs import DEFAULT_CODEC, get_codec
+from .metrics import GedisMetrics
+from .tasks import TASK_RESULT_TTL, TASKS_POOL_SIZE, TaskManager
 from .systemactor import CoreActor, SystemActor
 
 
-def serialize(obj):
-    if not isinstance(obj, (str, int, float, list, tuple, dict, bool)):
-        module = inspect.getmodule(obj).__file__[:-3]
-        return dict(__serialized__=True, module=module, type=obj.__class__.__name__, data=obj.to_dict())
-    return obj
-
-
-def deserialize(obj):
-    if isinstance(obj, dict) and obj.get("__serialized__"):
-        module = sys.modules[obj["module"]]
-        object_instance = getattr(module, obj["type"])()
-        object_instance.from_dict(obj["data"])
-        return object_instance
-    return obj
-
-
 class GedisErrorTypes(Enum):
     NOT_FOUND = 0
     BAD_REQUEST = 1
@@ -134,6 +123,8 @@ class ResponseEncoder:
 
 SERIALIZABLE_TYPES = (str, int, float, list, tuple, dict, bool)
 RESERVED_ACTOR_NAMES = ("core", "system")
+STREAM_CHUNK_SIZE = 100
+STREAM_IDLE_TIMEOUT = 300
 
 
 class GedisServer(Base):
@@ -141,13 +132,27 @@ class GedisServer(Base):
     port = fields.Integer(default=16000)
     enable_system_actor = fields.Boolean(default=True)
     run_async = fields.Boolean(default=True)
+    pipelined = fields.Boolean(default=False)
+    pipeline_size = fields.Integer(default=16)
+    tasks_pool_size = fields.Integer(default=TASKS_POOL_SIZE)
+    tasks_result_ttl = fields.Integer(default=TASK_RESULT_TTL)
     _actors = fields.Typed(dict, default={})
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self._server = None
         self._core_actor = CoreActor()
         self._system_actor = SystemActor()
-        self._loaded_actors = {"core": self._core_actor}
+        self._loaded_actors = {}
+        self._dispatch_table = {}
+        self._async_methods = set()
+        # bumped on every actor (un)registration, so clients know when their cached actors info is outdated
+        self._registry_generation = 0
+        self._actors_generations = {}
+        self._streams = {}
+        self._metrics = GedisMetrics()
+        self._tasks = TaskManager(self.tasks_pool_size, self.tasks_result_ttl)
+        self._register_actor("core", self._core_actor)
 
     @property
     def actors(self):
@@ -205,16 +210,43 @@ class GedisServer(Base):
 
         j.logger.info(f"Gedis server is started at {self.host}:{self.port}...")
 
+    @property
+    def is_running(self):
+        """Whether the server is started in this process"""
+        return self._server is not None and self._server.started
+
     def stop(self):
         """Stops the server"""
         j.logger.info("Shutting down...")
         self._server.stop()
+        executors.shutdown()
+        self._tasks.shutdown()
 
     def _register_actor(self, actor_name: str, actor_module: BaseActor):
+        # compile the actor once, so every request costs a single lookup in the dispatch table
+        dispatch_table = {
+            (actor_name, method_name): method
+            for method_name, method in actor_module.__compile_dispatch_table__().items()
+        }
+        self._unregister_actor(actor_name)
+        self._dispatch_table.update(dispatch_table)
+        self._registry_generation += 1
+        self._actors_generations[actor_name] = self._registry_generation
+        self._async_methods.update(
+            key for key, method in dispatch_table.items() if getattr(getattr(method, "func", None), "is_async", False)
+        )
         self._loaded_actors[actor_name] = actor_module
 
     def _unregister_actor(self, actor_name: str):
-        self._loaded_actors.pop(actor_name, None)
+        actor_module = self._loaded_actors.pop(actor_name, None)
+        if actor_module:
+            actor_module._invalidate_cache()
+            for key in [key for key in self._dispatch_table if key[0] == actor_name]:
+                self._dispatch_table.pop(key, None)
+                self._async_methods.discard(key)
+            self._metrics.remove_actor(actor_name)
+            self._actors_generations.pop(actor_name, None)
+            self._registry_generation += 1
 
     def _execute(self, method, args, kwargs):
         response = {}
@@ -229,6 +261,241 @@ class GedisServer(Base):
 
         return response
 
+    def _call(self, actor_name, method_name, method, args, kwargs):
+        token = self._metrics.start(actor_name, method_name)
+        if (actor_name, method_name) in self._async_methods:
+            result = self._submit_task(method, args, kwargs, f"{actor_name}.{method_name}", token)
+            if result.get("task_id"):
+                # counted once the task is finished
+                return result
+        else:
+            result = self._execute(method, args, kwargs)
+        error_type = result.get("error_type")
+        self._metrics.finish(token, GedisErrorTypes(error_type).name if error_type is not None else None)
+        return result
+
+    def _finish_task_metrics(self, token, task):
+        error_type = None
+        if task.exception:
+            error_type = EXCEPTIONS_MAP.get(task.exception.__class__, GedisErrorTypes.ACTOR_ERROR.value)
+            error_type = GedisErrorTypes(error_type).name
+        self._metrics.finish(token, error_type, duration=task.finished - task.started)
+
+    def execute(self, actor_name: str, method_name: str, *args, **kwargs) -> dict:
+        """Execute an actor method in process, without going through the network and the wire codecs
+
+        Calls are validated, instrumented and mapped to errors the same way as requests from clients.
+
+        Arguments:
+            actor_name {str} -- actor name
+            method_name {str} -- method name
+
+        Returns:
+            dict -- response, with the same keys sent to clients, stream methods results are returned as generators
+        """
+        response = self._new_response()
+        method = self._dispatch_table.get((actor_name, method_name))
+        if not method:
+            if actor_name not in self._loaded_actors:
+                response["error"] = "actor not found"
+            else:
+                response["error"] = "method not found"
+            response["error_type"] = GedisErrorTypes.NOT_FOUND.value
+
+        else:
+            response.update(self._call(actor_name, method_name, method, args, kwargs))
+
+        response["success"] = response["error"] is None
+        return response
+
+    def _submit_task(self, method, args, kwargs, name, metrics_token):
+        response = {}
+        try:
+            # fail early with bad requests, instead of failing later in the task
+            method.func.validate_arguments(*method.args, *args, **kwargs)
+            callback = partial(self._finish_task_metrics, metrics_token)
+            task = self._tasks.submit(method, args, kwargs, name=name, callback=callback)
+            response["is_async"] = True
+            response["task_id"] = task.id
+
+        except Exception as e:
+            response["error"] = str(e)
+            response["error_type"] = EXCEPTIONS_MAP.get(e.__class__, GedisErrorTypes.ACTOR_ERROR.value)
+
+        return response
+
+    def _get_task_info(self, task_id):
+        task = self._tasks.get(task_id)
+        if not task:
+            raise j.exceptions.NotFound(f"task {task_id} not found")
+
+        info = dict(
+            task_id=task.id,
+            name=task.name,
+            state=task.state,
+            done=task.done,
+            result=task.result,
+            error=None,
+            error_type=None,
+            created=task.created,
+            started=task.started,
+            finished=task.finished,
+        )
+        if task.exception:
+            info["error"] = str(task.exception)
+            info["error_type"] = EXCEPTIONS_MAP.get(task.exception.__class__, GedisErrorTypes.ACTOR_ERROR.value)
+        return info
+
+    def _wait_task(self, task_id, timeout=None):
+        task = self._tasks.get(task_id)
+        if not task:
+            raise j.exceptions.NotFound(f"task {task_id} not found")
+
+        task.wait(timeout)
+        return self._get_task_info(task_id)
+
+    def _open_stream(self, items):
+        self._close_idle_streams()
+        stream_id = uuid.uuid4().hex
+        # items, last access time and the greenlet getting the next item
+        self._streams[stream_id] = [items, monotonic(), None]
+        return stream_id
+
+    def _next_stream_chunk(self, stream_id, size=STREAM_CHUNK_SIZE):
+        """Get the next items of a stream
+
+        Waits for the first item only, the chunk is sent as soon as the next item is not ready, so slow streams
+        (e.g. events) are not buffered until `size` items are produced
+
+        Arguments:
+            stream_id {str} -- stream id
+
+        Keyword Arguments:
+            size {int} -- max number of items (default: {STREAM_CHUNK_SIZE})
+
+        Returns:
+            dict -- {"items": [...], "done": bool}
+        """
+        stream = self._streams.get(stream_id)
+        if not stream:
+            raise j.exceptions.NotFound(f"stream {stream_id} not found")
+
+        items = stream[0]
+        stream[1] = monotonic()
+        chunk = []
+        try:
+            while len(chunk) < size:
+                if not stream[2]:
+                    stream[2] = gevent.spawn(next, items, StopIteration)
+                    # let the items which are ready be produced before checking
+                    gevent.sleep(0)
+
+                if chunk and not stream[2].ready():
+                    return {"items": chunk, "done": False}
+
+                item = stream[2].get()
+                stream[2] = None
+                if item is StopIteration:
+                    break
+                chunk.append(item)
+            else:
+                return {"items": chunk, "done": False}
+        except Exception:
+            self._streams.pop(stream_id, None)
+            raise
+
+        self._streams.pop(stream_id, None)
+        return {"items": chunk, "done": True}
+
+    def _close_stream(self, stream_id):
+        stream = self._streams.pop(stream_id, None)
+        if stream:
+            if stream[2]:
+                # a running generator can not be closed, it's stopped by killing the greenlet getting its next item
+                stream[2].kill()
+            stream[0].close()
+
+    def _close_idle_streams(self):
+        now = monotonic()
+        for stream_id, (_, last_access, _) in list(self._streams.items()):
+            if now - last_access > STREAM_IDLE_TIMEOUT:
+                j.logger.debug(f"closing idle stream {stream_id}")
+                self._close_stream(stream_id)
+
+    def _new_response(self):
+        return dict(
+            success=True,
+            result=None,
+            error=None,
+            error_type=None,
+            is_async=False,
+            task_id=None,
+            stream_id=None,
+            generation=self._registry_generation,
+        )
+
+    def _handle_request(self, request, address):
+        response = self._new_response()
+        codec = get_codec(DEFAULT_CODEC)
+        try:
+            if request == [b"PING"]:
+                # used by clients connection pools as a health check
+                return "PONG"
+
+            if len(request) < 2:
+                response["error"] = "invalid request"
+                response["error_type"] = GedisErrorTypes.BAD_REQUEST.value
+
+            else:
+                actor_name = request.pop(0).decode()
+                method_name = request.pop(0).decode()
+                payload = request.pop(0) if request else None
+                if request:
+                    # the client asked for a specific codec, the reply uses the same one
+                    codec = get_codec(request.pop(0))
+
+                method = self._dispatch_table.get((actor_name, method_name))
+
+                if not method:
+                    if actor_name not in self._loaded_actors:
+                        response["error"] = "actor not found"
+                    else:
+                        response["error"] = "method not found"
+                    response["error_type"] = GedisErrorTypes.NOT_FOUND.value
+
+                else:
+                    j.logger.debug(f"Executing method {method_name} from actor {actor_name} to client {address}")
+
+                    if payload:
+                        args, kwargs = codec.loads(payload)
+                    else:
+                        args, kwargs = (), {}
+
+                    result = self._call(actor_name, method_name, method, args, kwargs)
+                    if inspect.isgenerator(result.get("result")):
+                        # stream methods results are pulled by the client in chunks using `core.stream_next`
+                        result["stream_id"] = self._open_stream(result.pop("result"))
+                    response.update(result)
+
+        except j.exceptions.Value as e:
+            response["error"] = str(e)
+            response["error_type"] = GedisErrorTypes.BAD_REQUEST.value
+
+        except Exception as exception:
+            j.logger.exception("internal error", exception=exception)
+            response["error"] = "internal server error"
+            response["error_type"] = GedisErrorTypes.INTERNAL_SERVER_ERROR.value
+
+        response["success"] = response["error"] is None
+        return codec.dumps(response)
+
+    def _internal_error_response(self):
+        response = self._new_response()
+        response["success"] = False
+        response["error"] = "internal server error"
+        response["error_type"] = GedisErrorTypes.INTERNAL_SERVER_ERROR.value
+        return get_codec(DEFAULT_CODEC).dumps(response)
+
     def _on_connection(self, socket, address):
         j.logger.debug(f"New connection from {address}")
         parser = DefaultParser(65536)
@@ -237,54 +504,70 @@ class GedisServer(Base):
             encoder = ResponseEncoder(socket)
             parser.on_connect(connection)
 
+            if self.pipelined:
+                return self._serve_pipelined(parser, encoder, address)
+
             while True:
-                response = dict(success=True, result=None, error=None, error_type=None, is_async=False, task_id=None)
                 try:
                     request = parser.read_response()
+                    reply = self._handle_request(request, address)
 
-                    if len(request) < 2:
-                        response["error"] = "invalid request"
-                        response["error_type"] = GedisErrorTypes.BAD_REQUEST.value
+                except (TimeoutError, ConnectionError):
+                    j.logger.debug(f"Client {address} closed the connection/or timeout", address)
+                    parser.on_disconnect()
+                    return
 
-                    else:
-                        actor_name = request.pop(0).decode()
-                        method_name = request.pop(0).decode()
-                        actor_object = self._loaded_actors.get(actor_name)
+                except Exception as exception:
+                    j.logger.exception("internal error", exception=exception)
+                    reply = self._internal_error_response()
 
-                        if not actor_object:
-                            response["error"] = "actor not found"
-                            response["error_type"] = GedisErrorTypes.NOT_FOUND.value
+                encoder.encode(reply)
 
-                        elif not hasattr(actor_object, method_name):
-                            response["error"] = "method not found"
-                            response["error_type"] = GedisErrorTypes.NOT_FOUND.value
+        except BrokenPipeError:
+            pass
 
-                        else:
-                            j.logger.debug(
-                                f"Executing method {method_name} from actor {actor_name} to client {address}"
-                            )
+    def _serve_pipelined(self, parser, encoder, address):
+        """Keep reading requests from the connection while previous ones are still executing
 
-                            if request:
-                                args, kwargs = json.loads(request.pop(0), object_hook=deserialize)
-                            else:
-                                args, kwargs = (), {}
+        Every request is executed in a greenlet of a pool bounded by `pipeline_size`,
+        while a single writer greenlet sends the responses back in the same order the requests were received.
+
+        Arguments:
+            parser {DefaultParser} -- redis protocol parser bound to the connection
+            encoder {ResponseEncoder} -- response encoder bound to the connection
+            address {tuple} -- client address
+        """
+        pool = Pool(self.pipeline_size)
+        pending = gevent.queue.Queue()
+        writer = gevent.spawn(self._write_pipelined, pending, encoder, address)
 
-                            method = getattr(actor_object, method_name)
-                            result = self._execute(method, args, kwargs)
-                            response.update(result)
+        try:
+            while not writer.ready():
+                try:
+                    request = parser.read_response()
+                    # blocks when the pool is full, so a client can't have more than
+                    # `pipeline_size` requests in flight on a single connection
+                    pending.put(pool.spawn(self._handle_request, request, address))
 
                 except (TimeoutError, ConnectionError):
                     j.logger.debug(f"Client {address} closed the connection/or timeout", address)
                     parser.on_disconnect()
-                    return
+                    break
 
                 except Exception as exception:
                     j.logger.exception("internal error", exception=exception)
-                    response["error"] = "internal server error"
-                    response["error_type"] = GedisErrorTypes.INTERNAL_SERVER_ERROR.value
-
-                response["success"] = response["error"] is None
-                encoder.encode(json.dumps(response, default=serialize))
-
-        except BrokenPipeError:
-            pass
+                    result = AsyncResult()
+                    result.set(self._internal_error_response())
+                    pending.put(result)
+        finally:
+            pending.put(StopIteration)
+            writer.join()
+            pool.kill()
+
+    def _write_pipelined(self, pending, encoder, address):
+        for result in pending:
+            try:
+                encoder.encode(result.get())
+            except (BrokenPipeError, ConnectionResetError):
+                j.logger.debug(f"Client {address} closed the connection before all responses were sent")
+                return
@@ -4,6 +4,9 @@ import json
 import inspect
 from jumpscale.loader import j
 from jumpscale.servers.gedis.baseactor import BaseActor, actor_method
+from jumpscale.servers.gedis import executors
+from jumpscale.servers.gedis.cache import results_cache
+from jumpscale.servers.gedis.codecs import CODECS
 
 
 class CoreActor(BaseActor):
@@ -24,6 +27,154 @@ class CoreActor(BaseActor):
         """
         return list(self._server._loaded_actors.keys())
 
+    @actor_method
+    def registry(self) -> dict:
+        """Get the actors registry generation
+
+        The generation is bumped whenever an actor is registered or unregistered, it's also sent with every response
+
+        Returns:
+            dict -- {"generation": int, "actors": {actor_name: generation the actor was registered at}}
+        """
+        return {"generation": self._server._registry_generation, "actors": dict(self._server._actors_generations)}
+
+    @actor_method
+    def list_codecs(self) -> list:
+        """List supported wire codecs
+
+        Returns:
+            list -- list of codec names that can be sent with requests
+        """
+        return list(CODECS.keys())
+
+    @actor_method
+    def executors_stats(self) -> dict:
+        """Get metrics of executors used by offloaded actor methods
+
+        Returns:
+            dict -- executors pools metrics and per actor in flight and queued calls
+        """
+        actors = {}
+        for actor_name, actor in self._server._loaded_actors.items():
+            limiter = actor.__dict__.get("_executor_limiter")
+            if limiter:
+                actors[actor_name] = limiter.stats()
+        return {"executors": executors.executors_stats(), "actors": actors}
+
+    @actor_method
+    def metrics(self) -> dict:
+        """Get requests metrics of loaded actors methods
+
+        Returns:
+            dict -- calls count, errors count by error type, in flight calls and latency histogram by `actor.method`
+        """
+        return self._server._metrics.to_dict()
+
+    @actor_method
+    def reset_metrics(self) -> bool:
+        """Reset requests metrics of all actors methods
+
+        Returns:
+            bool -- True if reset
+        """
+        self._server._metrics.reset()
+        return True
+
+    @actor_method
+    def cache_stats(self) -> dict:
+        """Get results cache metrics
+
+        Returns:
+            dict -- cache size and hits, misses, evictions and invalidations by method
+        """
+        return results_cache.stats()
+
+    @actor_method
+    def cache_invalidate(self, actor_name: str = "", method_name: str = "") -> bool:
+        """Invalidate cached results
+
+        Arguments:
+            actor_name {str} -- actor name, all cached results are invalidated if not given (default: {""})
+            method_name {str} -- method name, all cached methods of the actor are invalidated if not given (default: {""})
+
+        Returns:
+            bool -- True if invalidated
+        """
+        if not actor_name:
+            results_cache.invalidate()
+            return True
+
+        actor = self._server._loaded_actors.get(actor_name)
+        if not actor:
+            raise j.exceptions.NotFound(f"actor {actor_name} not found")
+
+        method_names = [method_name] if method_name else []
+        actor._invalidate_cache(*method_names)
+        return True
+
+    @actor_method
+    def get_task(self, task_id: str) -> dict:
+        """Get the state of a background task and its result once it's done
+
+        Arguments:
+            task_id {str} -- task id returned with the async method response
+
+        Returns:
+            dict -- task info, including `state`, `done`, `result`, `error` and `error_type`
+        """
+        return self._server._get_task_info(task_id)
+
+    @actor_method
+    def wait_task(self, task_id: str, timeout: int = 30) -> dict:
+        """Wait for a background task to finish
+
+        Arguments:
+            task_id {str} -- task id returned with the async method response
+            timeout {int} -- max seconds to wait (default: {30})
+
+        Returns:
+            dict -- task info (see `get_task`), `done` is False if the timeout is reached
+        """
+        return self._server._wait_task(task_id, timeout)
+
+    @actor_method
+    def list_tasks(self) -> list:
+        """List background tasks which are not expired yet
+
+        Returns:
+            list -- tasks ids, names and states
+        """
+        return [
+            {"task_id": task.id, "name": task.name, "state": task.state, "created": task.created}
+            for task in self._server._tasks.list()
+        ]
+
+    @actor_method
+    def stream_next(self, stream_id: str, size: int = 100) -> dict:
+        """Get the next chunk of a stream method result
+
+        Arguments:
+            stream_id {str} -- stream id returned with the stream method response
+            size {int} -- max number of items in the chunk (default: {100})
+
+        Returns:
+            dict -- {"items": [...], "done": bool}, the stream is closed once done is True
+        """
+        return self._server._next_stream_chunk(stream_id, size)
+
+    @actor_method
+    def stream_close(self, stream_id: str) -> bool:
+        """Close a stream before consuming all of its items
+
+        Arguments:
+            stream_id {str} -- stream id
+
+        Returns:
+            bool -- True if closed
+        """
+        self._server._close_stream(stream_id)
+        return True
+
 
 class SystemActor(BaseActor):
     def __init__(self):
@@ -0,0 +1,150 @@
+"""Background execution of long running actor methods
+
+Calls to methods decorated with `@actor_method(is_async=True)` return immediately with `is_async` set and a `task_id`,
+the method runs later on a bounded pool of worker greenlets (`TASKS_POOL_SIZE`), extra tasks wait in a queue.
+
+Results (or errors) are kept for `TASK_RESULT_TTL` seconds after the task is finished, they can be fetched using
+`core.get_task` or waited for using `core.wait_task`.
+
+Note that async methods still run in the server event loop, methods that also block it (CPU heavy or blocking calls)
+should be offloaded as well using `executor`, see `jumpscale.servers.gedis.executors`.
+"""
+import uuid
+from time import monotonic, time
+
+import gevent
+from gevent.event import Event
+from gevent.queue import Queue
+
+from jumpscale.loader import j
+
+TASKS_POOL_SIZE = 10
+TASK_RESULT_TTL = 600
+
+
+class TaskState:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCESS = "success"
+    FAILURE = "failure"
+
+
+class Task:
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.state = TaskState.QUEUED
+        self.result = None
+        self.exception = None
+        self.created = time()
+        self.started = None
+        self.finished = None
+        self._finished_at = None
+        self._done = Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def run(self, func, args, kwargs):
+        self.state = TaskState.RUNNING
+        self.started = time()
+        try:
+            self.result = func(*args, **kwargs)
+            self.state = TaskState.SUCCESS
+        except Exception as e:
+            self.exception = e
+            self.state = TaskState.FAILURE
+        finally:
+            self.finished = time()
+            self._finished_at = monotonic()
+            self._done.set()
+
+    def wait(self, timeout=None):
+        """Wait for the task to finish
+
+        Keyword Arguments:
+            timeout {float} -- max seconds to wait, waits forever if None (default: {None})
+
+        Returns:
+            bool -- True if the task is done
+        """
+        return self._done.wait(timeout)
+
+
+class TaskManager:
+    def __init__(self, size=TASKS_POOL_SIZE, result_ttl=TASK_RESULT_TTL):
+        self.size = size
+        self.result_ttl = result_ttl
+        self._tasks = {}
+        self._queue = Queue()
+        self._workers = []
+
+    def _worker(self):
+        while True:
+            task, func, args, kwargs, callback = self._queue.get()
+            task.run(func, args, kwargs)
+            if callback:
+                try:
+                    callback(task)
+                except Exception as e:
+                    j.logger.exception(f"error while executing callback of task {task.name}", exception=e)
+
+    def _start_workers(self):
+        self._workers = [worker for worker in self._workers if not worker.dead]
+        while len(self._workers) < self.size:
+            self._workers.append(gevent.spawn(self._worker))
+
+    def _expire(self):
+        now = monotonic()
+        for task_id, task in list(self._tasks.items()):
+            if task.done and now - task._finished_at > self.result_ttl:
+                self._tasks.pop(task_id, None)
+
+    def submit(self, func, args, kwargs, name=None, callback=None):
+        """Queue a call to be executed in the background
+
+        Arguments:
+            func {callable} -- function to call
+            args {tuple} -- function arguments
+            kwargs {dict} -- function keyword arguments
+
+        Keyword Arguments:
+            name {str} -- task name, e.g. `actor.method` (default: {None})
+            callback {callable} -- called with the task once it's finished (default: {None})
+
+        Returns:
+            Task -- queued task
+        """
+        self._expire()
+        self._start_workers()
+        task = Task(name)
+        self._tasks[task.id] = task
+        self._queue.put((task, func, args, kwargs, callback))
+        return task
+
+    def get(self, task_id):
+        """Get a task by its id
+
+        Arguments:
+            task_id {str} -- task id
+
+        Returns:
+            Task -- task object or None if not found (or expired)
+        """
+        self._expire()
+        return self._tasks.get(task_id)
+
+    def list(self):
+        self._expire()
+        return list(self._tasks.values())
+
+    def stats(self):
+        states = {}
+        for task in self._tasks.values():
+            states[task.state] = states.get(task.state, 0) + 1
+        return {"size": self.size, "queued": self._queue.qsize(), "tasks": states}
+
+    def shutdown(self):
+        gevent.killall(self._workers)
+        self._workers = []
@@ -1,25 +1,49 @@
+import inspect
 import json
+from collections import OrderedDict
 from jumpscale.core.base import Base, fields
 from jumpscale.loader import j
 from gevent.pool import Pool
 from bottle import Bottle, abort, request, response
+from jumpscale.clients.gedis.gedis import ActorResult, RemoteException
+from jumpscale.servers.gedis.codecs import serialize
 from jumpscale.servers.gedis.server import GedisErrorTypes
+from jumpscale.servers.gedis.metrics import to_prometheus
+from jumpscale.servers.gedis_http.compression import choose_encoding, compress, compress_stream, etag_matches, make_etag
 from gevent.pywsgi import WSGIServer
 from jumpscale.core.base import StoredFactory
 
+# methods that block until there's an output (long polling), served from a separate connection pool
+BLOCKING_METHODS = ["chatflows_chatbot.fetch", "core.wait_task"]
+# max number of async calls tasks remembered with their package, to be polled using `/<package>/__tasks/<task_id>`
+TASKS_MAX_SIZE = 10000
+
 
 class GedisHTTPServer(Base):
     host = fields.String(default="127.0.0.1")
     port = fields.Integer(default=8000)
     allow_cors = fields.Boolean(default=True)
+    local_calls = fields.Boolean(default=True)
+    compression_min_size = fields.Integer(default=1024)
+    etags = fields.Boolean(default=True)
+    batch_max_calls = fields.Integer(default=50)
+    batch_concurrency = fields.Integer(default=10)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._app = Bottle()
         self._client = None
+        self._local_server = None
+        # (package, actor name) of async calls tasks by task id
+        self._tasks_actors = OrderedDict()
         http_methods = ["GET", "POST"]
         if self.allow_cors:
             http_methods.extend(["OPTIONS", "PUT", "DELETE"])
+        self._app.route("/metrics", "GET", self.metrics_handler)
+        batch_methods = ["POST", "OPTIONS"] if self.allow_cors else ["POST"]
+        self._app.route("/<package>/batch", batch_methods, self.enable_cors(self.batch_handler, self.allow_cors))
+        # `__tasks` can't collide with actors names
+        self._app.route("/<package>/__tasks/<task_id>", "GET", self.enable_cors(self.task_handler, self.allow_cors))
         self._app.route("/<package>/<actor>/<method>", http_methods, self.enable_cors(self.handler, self.allow_cors))
 
     @property
@@ -27,12 +51,87 @@ class GedisHTTPServer(Base):
         if self._client is None:
             self._client = j.clients.gedis.get(self.instance_name)
             self._client.disable_deserialization = True
+            self._client.pooled = True
+            self._client.blocking_methods = BLOCKING_METHODS
         return self._client
 
+    @property
+    def local_server(self):
+        """Gedis server with the same name if it's running in this process (e.g. in threebot server)
+
+        Actors of a local server are called directly, without the redis protocol round trip and the wire encoding.
+        """
+        if not self.local_calls:
+            return None
+
+        if self._local_server is None:
+            server = j.servers.gedis.find(self.instance_name)
+            if not server or not server.is_running:
+                return None
+            self._local_server = server
+
+        if not self._local_server.is_running:
+            return None
+        return self._local_server
+
     def make_response(self, code, content):
+        """Make a JSON response, compressed if it's larger than `compression_min_size` and the client accepts it
+
+        Successful responses get an entity tag, requests with a matching `If-None-Match` get `304 Not Modified`
+
+        Arguments:
+            code {int} -- status code
+            content {any} -- JSON serializable content
+
+        Returns:
+            bytes -- response body
+        """
+        body = json.dumps(content, default=serialize).encode()
         response.status = code
         response.content_type = "application/json"
-        return json.dumps(content)
+
+        encoding = None
+        if self.compression_min_size and len(body) >= self.compression_min_size:
+            response.set_header("Vary", "Accept-Encoding")
+            encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+
+        if code == 200 and self.etags:
+            etag = make_etag(body, encoding)
+            response.set_header("ETag", etag)
+            # let browsers keep the response, but always check if it's still valid
+            response.set_header("Cache-Control", "no-cache")
+            if etag_matches(request.headers.get("If-None-Match"), etag):
+                response.status = 304
+                return b""
+
+        if encoding:
+            response.set_header("Content-Encoding", encoding)
+            body = compress(body, encoding)
+        return body
+
+    def make_stream_response(self, items):
+        """Send stream items as newline delimited JSON, using chunked transfer encoding
+
+        Streams are compressed if the client accepts it (the body size isn't known in advance),
+        they don't get entity tags for the same reason, lists that should be revalidated using `If-None-Match`
+        (e.g. logs and alerts) are served by non-stream methods
+
+        Arguments:
+            items {iterable} -- stream items
+
+        Returns:
+            generator -- JSON lines
+        """
+        response.status = 200
+        response.content_type = "application/x-ndjson"
+        lines = ((json.dumps(item, default=serialize) + "\n").encode() for item in items)
+
+        encoding = choose_encoding(request.headers.get("Accept-Encoding")) if self.compression_min_size else None
+        response.set_header("Vary", "Accept-Encoding")
+        if encoding:
+            response.set_header("Content-Encoding", encoding)
+            return compress_stream(lines, encoding)
+        return lines
 
     def enable_cors(self, fn, allow_cors=True):
         def _enable_cors(*args, **kwargs):
@@ -52,34 +151,205 @@ class GedisHTTPServer(Base):
         else:
             return fn
 
-    def handler(self, package, actor, method):
-        actors = self.client.actors
+    def call(self, package, actor, method, kwargs, respond_async=False):
+        """Call an actor method, in process if the gedis server is running locally or using the gedis client otherwise
+
+        Arguments:
+            package {str} -- package name
+            actor {str} -- actor name
+            method {str} -- method name
+            kwargs {dict} -- method keyword arguments
+
+        Keyword Arguments:
+            respond_async {bool} -- return async methods task ids instead of waiting for their results (default: {False})
+
+        Returns:
+            ActorResult -- call result
+        """
+        actor_name = f"{package}_{actor}"
+        server = self.local_server
+        if server:
+            if actor_name not in server._loaded_actors:
+                return ActorResult(success=False, error="actor not found", error_type=GedisErrorTypes.BAD_REQUEST)
 
-        actor = getattr(actors, f"{package}_{actor}", None)
-        if not actor:
-            return self.make_response(400, {"error": "actor not found"})
+            if (actor_name, method) not in server._dispatch_table:
+                return ActorResult(success=False, error="method not found", error_type=GedisErrorTypes.BAD_REQUEST)
 
-        method = getattr(actor, method, None)
-        if not method:
-            return self.make_response(400, {"error": "method not found"})
+            result = self.make_actor_result(server.execute(actor_name, method, **kwargs))
+            if result.is_async and not respond_async:
+                result = self.make_task_result(server._wait_task(result.task_id))
+            self._remember_task(result, package, actor_name)
+            return result
 
+        actor_proxy = getattr(self.client.actors, actor_name, None)
+        if not actor_proxy:
+            return ActorResult(success=False, error="actor not found", error_type=GedisErrorTypes.BAD_REQUEST)
+
+        if method not in actor_proxy.actor_info["methods"]:
+            return ActorResult(success=False, error="method not found", error_type=GedisErrorTypes.BAD_REQUEST)
+
+        result = getattr(actor_proxy, method)(**kwargs)
+        if result.is_async and not respond_async:
+            result = self.client.wait_task(result.task_id)
+        self._remember_task(result, package, actor_name)
+        return result
+
+    def _remember_task(self, result, package, actor_name):
+        if not result.is_async:
+            return
+
+        self._tasks_actors[result.task_id] = (package, actor_name)
+        while len(self._tasks_actors) > TASKS_MAX_SIZE:
+            self._tasks_actors.popitem(last=False)
+
+    def _is_actor_loaded(self, actor_name):
+        server = self.local_server
+        if server:
+            return actor_name in server._loaded_actors
+        return getattr(self.client.actors, actor_name, None) is not None
+
+    def handler(self, package, actor, method):
         kwargs = request.json or dict()
-        response = method(**kwargs)
+        # callers asking for async responses poll the task result using `/<package>/__tasks/<task_id>`
+        respond_async = "respond-async" in request.headers.get("Prefer", "")
+        result = self.call(package, actor, method, kwargs, respond_async=respond_async)
 
-        if not response.success:
-            if response.error_type == GedisErrorTypes.NOT_FOUND:
-                return self.make_response(404, {"error": response.error})
+        if result.success and (result.stream_id or inspect.isgenerator(result.result)):
+            return self.make_stream_response(result.result)
 
-            elif response.error_type == GedisErrorTypes.BAD_REQUEST:
-                return self.make_response(400, {"error": response.error})
+        return self.make_response(*self.get_status(result))
 
-            elif response.error_type == GedisErrorTypes.PERMISSION_ERROR:
-                return self.make_response(403, {"error": response.error})
+    def batch_handler(self, package):
+        """Execute many actor methods calls of a package concurrently
+
+        The request body is a list of `{"actor": ..., "method": ..., "kwargs": {...}}` calls, the response is a list
+        of `{"status": <status code>, "result": ...}` or `{"status": <status code>, "error": ...}` in the same order.
+
+        Calls are limited to the package in the url, so they're subject to the same authorization of single calls.
+        """
+        calls = request.json
+        if not isinstance(calls, list):
+            return self.make_response(400, {"error": "request body should be a list of calls"})
+
+        if len(calls) > self.batch_max_calls:
+            return self.make_response(400, {"error": f"max number of calls in a batch is {self.batch_max_calls}"})
+
+        respond_async = "respond-async" in request.headers.get("Prefer", "")
+
+        def execute(call):
+            if not isinstance(call, dict) or not call.get("actor") or not call.get("method"):
+                return {"status": 400, "error": "invalid call, actor and method are required"}
+
+            if call.get("package", package) != package:
+                return {"status": 400, "error": f"calls are limited to package {package}"}
+
+            kwargs = call.get("kwargs") or {}
+            if not isinstance(kwargs, dict):
+                return {"status": 400, "error": "kwargs should be an object"}
+
+            try:
+                result = self.call(package, call["actor"], call["method"], kwargs, respond_async=respond_async)
+                if result.success and (result.stream_id or inspect.isgenerator(result.result)):
+                    result.result = list(result.result)
+                status, content = self.get_status(result)
+            except Exception as e:
+                j.logger.exception(f"error while executing batch call {call}", exception=e)
+                status, content = 500, {"error": "internal server error"}
+
+            if status >= 400:
+                return {"status": status, "error": content["error"]}
+            return {"status": status, "result": content}
+
+        pool = Pool(self.batch_concurrency)
+        return self.make_response(200, pool.map(execute, calls))
+
+    def make_actor_result(self, response):
+        response = dict(response)
+        response.pop("generation", None)
+        if response["error_type"] is not None:
+            response["error_type"] = GedisErrorTypes(response["error_type"])
+        return ActorResult(**response)
+
+    def make_task_result(self, task):
+        if not task["done"]:
+            return ActorResult(is_async=True, task_id=task["task_id"])
+
+        error_type = GedisErrorTypes(task["error_type"]) if task["error_type"] is not None else None
+        return ActorResult(
+            success=task["error"] is None,
+            result=task["result"],
+            error=task["error"],
+            error_type=error_type,
+            task_id=task["task_id"],
+        )
+
+    def task_handler(self, package, task_id):
+        """Get a background task result, waits up to `timeout` seconds (query parameter) for the task to finish
+
+        Only tasks of async calls of the package actors (made using `Prefer: respond-async`) are returned,
+        so they're subject to the same authorization of the calls
+        """
+        try:
+            timeout = int(request.query.get("timeout", 0))
+        except ValueError:
+            return self.make_response(400, {"error": "timeout should be an integer"})
+
+        server = self.local_server
+        try:
+            task_package, actor_name = self._tasks_actors.get(task_id, (None, None))
+            if task_package != package or not self._is_actor_loaded(actor_name):
+                raise j.exceptions.NotFound(f"task {task_id} not found")
+
+            if server:
+                result = self.make_task_result(server._wait_task(task_id, timeout))
+            else:
+                result = self.client.wait_task(task_id, timeout=timeout)
+        except (RemoteException, j.exceptions.NotFound) as e:
+            return self.make_response(404, {"error": str(e)})
+
+        return self.make_response(*self.get_status(result))
+
+    def get_status(self, result):
+        """Get the http status code and content of an actor call result
+
+        Arguments:
+            result {ActorResult} -- call result
+
+        Returns:
+            tuple -- (status code, content)
+        """
+        if result.is_async:
+            return 202, {"task_id": result.task_id}
+
+        if not result.success:
+            if result.error_type == GedisErrorTypes.NOT_FOUND:
+                return 404, {"error": result.error}
+
+            elif result.error_type == GedisErrorTypes.BAD_REQUEST:
+                return 400, {"error": result.error}
+
+            elif result.error_type == GedisErrorTypes.PERMISSION_ERROR:
+                return 403, {"error": result.error}
 
             else:
-                return self.make_response(500, {"error": response.error})
+                return 500, {"error": result.error}
+
+        return 200, result.result
+
+    def metrics_handler(self):
+        """Expose gedis server requests metrics in prometheus text format"""
+        server = self.local_server
+        if server:
+            metrics = server._metrics.to_dict()
+        else:
+            result = self.client.execute("core", "metrics")
+            if not result.success:
+                return self.make_response(500, {"error": result.error})
+            metrics = result.result
 
-        return self.make_response(200, response.result)
+        response.status = 200
+        response.content_type = "text/plain; version=0.0.4"
+        return to_prometheus(metrics)
 
     @property
     def gevent_server(self):
@@ -0,0 +1,134 @@
+"""Response compression and entity tags helpers of gedis http bridge
+
+Responses are compressed using brotli (if the `brotli` package is installed) or gzip,
+depending on what the client accepts (`Accept-Encoding`).
+
+Entity tags are computed from the uncompressed body, compressed representations get the encoding appended
+(e.g. `"<digest>-gzip"`), so they're still different per representation as strong entity tags should be,
+while `If-None-Match` is matched against the digest only.
+"""
+import hashlib
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+
+
+def get_supported_encodings():
+    if brotli:
+        return [BROTLI, GZIP]
+    return [GZIP]
+
+
+def choose_encoding(accept_encoding):
+    """Choose the best supported encoding from an `Accept-Encoding` header value
+
+    Arguments:
+        accept_encoding {str} -- header value, e.g. `gzip, deflate, br;q=0.9`
+
+    Returns:
+        str -- encoding name or None if the client doesn't accept any of the supported encodings
+    """
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        parts = item.strip().split(";")
+        name = parts[0].strip().lower()
+        if not name:
+            continue
+
+        quality = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+
+    candidates = [
+        (accepted.get(encoding, accepted.get("*", 0.0)), -index, encoding)
+        for index, encoding in enumerate(get_supported_encodings())
+    ]
+    quality, _, encoding = max(candidates)
+    if quality <= 0:
+        return None
+    return encoding
+
+
+def compress(data, encoding):
+    if encoding == BROTLI:
+        return brotli.compress(data)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Compress chunks incrementally, every chunk is flushed so the client can process it as soon as it's received
+
+    Arguments:
+        chunks {iterable} -- bytes chunks
+        encoding {str} -- encoding name
+
+    Yields:
+        bytes -- compressed chunks
+    """
+    if encoding == BROTLI:
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def make_etag(data, encoding=None):
+    """Get a strong entity tag of a response body
+
+    Arguments:
+        data {bytes} -- uncompressed response body
+        encoding {str} -- content encoding of the representation (default: {None})
+
+    Returns:
+        str -- quoted entity tag
+    """
+    digest = hashlib.sha1(data).hexdigest()
+    if encoding:
+        return f'"{digest}-{encoding}"'
+    return f'"{digest}"'
+
+
+def _etag_digest(etag):
+    etag = etag.strip()
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    return etag.strip('"').split("-", 1)[0]
+
+
+def etag_matches(if_none_match, etag):
+    """Check if an entity tag matches an `If-None-Match` header value
+
+    Arguments:
+        if_none_match {str} -- header value, a list of entity tags or `*`
+        etag {str} -- current entity tag
+
+    Returns:
+        bool -- True if the client representation is still valid
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    digest = _etag_digest(etag)
+    return any(_etag_digest(tag) == digest for tag in if_none_match.split(","))
@@ -7,7 +7,9 @@ import toml
 import shutil
 import gevent
 import signal
+from time import monotonic
 from urllib.parse import urlparse
+from gevent.pool import Pool
 from gevent.pywsgi import WSGIServer
 from jumpscale.core.base import Base, fields
 from jumpscale import packages as pkgnamespace
@@ -23,6 +25,8 @@ GEDIS_HTTP_PORT = 8000
 SERVICE_MANAGER = "service_manager"
 CHATFLOW_SERVER_HOST = "127.0.0.1"
 CHATFLOW_SERVER_PORT = 31000
+# max number of packages prepared concurrently during installation
+PACKAGES_INSTALL_CONCURRENCY = 5
 DEFAULT_PACKAGES = {
     "auth": {"path": os.path.dirname(j.packages.auth.__file__), "giturl": ""},
     "chatflows": {"path": os.path.dirname(j.packages.chatflows.__file__), "giturl": ""},
@@ -144,6 +148,15 @@ class NginxPackageConfig:
         return [default_server]
 
     def apply(self, write_config=True):
+        """Apply the package servers and locations to nginx websites
+
+        Args:
+            write_config (bool, optional): write the websites configuration files. Defaults to True.
+
+        Returns:
+            list: configured websites
+        """
+        websites = []
         default_ports = [PORTS.HTTP, PORTS.HTTPS]
         servers = self.default_config + self.package.config.get("servers", [])
         for server in servers:
@@ -154,6 +167,7 @@ class NginxPackageConfig:
                     server_name = f"{self.package.name}_{server_name}"
 
                 website = self.nginx.get_website(server_name, port=port)
+                websites.append(website)
                 website.ssl = server.get("ssl", port == PORTS.HTTPS)
                 website.includes = server.get("includes", [])
                 website.domain = server.get("domain", self.default_config[0].get("domain"))
@@ -221,6 +235,7 @@ class NginxPackageConfig:
                         loc.package_name = self.package.name
                 if write_config:
                     website.configure(generate_certificates=self.nginx.cert)
+        return websites
 
 
 class Package:
@@ -292,6 +307,15 @@ class Package:
     def ui_name(self):
         return self.config.get("ui_name", self.name)
 
+    @property
+    def dependencies(self):
+        """names of packages to be installed before this package (`depends_on` in package.toml),
+        all packages depend on the default packages"""
+        dependencies = list(self.config.get("depends_on", []))
+        if self.name not in DEFAULT_PACKAGES:
+            dependencies.extend(name for name in DEFAULT_PACKAGES if name not in dependencies)
+        return dependencies
+
     @property
     def actors_dir(self):
         actors_dir = j.sals.fs.join_paths(self.path, self.config.get("actors_dir", "actors"))
@@ -542,7 +566,6 @@ class PackageManager(Base):
         # install package if threebot is started
         if self.threebot.started:
             self.install(package)
-            self.threebot.nginx.reload()
         self.packages[package.name] = {
             "name": package.name,
             "path": package.path,
@@ -605,7 +628,120 @@ class PackageManager(Base):
             package ([package object]): get package object using [self.get(package_name)]
 
         Returns:
-            [dict]: [package info]
+            [dict]: [install timings (in seconds) of the package]
+        """
+        return self.install_many([package], required=[package.name])[package.name]
+
+    def install_many(self, packages, required=None):
+        """Install packages, packages that don't depend on each other are prepared concurrently
+
+        Packages are installed in levels, every level has the packages whose dependencies are all in the previous levels:
+
+        - prepare: package preinstall and bottle apps loading, concurrently for all packages of the level
+        - register: mount bottle apps, register actors, chats and services, in order
+        - commit (once for all packages): start the rack, write nginx websites configurations,
+          start packages, reload gedis http client and nginx
+
+        Packages `start` methods are called in the commit, after all levels are registered, so a package is started
+        after all of its dependencies are registered and started, and before nginx is reloaded with its websites.
+        Packages failing to start are handled like packages failing to install, their apps and actors stay registered.
+
+        Args:
+            packages (list): package objects
+            required (list, optional): names of packages that must be installed, errors are raised for these packages,
+                                       other packages (and packages depending on them) are skipped with logged errors.
+                                       Defaults to None.
+
+        Returns:
+            dict: install timings (in seconds) by package name and phase, and `commit` timing
+        """
+        required = set(required or [])
+        timings = {}
+        installed = []
+        failed = set()
+
+        def fail(package, e):
+            if package.name in required:
+                raise j.exceptions.Runtime(f"Error happened during installing {package.name} package: {e}") from e
+            j.logger.error(f"couldn't install package {package.name}: {e}")
+            failed.add(package.name)
+
+        def prepare(package):
+            started = monotonic()
+            try:
+                return self._prepare(package), None
+            except Exception as e:
+                return None, e
+            finally:
+                timings[package.name]["prepare"] = monotonic() - started
+
+        for level in self._get_install_levels(packages, fail):
+            for package in list(level):
+                failed_dependencies = failed.intersection(package.dependencies)
+                if failed_dependencies:
+                    level.remove(package)
+                    fail(package, j.exceptions.Runtime(f"dependencies {sorted(failed_dependencies)} failed"))
+                else:
+                    timings[package.name] = {}
+
+            prepared = Pool(PACKAGES_INSTALL_CONCURRENCY).map(prepare, level)
+            for package, (apps, error) in zip(level, prepared):
+                if error:
+                    fail(package, error)
+                    continue
+
+                started = monotonic()
+                try:
+                    self._register(package, *apps)
+                    installed.append(package)
+                except Exception as e:
+                    fail(package, e)
+                finally:
+                    timings[package.name]["register"] = monotonic() - started
+
+        started = monotonic()
+        self._commit(installed, timings, fail)
+        timings["commit"] = monotonic() - started
+        installed = [package for package in installed if package.name not in failed]
+
+        report = ", ".join(
+            f"{name}: {sum(phases.values()):.2f}s" for name, phases in timings.items() if name != "commit"
+        )
+        j.logger.info(f"installed {len(installed)} packages ({report}), commit: {timings['commit']:.2f}s")
+        return timings
+
+    def _get_install_levels(self, packages, fail):
+        names = {package.name for package in packages}
+        pending = list(packages)
+        done = set()
+        for package in packages:
+            missing = [name for name in package.dependencies if name not in names and name not in self.packages]
+            if missing:
+                fail(package, j.exceptions.NotFound(f"missing dependencies {missing}"))
+                pending.remove(package)
+                done.add(package.name)
+
+        while pending:
+            level = [
+                package
+                for package in pending
+                if all(name in done or name not in names for name in package.dependencies)
+            ]
+            if not level:
+                for package in pending:
+                    fail(package, j.exceptions.Value(f"circular dependencies {package.dependencies}"))
+                return
+
+            yield level
+            for package in level:
+                pending.remove(package)
+                done.add(package.name)
+
+    def _prepare(self, package):
+        """Run the package preinstall and load its bottle apps, without changing the server state
+
+        Returns:
+            tuple: (package app, list of (name, standalone server))
         """
         sys.path.append(package.path + "/../")  # TODO to be changed
         package.preinstall()
@@ -619,6 +755,7 @@ class PackageManager(Base):
         # then mount this app on threebot main app
         # this will work with multiple non-standalone apps
         package_app = j.servers.appserver.make_main_app()
+        standalone_servers = []
         for bottle_server in package.bottle_servers:
             path = j.sals.fs.join_paths(package.path, bottle_server["file_path"])
             if not j.sals.fs.exists(path):
@@ -627,11 +764,17 @@ class PackageManager(Base):
             standalone = bottle_server.get("standalone", False)
             if standalone:
                 bottle_wsgi_server = package.get_bottle_server(path, bottle_server["host"], bottle_server["port"])
-                self.threebot.rack.add(f"{package.name}_{bottle_server['name']}", bottle_wsgi_server)
+                standalone_servers.append((f"{package.name}_{bottle_server['name']}", bottle_wsgi_server))
             else:
                 bottle_app = package.get_package_bottle_app(path)
                 package_app.merge(bottle_app)
 
+        return package_app, standalone_servers
+
+    def _register(self, package, package_app, standalone_servers):
+        for name, bottle_wsgi_server in standalone_servers:
+            self.threebot.rack.add(name, bottle_wsgi_server)
+
         if package_app.routes:
             j.logger.info(f"registering {package.name} package app")
             self.threebot.mainapp.mount(f"/{package.name}", package_app)
@@ -650,22 +793,48 @@ class PackageManager(Base):
             for service in package.services:
                 self.threebot.services.add_service(service["name"], service["path"])
 
+    def _commit(self, packages, timings, fail):
         j.logger.info(f"starting rack")
         # start servers
         self.threebot.rack.start()
 
         j.logger.info(f"applying nginx config")
-        # apply nginx configuration
-        package.nginx_config.apply()
-
-        j.logger.info(f"starting package")
-        # execute package start method
-        package.start()
+        # apply nginx configuration, websites shared by packages (e.g. default website) are written once
+        websites = {}
+        for package in packages:
+            for website in package.nginx_config.apply(write_config=False):
+                websites[website.instance_name] = website
+        nginx = j.sals.nginx.get("main")
+        nginx_changed = False
+        for website in websites.values():
+            nginx_changed = website.configure(generate_certificates=nginx.cert) or nginx_changed
+
+        j.logger.info(f"starting packages")
+        # execute packages start method, errors are handled after reloading, so other packages are still served
+        start_errors = []
+        for package in packages:
+            started = monotonic()
+            try:
+                package.start()
+            except Exception as e:
+                start_errors.append((package, e))
+            finally:
+                timings[package.name]["start"] = monotonic() - started
 
         j.logger.info(f"reloading gedis")
         self.threebot.gedis_http.client.reload()
-        j.logger.info(f"reloading nginx")
-        self.threebot.nginx.reload()
+        if nginx_changed:
+            j.logger.info(f"reloading nginx")
+            try:
+                # reloads are immediate in the main greenlet (e.g. startup), an invalid package config must not stop it
+                self.threebot.nginx.reload()
+            except Exception as e:
+                j.logger.error(f"couldn't reload nginx: {e}")
+        else:
+            j.logger.info(f"nginx config didn't change, skipping reload")
+
+        for package, e in start_errors:
+            fail(package, e)
 
     def reload(self, package_name):
         if self.threebot.started:
@@ -676,7 +845,6 @@ class PackageManager(Base):
                 for service in package.services:
                     self.threebot.services.stop_service(service["name"])
             self.install(package)
-            self.threebot.nginx.reload()
             self.save()
         else:
             raise j.exceptions.Runtime("Can't reload package. Threebot server is not started")
@@ -688,19 +856,37 @@ class PackageManager(Base):
         """Install and apply all the packages configurations
         This method shall not be called directly from the shell,
         it must be called only from the code on the running Gedis server
+
+        Errors installing the default packages are raised, other packages with errors are skipped
+
+        Returns:
+            dict: install timings (in seconds) by package name and phase
         """
-        all_packages = self.list_all()
-        for package in all_packages:
-            if package not in DEFAULT_PACKAGES:
-                j.logger.info(f"Configuring package {package}")
-                pkg = self.get(package)
-                if not pkg:
-                    j.logger.error(f"can't get package {package}")
-                else:
-                    if pkg.path and pkg.is_valid():
-                        self.install(pkg)
-                    else:
-                        j.logger.error(f"package {package} was installed before but {pkg.path} doesn't exist anymore.")
+        # default packages first, in their order, even if they're missing from the stored packages
+        packages = []
+        for package_name in DEFAULT_PACKAGES:
+            j.logger.info(f"Configuring package {package_name}")
+            if package_name not in self.packages:
+                j.logger.warning(f"default package {package_name} is missing from the stored packages, adding it")
+                self.packages[package_name] = DEFAULT_PACKAGES[package_name].copy()
+            pkg = self.get(package_name)
+            if not pkg:
+                raise j.exceptions.NotFound(f"can't get package {package_name}")
+            packages.append(pkg)
+
+        for package in self.list_all():
+            if package in DEFAULT_PACKAGES:
+                continue
+            j.logger.info(f"Configuring package {package}")
+            pkg = self.get(package)
+            if not pkg:
+                j.logger.error(f"can't get package {package}")
+            elif pkg.path and pkg.is_valid():
+                packages.append(pkg)
+            else:
+                j.logger.error(f"package {package} was installed before but {pkg.path} doesn't exist anymore.")
+
+        return self.install_many(packages, required=DEFAULT_PACKAGES.keys())
 
     def scan_packages_paths_in_dir(self, path):
         """Scans all packages in a path in any level and returns list of package paths
@@ -752,6 +938,8 @@ class ThreebotServer(Base):
         self._started = False
         self._nginx = None
         self._redis = None
+        # install timings (in seconds) of packages by phase, see `PackageManager.install_many`
+        self.startup_timings = {}
         self.rack.add(GEDIS, self.gedis)
         self.rack.add(GEDIS_HTTP, self.gedis_http.gevent_server)
         self.rack.add(SERVICE_MANAGER, self.services)
@@ -864,30 +1052,19 @@ class ThreebotServer(Base):
 
         self.rack.start()
         j.logger.register(f"threebot_{self.instance_name}")
-        # add default packages
-        for package_name in DEFAULT_PACKAGES:
-            j.logger.info(f"Configuring package {package_name}")
-            try:
-                package = self.packages.get(package_name)
-                self.packages.install(package)
-            except Exception as e:
-                self.stop()
-                raise j.core.exceptions.Runtime(
-                    f"Error happened during getting or installing {package_name} package, the detailed error is {str(e)}"
-                ) from e
-
-        # install all package
-
+        # install default and all other packages
         j.logger.info("Adding packages")
-        self.packages._install_all()
+        try:
+            self.startup_timings = self.packages._install_all()
+        except Exception:
+            self.stop()
+            raise
+
         j.logger.info("jsappserver")
         self.jsappserver = WSGIServer(("localhost", 31000), apply_main_middlewares(self.mainapp))
         j.logger.info("rack add")
         self.rack.add(f"appserver", self.jsappserver)
 
-        j.logger.info("Reloading nginx")
-        self.nginx.reload()
-
         # mark server as started
         self._started = True
         j.logger.info(f"routes: {self.mainapp.routes}")
@@ -23,9 +23,12 @@ main = j.tools.nginx.get(name="main")
 main.stop()
 ```
 ## reload
+Reloads are debounced, requests made together result in one reload (after validating the configuration)
 ```
 main = j.tools.nginx.get(name="main")
 main.reload()
+main.reload(wait=True)  # reload now
+main.reload_stats  # {"requested": 3, "performed": 1, "failed": 0, "pending": False}
 ```
 ## restart
 ```
@@ -1,8 +1,15 @@
 import re
 import shutil
+from time import monotonic
+
+import gevent
+
 from jumpscale.loader import j
 from jumpscale.core.base import Base, fields
 
+# seconds without reload requests before reloading nginx, so reloads requested together are done once
+RELOAD_DELAY = 1
+
 
 class NginxServer(Base):
     server_name = fields.String(default="main")
@@ -10,6 +17,9 @@ class NginxServer(Base):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.config_path = j.sals.fs.join_paths(j.core.dirs.CFGDIR, "nginx", self.server_name, "nginx.conf")
+        self._reload_at = None
+        self._reload_greenlet = None
+        self._reload_stats = {"requested": 0, "performed": 0, "failed": 0}
 
     @property
     def check_command_string(self):
@@ -46,6 +56,7 @@ class NginxServer(Base):
         """
         stop nginx server
         """
+        self._cancel_reload()
         cmd = j.tools.startupcmd.get(f"nginx_{self.server_name}")
         cmd.stop()
 
@@ -57,11 +68,74 @@ class NginxServer(Base):
         """
         return j.tools.startupcmd.get(f"nginx_{self.server_name}").is_running()
 
-    def reload(self):
+    def reload(self, wait=None):
         """
         reload nginx server using your config path
+
+        Reloads are debounced: nginx is reloaded once after `RELOAD_DELAY` seconds without new reload requests,
+        and only if the configuration is valid (`nginx -t`)
+
+        Reloads requested from the main greenlet (e.g. a shell or the threebot server startup) are not debounced,
+        nothing may run the gevent hub afterwards to perform them
+
+        Args:
+            wait (bool, optional): reload now and wait for it, errors are raised.
+                                   Defaults to None, True only in the main greenlet.
+        """
+        if wait is None:
+            wait = gevent.getcurrent().parent is None
+
+        self._reload_stats["requested"] += 1
+        if wait:
+            self._cancel_reload()
+            self._reload()
+            return
+
+        self._reload_at = monotonic() + RELOAD_DELAY
+        if self._reload_greenlet is None:
+            self._reload_greenlet = gevent.spawn(self._reload_later)
+
+    def _reload_later(self):
+        while monotonic() < self._reload_at:
+            gevent.sleep(self._reload_at - monotonic())
+
+        # requests received while reloading schedule another reload
+        self._reload_greenlet = None
+        try:
+            self._reload()
+        except Exception as e:
+            j.logger.error(f"couldn't reload nginx {self.server_name}: {e}")
+
+    def _cancel_reload(self):
+        if self._reload_greenlet is not None:
+            self._reload_greenlet.kill()
+            self._reload_greenlet = None
+
+    def _reload(self):
+        try:
+            self.validate()
+            rc, _, err = j.sals.process.execute(f"nginx -c {self.config_path} -s reload")
+            if rc:
+                raise j.exceptions.Runtime(f"nginx reload failed: {err}")
+        except Exception:
+            self._reload_stats["failed"] += 1
+            raise
+        self._reload_stats["performed"] += 1
+
+    def validate(self):
+        """Test nginx configuration
+
+        Raises:
+            j.exceptions.Validation: if the configuration is invalid
         """
-        j.sals.process.execute(f"nginx -c {self.config_path} -s reload")
+        rc, out, err = j.sals.process.execute(f"nginx -t -c {self.config_path}")
+        if rc:
+            raise j.exceptions.Validation(f"invalid nginx configuration: {err or out}")
+
+    @property
+    def reload_stats(self):
+        """reloads counters: requested reloads, performed and failed reloads and if a reload is pending"""
+        return dict(self._reload_stats, pending=self._reload_greenlet is not None)
 
     def restart(self):
         """
@@ -0,0 +1,71 @@
+import imp
+from io import BytesIO
+from unittest import TestCase, skipIf
+
+from jumpscale.loader import j
+from jumpscale.packages.admin.actors.admin import Admin
+from jumpscale.packages.auth.bottle import auth
+from jumpscale.packages.auth.bottle.auth import SESSION_COOKIE
+
+AUTH_APP_PATH = auth.__file__
+ADMIN_NAME = "auth_cache_tester.3bot"
+
+
+@skipIf(
+    not j.core.identity.is_configured or not j.core.config.get_config().get("threebot_connect", True),
+    "admins are only checked with a configured identity and threebot connect",
+)
+class TestAuthCache(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # the auth app is loaded the same way packages bottle apps are loaded by the threebot server
+        cls.served_auth = imp.load_source(AUTH_APP_PATH[:-3], AUTH_APP_PATH)
+
+    def setUp(self):
+        self.admin_actor = Admin()
+        self.session = {
+            "authorized": True,
+            "username": ADMIN_NAME,
+            "email": "auth_cache_tester@example.com",
+            "tid": 1,
+        }
+
+    def tearDown(self):
+        if ADMIN_NAME in j.core.identity.me.admins:
+            self.admin_actor.delete_admin(ADMIN_NAME)
+
+    def _get_status(self, path):
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "wsgi.url_scheme": "http",
+            "wsgi.input": BytesIO(),
+            "HTTP_COOKIE": f"{SESSION_COOKIE}=auth_cache_tester",
+            "beaker.session": self.session,
+        }
+        statuses = []
+        self.served_auth.app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        return int(statuses[0].split()[0])
+
+    def test_01_admins_changes(self):
+        """Test cached auth decisions of the served auth app are invalidated when admins change
+
+        **Test Scenario**
+
+        - Add an admin using the admin actor, check the admin is authorized by the served auth app
+        - Remove the admin using the admin actor, check the cached decision is dropped and the user is forbidden
+        - Add the admin again, check the cached forbidden decision is dropped
+        """
+        self.assertIsNot(self.served_auth.auth_cache, auth.auth_cache)
+
+        self.admin_actor.add_admin(ADMIN_NAME)
+        self.assertEqual(self._get_status("/authorized"), 200)
+        self.assertIsNotNone(self.served_auth.auth_cache.get("auth_cache_tester", "authorized"))
+
+        self.admin_actor.delete_admin(ADMIN_NAME)
+        self.assertEqual(self._get_status("/authorized"), 403)
+
+        self.admin_actor.add_admin(ADMIN_NAME)
+        self.assertEqual(self._get_status("/authorized"), 200)
@@ -0,0 +1,24 @@
+from jumpscale.sals.chatflows.chatflows import chatflow_step
+from jumpscale.sals.chatflows.polls import Poll
+
+QUESTIONS = {"Favorite color": ["Blue", "Red"], "Favorite number": ["One", "Two"]}
+
+
+class SessionsPoll(Poll):
+    poll_name = "test_sessions"
+    # payments need a funded wallet, they're not needed to test restoring sessions
+    steps = ["initialize", "custom_votes", "result"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.QUESTIONS = dict(QUESTIONS)
+        self.metadata = {"new_title_keys": {question: question for question in QUESTIONS}}
+
+    @chatflow_step(title="Votes")
+    def custom_votes(self):
+        for question, options in QUESTIONS.items():
+            self.custom_answers[question] = self.single_choice(question, options, required=True)
+        self.vote()
+
+
+chat = SessionsPoll
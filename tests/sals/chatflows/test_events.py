@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+import gevent
+
+from jumpscale.sals.chatflows.chatflows import GedisChatBot, chatflow_step
+
+
+class EventsChat(GedisChatBot):
+    steps = ["first", "second"]
+
+    @chatflow_step(title="First")
+    def first(self):
+        self.md_show("first")
+
+    @chatflow_step(title="Second")
+    def second(self):
+        self.md_show("second")
+
+
+class TestEvents(TestCase):
+    def setUp(self):
+        self.session = EventsChat.new_session()
+
+    def tearDown(self):
+        for greenlet in (self.session._greenlet, self.session._fetch_greenlet):
+            if greenlet:
+                greenlet.kill()
+
+    def _msg(self, stream):
+        return next(stream)["payload"]["msg"]
+
+    def test_01_shared_streams(self):
+        """Test concurrent streams of the same session
+
+        **Test Scenario**
+
+        - Stream the session outputs and get the first output
+        - Open a second stream restoring the last output, e.g. a reconnecting browser tab
+        - Check both streams get the next output, the first stream is not ended by the second one
+        - Close the second stream and check the first one continues until the `end` output
+        """
+        first = self.session.stream_work(heartbeat=0.1)
+        self.assertEqual(self._msg(first), "first")
+
+        second = self.session.stream_work(restore=True, heartbeat=0.1)
+        self.assertEqual(self._msg(second), "first")
+        self.assertEqual(next(second), {})
+
+        self.session.set_work("")
+        self.assertEqual(self._msg(first), "second")
+        self.assertEqual(self._msg(second), "second")
+        second.close()
+        self.assertEqual(len(self.session._streams_queues), 1)
+
+        self.session.set_work("")
+        self.assertEqual(next(first)["payload"]["category"], "end")
+        self.assertEqual(list(first), [])
+        self.assertEqual(self.session._streams_queues, [])
+
+    def test_02_fetch_takes_over(self):
+        """Test a `get_work` call ends the session streams
+
+        **Test Scenario**
+
+        - Stream the session outputs and get the first output
+        - Wait for the next output using `get_work`
+        - Check the stream is ended and `get_work` gets the next output
+        """
+        stream = self.session.stream_work(heartbeat=0.1)
+        self.assertEqual(self._msg(stream), "first")
+
+        fetch = gevent.spawn(self.session.get_work)
+        self.assertEqual(list(stream), [])
+
+        self.session.set_work("")
+        self.assertEqual(fetch.get(timeout=1)["payload"]["msg"], "second")
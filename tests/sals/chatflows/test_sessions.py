@@ -0,0 +1,135 @@
+import json
+from unittest import TestCase
+
+from jumpscale.loader import j
+from jumpscale.packages.chatflows.actors.chatbot import ChatFlows
+from jumpscale.sals.chatflows.polls import TALLY_KEY, WALLET_NAME, all_users
+from jumpscale.sals.chatflows.sessions import SessionStore
+from tests.sals.chatflows.chats import sessions_poll
+from tests.sals.chatflows.chats.sessions_poll import SessionsPoll
+
+USER_INFO = {"username": "sessions_tester.3bot", "email": "sessions_tester@example.com"}
+USER_NAME = f"{SessionsPoll.poll_name}_sessions_tester"
+CHAT_NAME = ["polls", "sessions_poll"]
+SESSIONS_POLL_PATH = sessions_poll.__file__
+
+
+class TestSessions(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # polls need their wallet to be configured, it's not used by the tested steps
+        cls.created_wallet = not j.clients.stellar.find(WALLET_NAME)
+        if cls.created_wallet:
+            j.clients.stellar.new(WALLET_NAME, network="TEST")
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.created_wallet:
+            j.clients.stellar.delete(WALLET_NAME)
+
+    def setUp(self):
+        self.store = SessionStore()
+        self.session_ids = []
+        self._clean()
+
+    def tearDown(self):
+        for session_id in self.session_ids:
+            self.store.delete(session_id)
+        self._clean()
+
+    def _clean(self):
+        if all_users.find(USER_NAME):
+            all_users.delete(USER_NAME)
+        j.core.db.delete(TALLY_KEY.format(SessionsPoll.poll_name))
+
+    def _answer(self, session, category, value=""):
+        work = session.get_work()
+        self.assertEqual(work["payload"]["category"], category)
+        session.set_work(value)
+        return work
+
+    def test_01_restore_checkpoint(self):
+        """Test restoring a poll session from its checkpoint
+
+        **Test Scenario**
+
+        - Start a poll session, go through `initialize` and stop at the first question of `custom_votes`
+        - Create a new session from the saved checkpoint, as done after a restart
+        - Check the restored session asks the first question again and still knows its user
+        - Answer the questions and check the vote is saved and the `result` step is shown
+        """
+        session = SessionsPoll.new_session({}, store=self.store, name=CHAT_NAME)
+        self.session_ids.append(session.session_id)
+        self._answer(session, "user_info", json.dumps(USER_INFO))
+        self._answer(session, "md_show")
+        self.assertEqual(session.get_work()["payload"]["msg"], "Favorite color")
+        session._greenlet.kill()
+
+        checkpoint = self.store.get(session.session_id)
+        self.assertEqual(checkpoint["step"], 1)
+        self.assertEqual(checkpoint["state"]["user_name"], USER_NAME)
+
+        restored = SessionsPoll.new_session(
+            checkpoint["kwargs"], store=self.store, name=CHAT_NAME, checkpoint=checkpoint
+        )
+        self.assertEqual(restored.session_id, session.session_id)
+        self.assertEqual(restored.user.instance_name, USER_NAME)
+
+        work = self._answer(restored, "single_choice", "Red")
+        self.assertEqual(work["payload"]["msg"], "Favorite color")
+        self.assertEqual(work["info"]["step"], 2)
+        self._answer(restored, "single_choice", "Two")
+
+        work = self._answer(restored, "md_show")
+        self.assertIn("Total number of votes: 1", work["payload"]["msg"])
+        self.assertEqual(restored.get_work()["payload"]["category"], "end")
+
+        user = all_users.get(USER_NAME)
+        self.assertTrue(user.has_voted)
+        self.assertEqual(user.vote_data, {"Favorite color": [0, 1], "Favorite number": [0, 1]})
+
+    def test_02_reaped_session(self):
+        """Test continuing a poll session after it's removed for being idle
+
+        **Test Scenario**
+
+        - Start a poll session using the chatflows actor and answer the first question of `custom_votes`
+        - Make the session idle and remove idle sessions, check it's removed from memory
+        - Fetch the session again, check it's restored and asks the first question of `custom_votes` again
+        - Answer the questions and check the vote is saved
+        """
+        actor = ChatFlows()
+        actor.chats = {CHAT_NAME[0]: {CHAT_NAME[1]: SESSIONS_POLL_PATH}}
+        try:
+            session_id = actor.new(*CHAT_NAME, client_ip="127.0.0.1")["sessionId"]
+            self.session_ids.append(session_id)
+            self.assertEqual(actor.fetch(session_id)["payload"]["category"], "user_info")
+            actor.report(session_id, json.dumps(USER_INFO))
+            self.assertEqual(actor.fetch(session_id)["payload"]["category"], "md_show")
+            actor.report(session_id, "")
+            self.assertEqual(actor.fetch(session_id)["payload"]["msg"], "Favorite color")
+            actor.report(session_id, "Blue")
+            self.assertEqual(actor.fetch(session_id)["payload"]["msg"], "Favorite number")
+
+            actor._sessions_accessed[session_id] -= actor.idle_timeout + 1
+            actor._reap_idle_sessions()
+            self.assertNotIn(session_id, actor.sessions)
+            self.assertEqual(actor.sessions_stats()["reaped"], 1)
+
+            work = actor.fetch(session_id, restore=True)
+            self.assertIn(session_id, actor.sessions)
+            self.assertEqual(work["payload"]["msg"], "Favorite color")
+            actor.report(session_id, "Red")
+            self.assertEqual(actor.fetch(session_id)["payload"]["msg"], "Favorite number")
+            actor.report(session_id, "One")
+            self.assertIn("Total number of votes: 1", actor.fetch(session_id)["payload"]["msg"])
+            actor.report(session_id, "")
+            self.assertEqual(actor.fetch(session_id)["payload"]["category"], "end")
+            self.assertNotIn(session_id, actor.sessions)
+
+            self.assertEqual(all_users.get(USER_NAME).vote_data, {"Favorite color": [0, 1], "Favorite number": [1, 0]})
+        finally:
+            for session_id in list(actor.sessions):
+                actor._remove_session(session_id)
+            if actor._reaper:
+                actor._reaper.kill()
@@ -0,0 +1,94 @@
+from unittest import TestCase
+
+from jumpscale.loader import j
+from jumpscale.sals.chatflows.polls import TALLY_KEY, all_users, poll_tally
+
+POLL_NAME = "test_tally"
+QUESTION = "Favorite color"
+
+
+class TestTally(TestCase):
+    def setUp(self):
+        self.user_names = []
+        j.core.db.delete(TALLY_KEY.format(POLL_NAME))
+
+    def tearDown(self):
+        for user_name in self.user_names:
+            all_users.delete(user_name)
+        j.core.db.delete(TALLY_KEY.format(POLL_NAME))
+
+    def _vote(self, name, answers, weighted=None, previous=True):
+        user_name = f"{POLL_NAME}_{name}"
+        if user_name in self.user_names:
+            user = all_users.get(user_name)
+            previous_vote_data, previous_vote_data_weighted = user.vote_data, user.vote_data_weighted
+        else:
+            self.user_names.append(user_name)
+            user = all_users.get(user_name)
+            user.poll_name = POLL_NAME
+            previous_vote_data = previous_vote_data_weighted = None
+
+        user.vote_data = {QUESTION: answers}
+        user.vote_data_weighted = {QUESTION: weighted or answers}
+        user.has_voted = True
+        user.save()
+        if previous:
+            poll_tally.update(user, previous_vote_data, previous_vote_data_weighted)
+        return user
+
+    def test_01_update(self):
+        """Test updating a poll tally with new votes and changed votes
+
+        **Test Scenario**
+
+        - Add a vote to an empty tally, check it's rebuilt from the stored users
+        - Add a vote of another user, check the voters count and votes are incremented
+        - Change a user vote, check the previous vote is subtracted and the voters count is not changed
+        """
+        self._vote("first", [1, 0], [2.5, 0])
+        tally = poll_tally.get(POLL_NAME)
+        self.assertEqual(tally["voters"], 1)
+        self.assertEqual(tally["votes"], {QUESTION: [1, 0]})
+        self.assertEqual(tally["weighted"], {QUESTION: [2.5, 0]})
+
+        self._vote("second", [1, 0])
+        tally = poll_tally.get(POLL_NAME)
+        self.assertEqual(tally["voters"], 2)
+        self.assertEqual(tally["votes"], {QUESTION: [2, 0]})
+        self.assertEqual(tally["weighted"], {QUESTION: [3.5, 0]})
+
+        self._vote("first", [0, 1], [0, 2.5])
+        tally = poll_tally.get(POLL_NAME)
+        self.assertEqual(tally["voters"], 2)
+        self.assertEqual(tally["votes"], {QUESTION: [1, 1]})
+        self.assertEqual(tally["weighted"], {QUESTION: [1, 2.5]})
+
+    def test_02_rebuild(self):
+        """Test rebuilding a poll tally from the stored users
+
+        **Test Scenario**
+
+        - Save votes without updating the tally
+        - Save a user of another poll and a user who didn't vote
+        - Rebuild the tally, check it only counts the votes of the poll users
+        - Check the rebuilt tally is saved and read by `get`
+        """
+        self._vote("first", [1, 0], previous=False)
+        self._vote("second", [0, 1], [0, 3], previous=False)
+
+        other_poll_user = all_users.get("other_poll_tally_tester")
+        self.user_names.append(other_poll_user.instance_name)
+        other_poll_user.poll_name = "other_poll"
+        other_poll_user.vote_data = other_poll_user.vote_data_weighted = {QUESTION: [1, 0]}
+        other_poll_user.has_voted = True
+        other_poll_user.save()
+
+        not_voted_user = all_users.get(f"{POLL_NAME}_not_voted")
+        self.user_names.append(not_voted_user.instance_name)
+        not_voted_user.poll_name = POLL_NAME
+        not_voted_user.save()
+
+        tally = poll_tally.rebuild(POLL_NAME)
+        self.assertEqual(tally, {"voters": 2, "votes": {QUESTION: [1, 1]}, "weighted": {QUESTION: [1, 3]}})
+        self.assertTrue(j.core.db.exists(TALLY_KEY.format(POLL_NAME)))
+        self.assertEqual(poll_tally.get(POLL_NAME), tally)
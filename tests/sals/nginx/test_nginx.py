@@ -272,6 +272,50 @@ class TestNginxSal(BaseTests):
         PORTS.HTTP = 80
         PORTS.HTTPS = 443
 
+    def test07_unchanged_configuration(self):
+        """Test case for configuring a website again without changing its configuration.
+
+        **Test Scenario**
+
+        - Configure an https website, check it's changed and its self-signed certificates are generated.
+        - Configure it again, check it's not changed.
+        - Remove the self-signed certificates and configure it again, check they're generated again.
+        - Remove a location, check its configuration file is removed and written again when it's added back.
+        """
+        ssl_website = self.nginx_conf.get_website("unchanged_website")
+        ssl_website.ssl = True
+        ssl_website.port = 443
+        ssl_website.domain = "localhost"
+        ssl_website.locations.get(
+            "static",
+            path_url="/",
+            path_location=j.sals.fs.join_paths(DIR_PATH, "static"),
+            location_type=LocationType.STATIC,
+            is_auth=False,
+            is_admin=False,
+        )
+        certificates = [j.sals.fs.join_paths(self.config_base_dir, name) for name in ("key.pem", "cert.pem")]
+
+        self.info("Configuring the website")
+        self.assertTrue(ssl_website.configure(generate_certificates=False))
+        self.assertTrue(all(j.sals.fs.exists(path) for path in certificates))
+        self.info("Configuring the website again without changes")
+        self.assertFalse(ssl_website.configure(generate_certificates=False))
+
+        self.info("Removing the self-signed certificates and configuring the website again")
+        for path in certificates:
+            j.sals.fs.rmtree(path)
+        self.assertTrue(ssl_website.configure(generate_certificates=False))
+        self.assertTrue(all(j.sals.fs.exists(path) for path in certificates))
+
+        self.info("Removing the location and adding it back")
+        location_file = ssl_website.locations.get("static").cfg_file
+        ssl_website.remove_location("static")
+        self.assertFalse(j.sals.fs.exists(location_file))
+        ssl_website.get_static_location("static").path_location = j.sals.fs.join_paths(DIR_PATH, "static")
+        self.assertTrue(ssl_website.configure(generate_certificates=False))
+        self.assertTrue(j.sals.fs.exists(location_file))
+
     def tearDown(self):
         if self.nginx_server.is_running():
             self.nginx_server.stop()
@@ -0,0 +1,81 @@
+"""Microbenchmark for the per-call overhead of gedis actor methods dispatch
+
+Compares the previous dispatch (`hasattr`/`getattr` lookups + `inspect.signature` on every call)
+with the precompiled dispatch table built when the actor is registered.
+
+    python3 -m tests.servers.gedis.benchmark_dispatch
+"""
+import inspect
+import timeit
+from functools import wraps
+
+from jumpscale.loader import j
+from jumpscale.servers.gedis.baseactor import BaseActor, actor_method
+
+NUMBER = 100000
+
+
+def legacy_actor_method(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        signature = inspect.signature(func)
+        try:
+            bound = signature.bind(*args, **kwargs)
+        except TypeError as e:
+            raise j.exceptions.Value(str(e))
+
+        for name, value in bound.arguments.items():
+            annotation = signature.parameters[name].annotation
+            if annotation not in (None, inspect._empty) and not isinstance(value, annotation):
+                raise j.exceptions.Value(
+                    f"parameter ({name}) supposed to be of type ({annotation.__name__}), but found ({type(value).__name__})"
+                )
+
+        result = func(*bound.args, **bound.kwargs)
+        return_type = signature.return_annotation
+        if return_type is inspect._empty or return_type is None:
+            return_type = type(None)
+
+        if not isinstance(result, return_type):
+            raise j.exceptions.Value(f"method is supposed to return ({return_type}), but it returned ({type(result)})")
+
+        return result
+
+    return wrapper
+
+
+class LegacyActor(BaseActor):
+    @legacy_actor_method
+    def add(self, x: int, y: int, label: str = "sum") -> dict:
+        return {label: x + y}
+
+
+class CompiledActor(BaseActor):
+    @actor_method
+    def add(self, x: int, y: int, label: str = "sum") -> dict:
+        return {label: x + y}
+
+
+def main():
+    loaded_actors = {"bench": LegacyActor()}
+
+    def legacy_call():
+        actor = loaded_actors.get("bench")
+        if hasattr(actor, "add"):
+            getattr(actor, "add")(1, 2, label="total")
+
+    actor = CompiledActor()
+    dispatch_table = {("bench", name): method for name, method in actor.__compile_dispatch_table__().items()}
+
+    def compiled_call():
+        dispatch_table.get(("bench", "add"))(1, 2, label="total")
+
+    legacy = timeit.timeit(legacy_call, number=NUMBER)
+    compiled = timeit.timeit(compiled_call, number=NUMBER)
+    print(f"legacy dispatch:   {legacy / NUMBER * 1e6:.2f} us/call")
+    print(f"compiled dispatch: {compiled / NUMBER * 1e6:.2f} us/call")
+    print(f"speedup:           {legacy / compiled:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,8 @@
+import os
+import time
+
+import gevent
+
 from jumpscale.servers.gedis.baseactor import BaseActor, actor_method
 
 
@@ -69,5 +74,110 @@ class TestActor(BaseActor):
             obj.__dict__.update(**data[i])
         return objs
 
+    @actor_method(stream=True)
+    def stream_numbers(self, count: int) -> int:
+        """Stream numbers
+
+        Arguments:
+            count {int} -- number of items
+
+        Yields:
+            int -- numbers from 0 to count - 1
+        """
+        yield from range(count)
+
+    @actor_method(stream=True)
+    def stream_delayed_numbers(self, count: int, delay: float) -> int:
+        """Stream numbers, waiting for a delay before every number after the first
+
+        Arguments:
+            count {int} -- number of items
+            delay {float} -- seconds to wait between items
+
+        Yields:
+            int -- numbers from 0 to count - 1
+        """
+        for number in range(count):
+            if number:
+                gevent.sleep(delay)
+            yield number
+
+    @actor_method
+    def delayed_echo(self, value: int, delay: float = 0) -> int:
+        """Return a value after a delay, without releasing the connection in between
+
+        Arguments:
+            value {int} -- value to return
+            delay {float} -- seconds to wait before returning the value
+
+        Returns:
+            int -- the same value
+        """
+        gevent.sleep(delay)
+        return value
+
+    @actor_method(executor="thread")
+    def thread_sum(self, x: int, y: int) -> int:
+        """Adds two integers in a thread of the thread executor
+
+        Arguments:
+            x {int} -- first integer
+            y {int} -- second integer
+
+        Returns:
+            int -- the sum of the two integers
+        """
+        return x + y
+
+    @actor_method(executor="process")
+    def process_pid(self, delay: float = 0) -> int:
+        """Get the pid of the process executing the method, after blocking for a delay
+
+        Arguments:
+            delay {float} -- seconds to block before returning
+
+        Returns:
+            int -- worker process id
+        """
+        time.sleep(delay)
+        return os.getpid()
+
+    @actor_method(is_async=True)
+    def delayed_sum(self, x: int, y: int, delay: int = 1) -> int:
+        """Adds two integers after a delay
+
+        Arguments:
+            x {int} -- first integer
+            y {int} -- second integer
+            delay {int} -- seconds to wait before returning the result
+
+        Returns:
+            int -- the sum of the two integers
+        """
+        gevent.sleep(delay)
+        return x + y
+
+    @actor_method(cache_ttl=60)
+    def cached_calls_count(self, key: str) -> int:
+        """Count calls which are not served from the cache
+
+        Arguments:
+            key {str} -- any key, results are cached by key
+
+        Returns:
+            int -- number of calls executed so far
+        """
+        self._calls_count = getattr(self, "_calls_count", 0) + 1
+        return self._calls_count
+
+    @actor_method(invalidates=["cached_calls_count"])
+    def invalidate_calls_count(self) -> bool:
+        """Invalidate cached results of `cached_calls_count`
+
+        Returns:
+            bool -- True
+        """
+        return True
+
 
 Actor = TestActor
@@ -0,0 +1,68 @@
+import sys
+from unittest import TestCase, skipIf
+
+from jumpscale.servers.gedis.codecs import CODECS, get_codec, msgpack
+from tests.servers.gedis.test_actors import test_actor
+from tests.servers.gedis.test_actors.test_actor import TestObject
+
+
+class TestCodecs(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # objects are deserialized from modules loaded by path (as actors are loaded)
+        sys.modules[test_actor.__file__[:-3]] = test_actor
+
+    def test_01_builtin_types(self):
+        """Test builtin types are kept by all codecs
+
+        **Test Scenario**
+
+        - Serialize and deserialize a list of builtin types using every codec
+        - Check the result equals the original data
+        """
+        data = [[1, "two", 3.0, True, None], {"key": ["value"]}]
+        for codec in CODECS.values():
+            self.assertEqual(codec.loads(codec.dumps(data)), data)
+
+    def test_02_objects(self):
+        """Test objects are serialized with their module and class
+
+        **Test Scenario**
+
+        - Serialize and deserialize an object using every codec
+        - Check the result is an instance of the object's class with the same attributes
+        - Deserialize it again without objects and check the raw object data is returned
+        """
+        obj = TestObject()
+        obj.attr_1 = 1
+        obj.attr_2 = "two"
+        for codec in CODECS.values():
+            result = codec.loads(codec.dumps({"result": obj}))
+            self.assertIsInstance(result["result"], TestObject)
+            self.assertEqual(result["result"].attr_2, "two")
+
+            raw = codec.loads(codec.dumps({"result": obj}), deserialize_objects=False)
+            self.assertEqual(raw["result"]["data"], {"attr_1": 1, "attr_2": "two"})
+
+    @skipIf(msgpack is None, "msgpack is not installed")
+    def test_03_msgpack_bytes(self):
+        """Test bytes are kept by the msgpack codec
+
+        **Test Scenario**
+
+        - Serialize and deserialize bytes using the msgpack codec
+        - Check the result equals the original bytes
+        """
+        codec = get_codec("msgpack")
+        self.assertEqual(codec.loads(codec.dumps({"result": b"\x00\xff"})), {"result": b"\x00\xff"})
+
+    def test_04_unsupported_codec(self):
+        """Test getting an unsupported codec
+
+        **Test Scenario**
+
+        - Get a codec that is not supported
+        - Check an error is raised
+        """
+        with self.assertRaises(Exception):
+            get_codec("xml")
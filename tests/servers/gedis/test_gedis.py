@@ -1,8 +1,11 @@
 import gevent
+import os
 import time
 
 from unittest import TestCase, skip
 from jumpscale.loader import j
+from jumpscale.servers.gedis.metrics import to_prometheus
+from jumpscale.servers.gedis.server import GedisErrorTypes
 from tests.servers.gedis.test_actors.test_actor import TestObject
 
 
@@ -14,6 +17,7 @@ TEST_ACTOR_PATH = j.sals.fs.join_paths(ACTORS_DIR, "test_actor.py")
 MEMORY_ACTOR_PATH = j.sals.fs.join_paths(ACTORS_DIR, "memory_profiler.py")
 RELOADING_ACTOR_PATH = j.sals.fs.join_paths(ACTORS_DIR, "test_reloading.py")
 RELOADING_ACTOR_CHANGED_PATH = j.sals.fs.join_paths(ACTORS_DIR, "test_reloading_changed.py")
+WALLET_ACTOR_PATH = j.sals.fs.join_paths(j.sals.fs.dirname(j.packages.admin.__file__), "actors", "wallet.py")
 
 
 class TestGedis(TestCase):
@@ -134,3 +138,306 @@ class TestGedis(TestCase):
             print(self.cl.actors.system.register_actor(actor_name, actor_path, force_reload=True))
             # self.cl.reload()
             self.assertEqual(self.cl.actors.test_reloading_actor.get_value().result, 2)
+
+    def test_04_execute_batch(self):
+        """Test executing many actor methods in a single round trip
+
+        **Test Scenario**
+
+        - Execute a batch of calls using the same client
+        - Check that results are returned in the same order of the calls
+        """
+        calls = [("test", "add_two_numbers", (i, i), {}) for i in range(10)]
+        calls.append(("test", "concate_two_strings", ("hello", "world"), {}))
+        calls.append(("test", "not_found", (), {}))
+
+        results = self.cl.execute_batch(calls)
+        self.assertEqual([result.result for result in results[:10]], [i * 2 for i in range(10)])
+        self.assertEqual(results[10].result, "helloworld")
+        self.assertFalse(results[11].success)
+
+    def test_05_stream_results(self):
+        """Test stream actor methods
+
+        **Test Scenario**
+
+        - Execute a stream method with more items than a single chunk
+        - Check that all items are received in order
+        - Stop consuming a stream early and check it's closed on the server
+        """
+        response = self.cl.actors.test.stream_numbers(1050)
+        self.assertIsNotNone(response.stream_id)
+        self.assertEqual(list(response.result), list(range(1050)))
+
+        response = self.cl.actors.test.stream_numbers(1050)
+        self.assertEqual(next(response.result), 0)
+        response.result.close()
+        self.assertNotIn(response.stream_id, self.server._streams)
+
+    def test_06_metrics(self):
+        """Test requests metrics
+
+        **Test Scenario**
+
+        - Reset metrics and execute successful and failing calls
+        - Check the calls count, errors count and latency histogram using `core.metrics`
+        - Check the prometheus text format of the metrics
+        """
+        self.cl.execute("core", "reset_metrics", die=True)
+        for i in range(5):
+            self.cl.actors.test.add_two_numbers(i, i)
+        self.cl.actors.test.add_two_numbers("a", 1)
+
+        metrics = self.cl.execute("core", "metrics", die=True).result["test.add_two_numbers"]
+        self.assertEqual(metrics["count"], 6)
+        self.assertEqual(metrics["errors"], {"BAD_REQUEST": 1})
+        self.assertEqual(metrics["in_flight"], 0)
+        self.assertEqual(metrics["latency"]["buckets"][-1], ["+Inf", 6])
+
+        text = to_prometheus({"test.add_two_numbers": metrics})
+        self.assertIn('gedis_requests_total{actor="test",method="add_two_numbers"} 6', text)
+        self.assertIn('gedis_errors_total{error_type="BAD_REQUEST",actor="test",method="add_two_numbers"} 1', text)
+
+    def test_07_async_tasks(self):
+        """Test async actor methods
+
+        **Test Scenario**
+
+        - Execute an async method and check a task id is returned immediately
+        - Check the task is not done yet, then wait for its result
+        - Execute an async method with bad arguments and check it fails without a task
+        """
+        response = self.cl.actors.test.delayed_sum(2, 3, delay=1)
+        self.assertTrue(response.is_async)
+        self.assertIsNotNone(response.task_id)
+
+        self.assertTrue(self.cl.get_task(response.task_id).is_async)
+        result = self.cl.wait_task(response.task_id, timeout=5)
+        self.assertTrue(result.success)
+        self.assertEqual(result.result, 5)
+
+        response = self.cl.actors.test.delayed_sum("2", 3)
+        self.assertFalse(response.success)
+        self.assertIsNone(response.task_id)
+
+    def test_08_lazy_actors_registry(self):
+        """Test lazy loading of actors info
+
+        **Test Scenario**
+
+        - Create a new client and check no actor info is loaded until an actor is accessed
+        - Register a new actor and check the registry generation is bumped
+        - Check the new actor is available without reloading the client, while unchanged actors are kept
+        """
+        client = j.clients.gedis.new("test_lazy_registry")
+        try:
+            self.assertEqual(client._loaded_actors, {})
+            self.assertEqual(client.actors.test.add_two_numbers(1, 2).result, 3)
+            self.assertEqual(list(client._loaded_actors.keys()), ["test"])
+
+            generation = client.execute("core", "registry", die=True).result["generation"]
+            self.cl.actors.system.register_actor("test_lazy", TEST_ACTOR_PATH)
+            self.assertGreater(client.execute("core", "registry", die=True).result["generation"], generation)
+
+            test_actor = client._loaded_actors["test"]
+            self.assertEqual(client.actors.test_lazy.add_two_numbers(2, 2).result, 4)
+            self.assertIs(client.actors.test, test_actor)
+        finally:
+            self.cl.actors.system.unregister_actor("test_lazy")
+            j.clients.gedis.delete("test_lazy_registry")
+
+    def test_09_results_cache(self):
+        """Test caching actor methods results
+
+        **Test Scenario**
+
+        - Call a cached method twice with the same argument, check the second call is served from the cache
+        - Call it with a different argument, check it's executed
+        - Call a method that invalidates the cache, check the next call is executed
+        """
+        self.cl.execute("core", "cache_invalidate", "test", die=True)
+        count = self.cl.actors.test.cached_calls_count("a").result
+        self.assertEqual(self.cl.actors.test.cached_calls_count("a").result, count)
+        self.assertEqual(self.cl.actors.test.cached_calls_count("b").result, count + 1)
+
+        self.cl.actors.test.invalidate_calls_count()
+        self.assertEqual(self.cl.actors.test.cached_calls_count("a").result, count + 2)
+
+        stats = self.cl.execute("core", "cache_stats", die=True).result
+        self.assertGreaterEqual(stats["methods"]["TestActor.cached_calls_count"]["hits"], 1)
+
+    def test_10_local_execute(self):
+        """Test executing actor methods in process
+
+        **Test Scenario**
+
+        - Execute a method using the server directly and check its result
+        - Execute a method with bad arguments and check the error type
+        - Execute a method of a missing actor and check the error type
+        """
+        response = self.server.execute("test", "add_two_numbers", 1, 2)
+        self.assertTrue(response["success"])
+        self.assertEqual(response["result"], 3)
+
+        response = self.server.execute("test", "add_two_numbers", "1", 2)
+        self.assertFalse(response["success"])
+        self.assertEqual(response["error_type"], GedisErrorTypes.BAD_REQUEST.value)
+
+        response = self.server.execute("not_found", "add_two_numbers", 1, 2)
+        self.assertEqual(response["error_type"], GedisErrorTypes.NOT_FOUND.value)
+
+    def test_11_pipelined_server(self):
+        """Test a server with pipelined requests handling
+
+        **Test Scenario**
+
+        - Start a pipelined server and send a slow call followed by fast calls and failing calls in one batch
+        - Check that responses are returned in the same order of the requests, with the errors in place
+        - Check that the slow calls are executed concurrently
+        """
+        server = j.servers.gedis.new("test_pipelined", port=16001, pipelined=True, enable_system_actor=False)
+        server.actor_add("test", TEST_ACTOR_PATH)
+        gevent.spawn(server.start)
+        assert j.sals.nettools.wait_connection_test(server.host, server.port, 3)
+        client = j.clients.gedis.new("test_pipelined", port=16001)
+        try:
+            calls = [("test", "delayed_echo", (0,), {"delay": 1})]
+            calls.extend(("test", "delayed_echo", (i,), {}) for i in range(1, 5))
+            calls.append(("test", "not_found", (), {}))
+            calls.append(("test", "delayed_echo", ("a",), {}))
+            calls.append(("test", "delayed_echo", (5,), {"delay": 1}))
+
+            start = time.time()
+            results = client.execute_batch(calls)
+            self.assertLess(time.time() - start, 2)
+
+            self.assertEqual([result.result for result in results[:5]], list(range(5)))
+            self.assertEqual(results[5].error_type, GedisErrorTypes.NOT_FOUND)
+            self.assertEqual(results[6].error_type, GedisErrorTypes.BAD_REQUEST)
+            self.assertEqual(results[7].result, 5)
+        finally:
+            server.stop()
+            j.clients.gedis.delete("test_pipelined")
+            j.servers.gedis.delete("test_pipelined")
+
+    def test_12_pooled_client(self):
+        """Test pooled clients connections and lanes
+
+        **Test Scenario**
+
+        - Execute concurrent calls using a pooled client and check the connections are checked out and released
+        - Wait for connections to be idle, execute a call and check the other idle connection is evicted on release
+        - Check that blocking methods are served from the blocking lane only
+        """
+        client = j.clients.gedis.new(
+            "test_pooled", pooled=True, pool_max_idle_time=1, blocking_methods=["test.concate_two_strings"]
+        )
+        try:
+            client.actors.test.add_two_numbers(1, 2)
+            client.pooled_connection.pools["default"].reset_stats()
+            calls = [gevent.spawn(client.actors.test.delayed_echo, i, delay=0.5) for i in range(2)]
+            gevent.joinall(calls, raise_error=True)
+
+            stats = client.pool_stats()["default"]
+            self.assertEqual([call.value.result for call in calls], [0, 1])
+            self.assertEqual(stats["checkouts"], 2)
+            self.assertEqual(stats["in_use"], 0)
+            self.assertEqual(stats["connected"], 2)
+
+            gevent.sleep(1.5)
+            self.assertEqual(client.actors.test.add_two_numbers(1, 2).result, 3)
+            stats = client.pool_stats()["default"]
+            self.assertEqual(stats["evictions"], 1)
+            self.assertEqual(stats["connected"], 1)
+
+            self.assertEqual(client.actors.test.concate_two_strings("a", "b").result, "ab")
+            self.assertEqual(client.pool_stats()["blocking"]["checkouts"], 1)
+            self.assertIs(
+                client.pooled_connection.get_client("test", "add_two_numbers"),
+                client.pooled_connection.clients["default"],
+            )
+        finally:
+            client.pooled_connection.disconnect()
+            j.clients.gedis.delete("test_pooled")
+
+    def test_13_executors(self):
+        """Test offloading actor methods to executors
+
+        **Test Scenario**
+
+        - Execute a method offloaded to the thread executor and check its result
+        - Execute concurrent calls of a method offloaded to the process executor, check they run in worker processes
+        - Kill a caller waiting for a worker process, check it returns immediately and the worker is not reused
+        - Execute `wallet.get_wallet_info` (a thread method) for a missing wallet and check the error is returned
+        """
+        self.assertEqual(self.cl.actors.test.thread_sum(1, 2).result, 3)
+
+        calls = [gevent.spawn(self.cl.actors.test.process_pid) for _ in range(3)]
+        gevent.joinall(calls, raise_error=True)
+        pids = {call.value.result for call in calls}
+        self.assertNotIn(os.getpid(), pids)
+        stats = self.cl.execute("core", "executors_stats", die=True).result
+        self.assertEqual(stats["executors"]["process"]["busy"], 0)
+        self.assertEqual(stats["executors"]["thread"]["busy"], 0)
+        self.assertEqual(stats["actors"]["test"]["completed"], 4)
+
+        workers = stats["executors"]["process"]["workers"]
+        call = gevent.spawn(self.server.execute, "test", "process_pid", delay=5)
+        gevent.sleep(1)
+        start = time.time()
+        call.kill()
+        self.assertLess(time.time() - start, 0.5)
+        stats = self.cl.execute("core", "executors_stats", die=True).result
+        self.assertEqual(stats["executors"]["process"]["workers"], workers - 1)
+
+        self.cl.actors.system.register_actor("wallet", WALLET_ACTOR_PATH)
+        try:
+            response = self.cl.actors.wallet.get_wallet_info(j.data.random_names.random_name())
+            self.assertFalse(response.success)
+            self.assertEqual(response.error_type, GedisErrorTypes.BAD_REQUEST)
+            self.assertIn("Wallet does not exist", response.error)
+        finally:
+            self.cl.actors.system.unregister_actor("wallet")
+
+    def test_14_async_tasks_metrics(self):
+        """Test requests metrics of async actor methods
+
+        **Test Scenario**
+
+        - Reset metrics and execute an async method with a delay
+        - Check the call is in flight and not counted until its task is finished
+        - Check the recorded latency is the task run time
+        """
+        self.cl.execute("core", "reset_metrics", die=True)
+        response = self.cl.actors.test.delayed_sum(2, 3, delay=1)
+        metrics = self.cl.execute("core", "metrics", die=True).result["test.delayed_sum"]
+        self.assertEqual(metrics["in_flight"], 1)
+        self.assertEqual(metrics["count"], 0)
+
+        self.assertTrue(self.cl.wait_task(response.task_id, timeout=5).success)
+        metrics = self.cl.execute("core", "metrics", die=True).result["test.delayed_sum"]
+        self.assertEqual(metrics["in_flight"], 0)
+        self.assertEqual(metrics["count"], 1)
+        self.assertGreaterEqual(metrics["latency"]["sum"], 1)
+
+    def test_15_stream_partial_chunks(self):
+        """Test stream chunks are sent when the next item is not ready
+
+        **Test Scenario**
+
+        - Execute a stream method that waits between items
+        - Check the first chunk only has the first item and is received before the next item is produced
+        - Close the stream while the next item is produced, check it's closed on the server
+        - Check all items are received in order when consuming the whole stream
+        """
+        response = self.cl.actors.test.stream_delayed_numbers(3, 1)
+        started = time.monotonic()
+        chunk = self.cl.execute("core", "stream_next", response.stream_id, 100, die=True).result
+        self.assertEqual(chunk, {"items": [0], "done": False})
+        self.assertLess(time.monotonic() - started, 0.5)
+
+        self.cl.execute("core", "stream_close", response.stream_id, die=True)
+        self.assertNotIn(response.stream_id, self.server._streams)
+
+        response = self.cl.actors.test.stream_delayed_numbers(3, 0.1)
+        self.assertEqual(list(response.result), [0, 1, 2])
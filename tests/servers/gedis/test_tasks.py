@@ -0,0 +1,73 @@
+import gevent
+from unittest import TestCase
+
+from jumpscale.servers.gedis.tasks import TaskManager, TaskState
+
+
+def delayed_sum(x, y, delay=0):
+    gevent.sleep(delay)
+    return x + y
+
+
+class TestTasks(TestCase):
+    def setUp(self):
+        self.tasks = TaskManager(size=1, result_ttl=1)
+
+    def tearDown(self):
+        self.tasks.shutdown()
+
+    def test_01_results(self):
+        """Test task results and failures
+
+        **Test Scenario**
+
+        - Submit a task with a callback and check it's queued
+        - Wait for the task, check it succeeded with the right result and the callback is called
+        - Submit a task that raises an error, check it failed with the same error
+        """
+        finished = []
+        task = self.tasks.submit(delayed_sum, (1, 2), {"delay": 0.1}, name="sum", callback=finished.append)
+        self.assertEqual(task.state, TaskState.QUEUED)
+        self.assertTrue(task.wait(2))
+        self.assertEqual(task.state, TaskState.SUCCESS)
+        self.assertEqual(task.result, 3)
+        self.assertEqual(finished, [task])
+
+        task = self.tasks.submit(delayed_sum, (1, "2"), {}, name="sum")
+        task.wait(2)
+        self.assertEqual(task.state, TaskState.FAILURE)
+        self.assertIsInstance(task.exception, TypeError)
+
+    def test_02_pool_size(self):
+        """Test tasks are queued when the pool is full
+
+        **Test Scenario**
+
+        - Submit a slow task and another task to a manager with a pool of size 1
+        - Check the first task is running and the second one is queued
+        - Wait for the second task and check its result
+        """
+        first = self.tasks.submit(delayed_sum, (1, 2), {"delay": 0.5})
+        second = self.tasks.submit(delayed_sum, (3, 4), {})
+        gevent.sleep(0.1)
+        self.assertEqual(first.state, TaskState.RUNNING)
+        self.assertEqual(second.state, TaskState.QUEUED)
+        self.assertEqual(self.tasks.stats()["queued"], 1)
+
+        self.assertTrue(second.wait(2))
+        self.assertEqual(second.result, 7)
+
+    def test_03_results_expiry(self):
+        """Test finished tasks expire after the results ttl
+
+        **Test Scenario**
+
+        - Submit a task and wait for it, check it can be retrieved
+        - Wait for more than the results ttl, check the task is removed
+        """
+        task = self.tasks.submit(delayed_sum, (1, 2), {})
+        task.wait(2)
+        self.assertIs(self.tasks.get(task.id), task)
+        gevent.sleep(1.5)
+        self.assertIsNone(self.tasks.get(task.id))
+        self.assertEqual(self.tasks.list(), [])
@@ -0,0 +1,132 @@
+import gevent
+from unittest import TestCase
+
+from jumpscale.loader import j
+from jumpscale.servers.gedis_http.compression import BROTLI, GZIP, brotli, choose_encoding
+
+GEDIS_PORT = 16002
+HTTP_PORT = 8002
+TEST_ACTOR_PATH = j.sals.fs.join_paths(
+    j.sals.fs.dirname(j.sals.fs.dirname(__file__)), "gedis", "test_actors", "test_actor.py"
+)
+
+
+class TestGedisHTTP(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = j.servers.gedis.new("test_http", port=GEDIS_PORT)
+        # actors are exposed as `/<package>/<actor>/<method>` for actors named `<package>_<actor>`
+        cls.server.actor_add("tests_actor", TEST_ACTOR_PATH)
+        gevent.spawn(cls.server.start)
+        assert j.sals.nettools.wait_connection_test(cls.server.host, cls.server.port, 3)
+
+        cls.http_server = j.servers.gedis_http.new("test_http", port=HTTP_PORT)
+        cls.gevent_server = cls.http_server.gevent_server
+        cls.gevent_server.start()
+        cls.url = f"http://127.0.0.1:{HTTP_PORT}/tests"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.gevent_server.stop()
+        cls.server.stop()
+        j.servers.gedis_http.delete("test_http")
+        j.servers.gedis.delete("test_http")
+
+    def test_01_respond_async(self):
+        """Test async methods calls with `Prefer: respond-async`
+
+        **Test Scenario**
+
+        - Call an async method without `Prefer: respond-async` and check its result is returned
+        - Call it with `Prefer: respond-async` and check `202` is returned with a task id
+        - Wait for the task result using the tasks endpoint
+        - Check the task is not returned under other packages, and tasks of other calls are not returned
+        """
+        data = {"x": 2, "y": 3, "delay": 1}
+        response = j.tools.http.post(f"{self.url}/actor/delayed_sum", json=data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), 5)
+
+        response = j.tools.http.post(f"{self.url}/actor/delayed_sum", json=data, headers={"Prefer": "respond-async"})
+        self.assertEqual(response.status_code, 202)
+        task_id = response.json()["task_id"]
+
+        response = j.tools.http.get(f"{self.url}/__tasks/{task_id}", params={"timeout": 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), 5)
+
+        response = j.tools.http.get(f"{self.url}/__tasks/not_found")
+        self.assertEqual(response.status_code, 404)
+
+        # tasks are only returned under the package of their actor, not under packages with the same prefix
+        for package in ("other", "test", "tests_actor"):
+            response = j.tools.http.get(f"http://127.0.0.1:{HTTP_PORT}/{package}/__tasks/{task_id}")
+            self.assertEqual(response.status_code, 404)
+
+        # tasks of calls not made through the http server are not returned
+        task_id = self.server.execute("tests_actor", "delayed_sum", 2, 3, delay=0)["task_id"]
+        response = j.tools.http.get(f"{self.url}/__tasks/{task_id}", params={"timeout": 5})
+        self.assertEqual(response.status_code, 404)
+
+    def test_02_compression(self):
+        """Test responses compression
+
+        **Test Scenario**
+
+        - Call a method with a large result, accepting gzip only, check the response is gzip compressed
+        - Accept both brotli and gzip, check brotli is preferred if it's installed
+        - Don't accept any encoding, check the response is not compressed
+        - Call a method with a small result, check it's not compressed
+        """
+        data = {"s1": "a" * 2048, "s2": "b"}
+        url = f"{self.url}/actor/concate_two_strings"
+
+        response = j.tools.http.post(url, json=data, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], GZIP)
+        self.assertEqual(response.json(), "a" * 2048 + "b")
+
+        response = j.tools.http.post(url, json=data, headers={"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response.headers["Content-Encoding"], BROTLI if brotli else GZIP)
+        if brotli:
+            self.assertEqual(response.json(), "a" * 2048 + "b")
+
+        response = j.tools.http.post(url, json=data, headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.json(), "a" * 2048 + "b")
+
+        response = j.tools.http.post(url, json={"s1": "a", "s2": "b"}, headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+
+        self.assertEqual(choose_encoding("gzip;q=0.5, br;q=0"), GZIP)
+        self.assertIsNone(choose_encoding("gzip;q=0, deflate"))
+        self.assertEqual(choose_encoding("*"), BROTLI if brotli else GZIP)
+
+    def test_03_entity_tags(self):
+        """Test entity tags and conditional requests
+
+        **Test Scenario**
+
+        - Call a method and check the response has an entity tag
+        - Call it again with the entity tag in `If-None-Match`, check `304 Not Modified` is returned without a body
+        - Call it again with a compressed representation, check the same entity tag still matches
+        - Call it with different arguments, check the old entity tag doesn't match
+        """
+        url = f"{self.url}/actor/concate_two_strings"
+        data = {"s1": "a" * 2048, "s2": "b"}
+
+        response = j.tools.http.post(url, json=data, headers={"Accept-Encoding": "identity"})
+        etag = response.headers["ETag"]
+        self.assertEqual(response.status_code, 200)
+
+        headers = {"Accept-Encoding": "identity", "If-None-Match": etag}
+        response = j.tools.http.post(url, json=data, headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        headers = {"Accept-Encoding": "gzip", "If-None-Match": etag}
+        response = j.tools.http.post(url, json=data, headers=headers)
+        self.assertEqual(response.status_code, 304)
+
+        response = j.tools.http.post(url, json={"s1": "a", "s2": "c"}, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
@@ -0,0 +1,145 @@
+from unittest import TestCase
+
+from jumpscale.loader import j
+from jumpscale.servers.threebot.threebot import DEFAULT_PACKAGES, PackageManager
+
+
+class FakePackage:
+    def __init__(self, name, dependencies=None, fail_on=None):
+        self.name = name
+        self.dependencies = dependencies or []
+        self.fail_on = fail_on
+
+    def start(self):
+        if self.fail_on == "start":
+            raise j.exceptions.Runtime(f"{self.name} failed to start")
+
+
+class FakePackageManager(PackageManager):
+    """Package manager that only records the install phases, without changing the server state"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.registered = []
+        self.started = []
+
+    def _prepare(self, package):
+        if getattr(package, "fail_on", None) == "prepare":
+            raise j.exceptions.Runtime(f"{package.name} failed to prepare")
+        return None, []
+
+    def _register(self, package, package_app, standalone_servers):
+        self.registered.append(package.name)
+
+    def _commit(self, packages, timings, fail):
+        for package in packages:
+            try:
+                # the default packages used by `_install_all` are real packages, they're not started
+                if isinstance(package, FakePackage):
+                    package.start()
+                self.started.append(package.name)
+            except Exception as e:
+                fail(package, e)
+
+
+class TestInstallLevels(TestCase):
+    def setUp(self):
+        self.manager = FakePackageManager()
+        self.failed = {}
+
+    def _fail(self, package, e):
+        self.failed[package.name] = e
+
+    def _levels(self, packages):
+        return [
+            sorted(package.name for package in level)
+            for level in self.manager._get_install_levels(packages, self._fail)
+        ]
+
+    def test_01_levels(self):
+        """Test packages are installed in levels of their dependencies
+
+        **Test Scenario**
+
+        - Get the install levels of packages with dependencies between them, on installed packages and on nothing
+        - Check every package is in the level after all of its dependencies
+        """
+        packages = [
+            FakePackage("app", ["api", "ui"]),
+            FakePackage("api", ["db"]),
+            FakePackage("ui"),
+            FakePackage("db", ["auth"]),
+        ]
+        self.assertEqual(self._levels(packages), [["db", "ui"], ["api"], ["app"]])
+        self.assertEqual(self.failed, {})
+
+    def test_02_missing_dependencies(self):
+        """Test packages with missing dependencies
+
+        **Test Scenario**
+
+        - Get the install levels of a package depending on a package that is not installed nor being installed
+        - Check the package fails with NotFound and is not in any level
+        """
+        packages = [FakePackage("app", ["missing"]), FakePackage("ui")]
+        self.assertEqual(self._levels(packages), [["ui"]])
+        self.assertEqual(list(self.failed), ["app"])
+        self.assertIsInstance(self.failed["app"], j.exceptions.NotFound)
+
+    def test_03_circular_dependencies(self):
+        """Test packages with circular dependencies
+
+        **Test Scenario**
+
+        - Get the install levels of packages depending on each other and a package depending on them
+        - Check the other packages are still installed and the packages of the cycle fail with a Value error
+        """
+        packages = [
+            FakePackage("first", ["second"]),
+            FakePackage("second", ["first"]),
+            FakePackage("third", ["first"]),
+            FakePackage("ui"),
+        ]
+        self.assertEqual(self._levels(packages), [["ui"]])
+        self.assertEqual(sorted(self.failed), ["first", "second", "third"])
+        for e in self.failed.values():
+            self.assertIsInstance(e, j.exceptions.Value)
+
+    def test_04_failed_dependencies(self):
+        """Test packages depending on failed packages are skipped
+
+        **Test Scenario**
+
+        - Install packages where a package fails to prepare and another package fails to start
+        - Check the packages depending on the failed package are not installed, other packages are installed
+        - Check errors are raised for required packages, failing to install or to start
+        """
+        packages = [
+            FakePackage("db", fail_on="prepare"),
+            FakePackage("api", ["db"]),
+            FakePackage("app", ["api"]),
+            FakePackage("ui", fail_on="start"),
+            FakePackage("docs", ["ui"]),
+        ]
+        timings = self.manager.install_many(packages)
+        self.assertEqual(self.manager.registered, ["ui", "docs"])
+        self.assertEqual(self.manager.started, ["docs"])
+        self.assertNotIn("api", timings)
+        self.assertNotIn("app", timings)
+
+        for required in ("app", "ui"):
+            with self.assertRaises(j.exceptions.Runtime):
+                FakePackageManager().install_many(packages, required=[required])
+
+    def test_05_missing_default_packages(self):
+        """Test default packages are installed even if they're missing from the stored packages
+
+        **Test Scenario**
+
+        - Remove a default package from the stored packages
+        - Install all packages, check the missing default package is added back and installed with the others
+        """
+        self.manager.packages = {name: info.copy() for name, info in DEFAULT_PACKAGES.items() if name != "admin"}
+        self.manager._install_all()
+        self.assertIn("admin", self.manager.packages)
+        self.assertEqual(self.manager.registered, list(DEFAULT_PACKAGES))
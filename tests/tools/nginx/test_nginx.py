@@ -1,5 +1,6 @@
 from unittest import TestCase
 from jumpscale.loader import j
+from jumpscale.tools.nginx.nginxserver import RELOAD_DELAY
 import gevent
 
 
@@ -60,6 +61,43 @@ class TestNginx(TestCase):
         j.logger.info("NGINX server restarted")
         self.assertTrue(nginx_instance.is_running())
 
+    def test003_nginx_reload(self):
+        """Test case for reloading NGINX server.
+
+        **Test Scenario**
+
+        - Start nginx server.
+        - Request several reloads from another greenlet, check nginx is reloaded once after the reload delay.
+        - Request a reload from the main greenlet, check nginx is reloaded immediately.
+        - Break nginx configuration and request a reload, check it fails and is counted as failed.
+        """
+        nginx_instance = self._get_instance()
+        nginx_instance.save()
+        nginx_instance.start()
+        self.assertTrue(nginx_instance.is_running())
+
+        def reload_many():
+            for _ in range(3):
+                nginx_instance.reload()
+
+        gevent.spawn(reload_many).join()
+        self.assertTrue(nginx_instance.reload_stats["pending"])
+        gevent.sleep(RELOAD_DELAY + 1)
+        self.assertEqual(nginx_instance.reload_stats, {"requested": 3, "performed": 1, "failed": 0, "pending": False})
+
+        nginx_instance.reload()
+        self.assertEqual(nginx_instance.reload_stats, {"requested": 4, "performed": 2, "failed": 0, "pending": False})
+
+        config = j.sals.fs.read_file(nginx_instance.config_path)
+        j.sals.fs.write_file(nginx_instance.config_path, config + "\ninvalid directive;\n")
+        try:
+            with self.assertRaises(j.exceptions.Validation):
+                nginx_instance.reload()
+        finally:
+            j.sals.fs.write_file(nginx_instance.config_path, config)
+        self.assertEqual(nginx_instance.reload_stats["failed"], 1)
+        self.assertEqual(nginx_instance.reload_stats["performed"], 2)
+
     def tearDown(self):
         nginx_instance = j.tools.nginx.find(self.instance_name)
         nginx_instance.stop()